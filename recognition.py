@@ -3,654 +3,4758 @@ import os
 import cv2
 import numpy as np
 import time
+import queue
+import json
+import re
+import hashlib
+import base64
+import struct
+import sqlite3
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QLabel, QStatusBar, QFrame, QFileDialog, QComboBox,
-    QStyle, QToolBar, QMessageBox, QSizePolicy, QSlider, QMenu
+    QStyle, QToolBar, QMessageBox, QSizePolicy, QSlider, QMenu,
+    QDialog, QFormLayout, QDialogButtonBox, QSpinBox, QListWidget, QListWidgetItem,
+    QStyleOption, QCheckBox, QDoubleSpinBox, QLineEdit, QTableWidget, QTableWidgetItem,
+    QHeaderView, QInputDialog
 )
-from PyQt6.QtGui import QImage, QPixmap, QFont, QAction, QIcon, QColor
-from PyQt6.QtCore import Qt, QThread, pyqtSignal, QTimer, QSize, pyqtSlot
+from PyQt6.QtGui import (
+    QImage, QPixmap, QFont, QAction, QIcon, QColor, QPainter, QPen, QTransform,
+    QFontMetrics, QPalette
+)
+from PyQt6.QtCore import Qt, QEvent, QObject, QThread, pyqtSignal, QTimer, QSize, QPoint, QPointF, QRectF, pyqtSlot
 from ultralytics import YOLO
 
+# --- Utilidades de detección ---
+# El predictor de ultralytics no es seguro entre hilos: todos los hilos que
+# comparten la instancia del modelo de la ventana serializan sus llamadas
+MODEL_LOCK = threading.Lock()
+
+# Colores usados para dibujar las detecciones (BGR)
+DETECTION_COLOR = (79, 70, 229)   # Indigo-600
+TEXT_BG_COLOR = (67, 56, 202)     # Indigo-700
+TEXT_FG_COLOR = (255, 255, 255)   # Blanco
+
+
+def extract_detections(results):
+    """Convierte los resultados de YOLO en arreglos NumPy (una sola copia a CPU por tensor)"""
+    result = results[0]
+    boxes = result.boxes
+    if boxes is None or len(boxes) == 0:
+        return {
+            "xyxy": np.empty((0, 4), dtype=np.float32),
+            "conf": np.empty(0, dtype=np.float32),
+            "cls": np.empty(0, dtype=np.int32),
+            "names": result.names,
+        }
+    return {
+        "xyxy": boxes.xyxy.cpu().numpy().astype(np.float32),
+        "conf": boxes.conf.cpu().numpy().astype(np.float32),
+        "cls": boxes.cls.cpu().numpy().astype(np.int32),
+        "names": result.names,
+    }
+
+
+def close_queue_worker(worker, work_queue):
+    """Envía el marcador de fin (None) a un hilo que consume work_queue y espera a que termine.
+
+    Si el hilo ya terminó (p. ej. por un error) no se bloquea aunque la cola
+    esté llena.
+    """
+    while worker.isRunning():
+        try:
+            work_queue.put(None, timeout=0.5)
+            break
+        except queue.Full:
+            continue
+    worker.wait()
+
+
+def detections_to_records(detections):
+    """Detecciones como lista de diccionarios serializables en JSON"""
+    names = detections["names"]
+    return [
+        {"cls": int(c), "name": names[int(c)], "conf": round(float(p), 4),
+         "box": [round(float(v), 1) for v in box]}
+        for box, p, c in zip(detections["xyxy"], detections["conf"], detections["cls"])
+    ]
+
+
+def draw_detections(frame_bgr, detections):
+    """Dibuja las cajas y etiquetas de las detecciones sobre el frame (in situ)"""
+    if detections is None:
+        return frame_bgr
+    names = detections["names"]
+    for box, conf, cls_id in zip(detections["xyxy"].astype(int), detections["conf"], detections["cls"]):
+        label = f"{names[int(cls_id)]}: {float(conf):.2f}"
+        cv2.rectangle(frame_bgr, (box[0], box[1]), (box[2], box[3]), DETECTION_COLOR, 2)
+
+        # Fondo para el texto con estilo moderno
+        (w, h), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_DUPLEX, 0.6, 1)
+        cv2.rectangle(frame_bgr, (box[0], box[1] - h - 10), (box[0] + w + 4, box[1] - 5), TEXT_BG_COLOR, -1)
+        cv2.putText(frame_bgr, label, (box[0] + 2, box[1] - 7),
+                    cv2.FONT_HERSHEY_DUPLEX, 0.6, TEXT_FG_COLOR, 1, cv2.LINE_AA)
+    return frame_bgr
+
+
+def bgr_to_display(frame_bgr):
+    """Convierte un frame BGR al formato de 32 bits que QPainter dibuja sin conversiones.
+
+    El arreglo resultante es nuevo, así que puede entregarse a la GUI y
+    envolverse en una QImage sin copiarlo otra vez.
+    """
+    return cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2BGRA)
+
+
+class FrameBuffers:
+    """Búferes reutilizables del bucle de reproducción.
+
+    En régimen estable el bucle no reserva arreglos de tamaño completo: la
+    lectura, la conversión a RGB para el modelo y la conversión para la
+    pantalla escriben sobre memoria reservada al abrir la fuente. Los búferes
+    de pantalla viajan a la GUI, que los devuelve con release() al dejar de
+    mostrarlos; si no queda ninguno libre se omite la presentación de ese frame
+    en lugar de reservar otro. Las copias para el grabador de eventos siguen
+    el mismo esquema con su propia reserva.
+    """
+    DISPLAY_BUFFERS = 4  # lienzo + frame pendiente + señales en cola + el que se escribe
+    RECORDING_BUFFERS = 10  # cola del grabador de eventos + el que codifica + margen
+
+    def __init__(self, display_buffers=DISPLAY_BUFFERS, recording_buffers=RECORDING_BUFFERS):
+        self.display_count = display_buffers
+        self.recording_count = recording_buffers
+        self._lock = threading.Lock()
+        self._capture = None
+        self._rgb = None
+        self._display_shape = None
+        self._display_owned = ()
+        self._display_free = []
+        self._recording_shape = None
+        self._recording_owned = ()
+        self._recording_free = []
+        self.allocations = 0          # reservas de tamaño completo desde la creación
+        self.skipped_presentations = 0
+        self.skipped_recordings = 0
+
+    def read(self, cap):
+        """Lee el siguiente frame sobre el búfer de captura (OpenCV lo reserva solo si cambia el tamaño)"""
+        ret, frame = cap.read(self._capture)
+        if ret and frame is not self._capture:
+            self._capture = frame
+            self.allocations += 1
+        return ret, frame
+
+    def to_rgb(self, frame_bgr):
+        """Conversión a RGB para el modelo, válida hasta la siguiente llamada"""
+        if self._rgb is None or self._rgb.shape != frame_bgr.shape:
+            self._rgb = np.empty_like(frame_bgr)
+            self.allocations += 1
+        return cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB, dst=self._rgb)
+
+    def to_display(self, frame_bgr):
+        """Convierte a BGRA sobre un búfer de pantalla libre, o None si la GUI los tiene todos"""
+        h, w = frame_bgr.shape[:2]
+        with self._lock:
+            if self._display_shape != (h, w):
+                self._display_shape = (h, w)
+                # Los búferes anteriores que siga mostrando la GUI se liberan solos al soltarlos
+                self._display_free = [np.empty((h, w, 4), dtype=np.uint8) for _ in range(self.display_count)]
+                self._display_owned = tuple(self._display_free)
+                self.allocations += self.display_count
+            if not self._display_free:
+                self.skipped_presentations += 1
+                return None
+            buffer = self._display_free.pop()
+        return cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2BGRA, dst=buffer)
+
+    def release(self, buffer):
+        """Devuelve un búfer de pantalla; los arreglos ajenos a la reserva se ignoran"""
+        if buffer is None:
+            return
+        with self._lock:
+            if (any(owned is buffer for owned in self._display_owned)
+                    and not any(free is buffer for free in self._display_free)):
+                self._display_free.append(buffer)
+
+    def copy_for_recording(self, frame_bgr):
+        """Copia el frame sobre un búfer del grabador de eventos, o None si los tiene todos"""
+        with self._lock:
+            if self._recording_shape != frame_bgr.shape:
+                self._recording_shape = frame_bgr.shape
+                self._recording_free = [np.empty_like(frame_bgr) for _ in range(self.recording_count)]
+                self._recording_owned = tuple(self._recording_free)
+                self.allocations += self.recording_count
+            if not self._recording_free:
+                self.skipped_recordings += 1
+                return None
+            buffer = self._recording_free.pop()
+        np.copyto(buffer, frame_bgr)
+        return buffer
+
+    def release_recording(self, buffer):
+        """Devuelve un búfer del grabador de eventos (desde cualquier hilo)"""
+        with self._lock:
+            if (any(owned is buffer for owned in self._recording_owned)
+                    and not any(free is buffer for free in self._recording_free)):
+                self._recording_free.append(buffer)
+
+
 # --- Hilo para el procesamiento de Medios (Cámara o Video) ---
 class MediaProcessingThread(QThread):
-    frame_ready = pyqtSignal(QPixmap)
+    """Motor de medios de larga duración.
+
+    Se crea una sola vez con el modelo ya cargado y atiende fuentes sucesivas
+    (cámara o video) mediante comandos, sin recrear el hilo ni recalentar el
+    modelo. Cada fuente abierta es una sesión numerada; los frames y las
+    señales de fin llevan ese número para que la GUI ignore los de sesiones anteriores.
+    """
+    frame_ready = pyqtSignal(int, object, object)  # sesión, frame BGRA, detecciones
     status_update = pyqtSignal(str)
-    processing_finished = pyqtSignal()
+    processing_finished = pyqtSignal(int)    # sesión terminada
     frame_position = pyqtSignal(int)
     total_frames = pyqtSignal(int)
-
-    def __init__(self, yolo_model, source_type="webcam", file_path=None):
+    frames_skipped = pyqtSignal(int)
+    source_switched = pyqtSignal(int, float)  # sesión, latencia del cambio en segundos
+    motion_gate_stats = pyqtSignal(int, int)  # frames inferidos, frames sin movimiento
+    governor_stats = pyqtSignal(object)       # FPS logrados, CPU estimada... (FpsGovernor.stats)
+    fallback_model_requested = pyqtSignal(str)
+
+    # Tamaños de entrada que se prueban cuando sobra tiempo (reproducción lenta)
+    INFERENCE_SIZES = (640, 800, 960, 1280)
+    # Fracción del intervalo entre frames que se permite gastar en inferencia
+    INFERENCE_BUDGET = 0.8
+    # Segundos que la cámara sigue abierta tras cambiar a otra fuente
+    CAMERA_LINGER = 10.0
+
+    def __init__(self, yolo_model):
         super().__init__()
         self.yolo_model = yolo_model
-        self.source_type = source_type
-        self.file_path = file_path
-        self._is_running = False
+        self.source_type = None
+        self.file_path = None
+        # session_id cuenta las fuentes pedidas desde la GUI; active_session es la
+        # que el hilo de trabajo tiene abierta y la que llevan todas las señales
+        self.session_id = 0
+        self.active_session = 0
+        self._is_running = True
         self._is_paused = False
         self.cap = None
         self.current_frame = 0
         self.total_frame_count = 0
         self.frame_rate = 30
 
+        # Reloj de presentación: el video se muestra a FPS de origen × velocidad
+        self.playback_speed = 1.0
+        # "drop": saltar frames para alcanzar el reloj; "reuse": mostrar cada frame
+        # reutilizando las últimas detecciones cuando la inferencia va retrasada
+        self.late_policy = "drop"
+        self.skipped_frame_count = 0
+        # Tamaño de entrada mínimo (el del perfil); se amplía solo si sobra tiempo
+        self.base_inference_size = self.INFERENCE_SIZES[0]
+        self.inference_size = self.base_inference_size
+        # Frames que retiene el controlador de la cámara (0 = valor del controlador)
+        self.camera_buffer_size = 0
+        # Pausa tras cada frame de la cámara, cediendo CPU al resto de la aplicación
+        self.webcam_pause = 0.01
+        # Regulador de FPS (solo cámara): None infiere tan rápido como llegan los frames
+        self.fps_governor = None
+        # Con la ventana oculta no se convierte ni se envía ningún frame a la GUI
+        self.present_frames = True
+        self._reset_clock = True
+        self._clock_start = 0.0
+        self._clock_frame = 0
+        self._last_detections = None
+        self._infer_time_avg = 0.0
+        self._last_inference_latency = 0.0
+        self._thread_config_version = None
+        # Memoria reutilizada entre frames; la GUI devuelve los búferes de pantalla
+        self.frame_buffers = FrameBuffers()
+        # Compuerta de movimiento (solo cámara): None infiere en todos los frames
+        self.motion_gate = None
+        self._gate_inferred = 0
+        self._gate_skipped = 0
+        self._last_inference_time = 0.0
+        self._last_gate_report = 0.0
+        self._infer_time_size = self.base_inference_size
+        self._last_skip_report = 0.0
+        self._frame_counter = 0
+        # Registro opcional de detecciones (DetectionRecorder)
+        self.detection_recorder = None
+        # Grabación opcional de clips por eventos de la cámara (EventClipRecorder)
+        self.event_recorder = None
+        # Agregados en vivo por clase (DetectionStatistics)
+        self.statistics = None
+        # Índice consultable de detecciones de archivos (DetectionIndex)
+        self.detection_index = None
+        # Densidad de detecciones del video actual (TimelineDensity)
+        self.timeline = None
+
+        # Canal de control: la GUI encola comandos y el hilo los aplica. Solo el
+        # hilo de trabajo toca self.cap; las esperas usan la variable de condición
+        self._commands = deque()
+        self._cond = threading.Condition()
+        self._pending_frames = 0
+
+        # Cámara aparcada tras cambiar de fuente, por si el usuario vuelve enseguida
+        self._idle_camera = None
+        self._idle_camera_deadline = 0.0
+        # Instante en que la GUI pidió el cambio de fuente (para medir la latencia)
+        self._switch_requested_at = None
+
+    # --- Comandos (seguros desde cualquier hilo) ---
+    def _post(self, command, value=None):
+        with self._cond:
+            self._commands.append((command, value))
+            self._cond.notify_all()
+
+    def open_source(self, source_type, file_path=None, start_frame=None):
+        """Abre una nueva fuente en el hilo de trabajo; devuelve el número de sesión.
+
+        Con start_frame el video se abre en pausa mostrando ese frame.
+        """
+        with self._cond:
+            self.session_id += 1
+            session = self.session_id
+            self._commands.append(("open", (source_type, file_path, session, time.perf_counter(), start_frame)))
+            self._cond.notify_all()
+        return session
+
+    def close_source(self):
+        """Cierra la fuente actual sin detener el motor"""
+        self._post("close")
+
+    def rewind(self):
+        """Vuelve al inicio del video abierto sin reabrir la captura"""
+        self._post("rewind")
+
     def stop(self):
-        """Detiene el procesamiento y libera recursos"""
-        self._is_running = False
+        """Detiene el motor; las capturas se liberan en el propio hilo"""
+        with self._cond:
+            self._is_running = False
+            self._is_paused = False
+            self._cond.notify_all()
+
+    def play(self):
+        with self._cond:
+            self._is_paused = False
+            self._cond.notify_all()
+        self.status_update.emit("Procesamiento reanudado.")
+
+    def pause(self):
+        with self._cond:
+            self._is_paused = True
+            self._cond.notify_all()
+        self.status_update.emit("Procesamiento pausado.")
+
+    def toggle_pause(self):
+        if self._is_paused:
+            self.play()
+        else:
+            self.pause()
+        return self._is_paused
+
+    def seek_to_frame(self, frame_number):
+        self._post("seek", int(frame_number))
+
+    def step(self, delta):
+        """Muestra el frame situado delta posiciones respecto al actual"""
+        self._post("step", int(delta))
+
+    def set_playback_speed(self, speed):
+        """Cambia el factor de velocidad y reinicia el reloj de presentación"""
+        self._post("speed", max(0.05, float(speed)))
+
+    def set_parameters(self, **parameters):
+        """Cambia parámetros del procesamiento (p. ej. late_policy) en el hilo de trabajo"""
+        self._post("parameters", parameters)
+
+    # --- Lado del hilo de trabajo ---
+    def _wait_for_commands(self, timeout=None):
+        """Espera sin consumir CPU y aplica los comandos recibidos.
+
+        Sin timeout bloquea mientras esté en pausa o sin fuente (como mucho
+        hasta que venza la cámara aparcada); con timeout duerme como máximo
+        ese tiempo, pero despierta en cuanto llega un comando.
+        """
+        with self._cond:
+            if timeout is None:
+                if self._is_paused:
+                    # Al reanudar, el reloj de presentación parte de cero
+                    self._reset_clock = True
+                while self._is_running and (self._is_paused or self.cap is None) and not self._commands:
+                    if self._idle_camera is not None:
+                        remaining = self._idle_camera_deadline - time.perf_counter()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    else:
+                        self._cond.wait()
+            elif timeout > 0 and self._is_running and not self._commands:
+                self._cond.wait(timeout)
+            commands = list(self._commands)
+            self._commands.clear()
+        for command, value in commands:
+            self._apply_command(command, value)
+        if self._idle_camera is not None and time.perf_counter() >= self._idle_camera_deadline:
+            self._idle_camera.release()
+            self._idle_camera = None
+
+    def _apply_command(self, command, value):
+        if command == "open":
+            self._open_source(*value)
+        elif command == "close":
+            self._close_source()
+        elif command == "rewind":
+            if self.cap is not None and self.source_type == "video":
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                self.current_frame = 0
+                self._reset_clock = True
+                self._is_paused = False
+                self._switch_requested_at = time.perf_counter()
+        elif command == "speed":
+            self.playback_speed = value
+            self._reset_clock = True
+        elif command == "parameters":
+            for name, parameter in value.items():
+                setattr(self, name, parameter)
+            self._reset_clock = True
+            if self.source_type == "webcam" and self.cap is not None:
+                self._configure_camera()
+        elif command in ("seek", "step") and self.cap is not None and self.source_type == "video":
+            # current_frame es la posición tras la última lectura (índice del frame mostrado + 1)
+            target = value if command == "seek" else self.current_frame - 1 + value
+            target = max(0, min(target, max(self.total_frame_count - 1, 0)))
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+            self.current_frame = target
+            self._reset_clock = True
+            if self._is_paused:
+                # En pausa se muestra solo el frame de destino
+                self._pending_frames = 1
+
+    def _open_source(self, source_type, file_path, session, requested_at, start_frame=None):
+        self._close_source()
+        if session != self.session_id:
+            # Ya se pidió otra fuente después de esta: no merece la pena abrirla
+            return
+        # A partir de aquí ningún aviso de la fuente anterior puede salir con este número
+        self.active_session = session
+        self.source_type = source_type
+        self.file_path = file_path
+        self.current_frame = 0
+        self.total_frame_count = 0
+        self.frame_rate = 30
+        self.skipped_frame_count = 0
+        self._frame_counter = 0
+        self._last_detections = None
+        self._pending_frames = 0
+        self._reset_clock = True
         self._is_paused = False
-        # Esperar un momento para asegurar que el bucle principal termine
-        self.msleep(100)
-        # Liberar la cámara si está abierta
-        if self.cap and self.cap.isOpened():
+        self._switch_requested_at = requested_at
+        self._gate_inferred = 0
+        self._gate_skipped = 0
+        if self.motion_gate is not None:
+            self.motion_gate.reset()
+        if self.fps_governor is not None:
+            self.fps_governor.reset()
+
+        if source_type == "webcam":
+            if self._idle_camera is not None and self._idle_camera.isOpened():
+                # Reutilizar la cámara aparcada evita la costosa reapertura del dispositivo
+                self.cap = self._idle_camera
+                self._idle_camera = None
+            else:
+                self.cap = cv2.VideoCapture(0)
+            if not self.cap.isOpened():
+                self.status_update.emit("Error: No se pudo abrir la cámara.")
+                self._end_session()
+                return
+            self._configure_camera()
+            self.status_update.emit("Cámara iniciada. Detectando...")
+        elif source_type == "video":
+            if not file_path:
+                self.status_update.emit("Error: No se proporcionó ruta de video.")
+                self._end_session()
+                return
+            self.cap = cv2.VideoCapture(file_path)
+            if not self.cap.isOpened():
+                self.status_update.emit(f"Error: No se pudo abrir el video: {file_path.split('/')[-1]}")
+                self._end_session()
+                return
+            self.total_frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            self.frame_rate = float(self.cap.get(cv2.CAP_PROP_FPS)) or 30.0
+            if self.timeline is not None:
+                self.timeline.reset(self.total_frame_count)
+            self.total_frames.emit(self.total_frame_count)
+            self.status_update.emit(f"Procesando video: {file_path.split('/')[-1]}")
+            if start_frame is not None:
+                target = max(0, min(int(start_frame), max(self.total_frame_count - 1, 0)))
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+                self.current_frame = target
+                self._is_paused = True
+                self._pending_frames = 1
+        else:
+            self.status_update.emit("Error: Tipo de fuente no reconocido.")
+            self._end_session()
+
+    def _configure_camera(self):
+        """Aplica a la cámara abierta el tamaño de cola del controlador"""
+        # Con el regulador los frames esperan entre turnos: sin cola se lee siempre el más reciente
+        size = self.camera_buffer_size or (1 if self.fps_governor is not None else 0)
+        if size > 0:
+            # Con 1 siempre se lee el frame más reciente (menor latencia)
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, size)
+
+    def _close_source(self):
+        """Cierra la fuente actual; la cámara se aparca en lugar de liberarse"""
+        if self.cap is None:
+            return
+        if self.source_type == "webcam" and self.cap.isOpened():
+            if self._idle_camera is not None:
+                self._idle_camera.release()
+            self._idle_camera = self.cap
+            self._idle_camera_deadline = time.perf_counter() + self.CAMERA_LINGER
+        else:
             self.cap.release()
         self.cap = None
 
-    def run(self):
-        self._is_running = True
-        self._is_paused = False
+    def _end_session(self):
+        """Termina la sesión actual por fin de video o error y avisa a la GUI"""
+        if self.cap is not None:
+            # Una fuente que termina o falla no se aparca
+            self.cap.release()
+            self.cap = None
+        self.processing_finished.emit(self.active_session)
 
+    def _warm_up(self):
+        """Ejecuta una inferencia en vacío para que el primer frame real no pague la inicialización"""
         try:
-            if self.source_type == "webcam":
-                self.cap = cv2.VideoCapture(0)
-                if not self.cap.isOpened():
-                    self.status_update.emit("Error: No se pudo abrir la cámara.")
-                    self._is_running = False
-            elif self.source_type == "video":
-                if not self.file_path:
-                    self.status_update.emit("Error: No se proporcionó ruta de video.")
-                    self._is_running = False
-                else:
-                    self.cap = cv2.VideoCapture(self.file_path)
-                    if not self.cap.isOpened():
-                        self.status_update.emit(f"Error: No se pudo abrir el video: {self.file_path.split('/')[-1]}")
-                        self._is_running = False
-                    else:
-                        self.total_frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
-                        self.frame_rate = int(self.cap.get(cv2.CAP_PROP_FPS))
-                        self.total_frames.emit(self.total_frame_count)
-            else:
-                self.status_update.emit("Error: Tipo de fuente no reconocido.")
-                self._is_running = False
+            size = self.base_inference_size
+            dummy = np.zeros((size, size, 3), dtype=np.uint8)
+            with MODEL_LOCK:
+                self.yolo_model(dummy, imgsz=size, verbose=False)
+        except Exception as e:
+            print(f"Advertencia: no se pudo precalentar el modelo: {e}")
+
+    def _frame_interval(self):
+        """Tiempo de presentación de un frame según FPS de origen y velocidad"""
+        return 1.0 / (self.frame_rate * self.playback_speed)
+
+    def _choose_inference_size(self, frame_interval):
+        """Aprovecha el tiempo sobrante (p. ej. a 0.25x) para usar una entrada mayor"""
+        if self.playback_speed >= 1.0 or self._infer_time_avg <= 0:
+            return self.base_inference_size
+        budget = frame_interval * self.INFERENCE_BUDGET
+        chosen = self.base_inference_size
+        for size in self.INFERENCE_SIZES:
+            if size <= chosen:
+                continue
+            # El coste de la inferencia crece aproximadamente con el área de entrada
+            estimated = self._infer_time_avg * (size / self._infer_time_size) ** 2
+            if estimated <= budget:
+                chosen = size
+        return chosen
+
+    def _run_inference(self, frame_bgr):
+        """Ejecuta YOLO sobre el frame y actualiza la media de latencia"""
+        self._thread_config_version = sync_thread_config(self._thread_config_version)
+        frame_rgb = self.frame_buffers.to_rgb(frame_bgr)
+        start = time.perf_counter()
+        with MODEL_LOCK:
+            results = self.yolo_model(frame_rgb, imgsz=self.inference_size, verbose=False)
+        elapsed = time.perf_counter() - start
+        self._last_inference_latency = elapsed
+        if self._infer_time_avg <= 0 or self._infer_time_size != self.inference_size:
+            self._infer_time_avg = elapsed
+            self._infer_time_size = self.inference_size
+        else:
+            self._infer_time_avg = 0.9 * self._infer_time_avg + 0.1 * elapsed
+        self._last_detections = extract_detections(results)
+        return self._last_detections
+
+    def _record_detections(self, detections):
+        """Envía las detecciones al registro estructurado y al índice, si están activos"""
+        # current_frame es la posición tras la lectura: el frame mostrado es el anterior
+        frame_index = self.current_frame - 1
+        index = self.detection_index
+        if index is not None and self.source_type == "video":
+            index.record(self.file_path, "video", frame_index, frame_index / self.frame_rate,
+                         detections, self.frame_rate)
+        recorder = self.detection_recorder
+        if recorder is None:
+            return
+        if self.source_type == "video":
+            recorder.record(self.file_path, frame_index, frame_index / self.frame_rate, detections)
+        else:
+            recorder.record("webcam", self._frame_counter, time.time(), detections)
+
+    def _motion_gate_closed(self, frame_bgr):
+        """True si la compuerta de movimiento permite saltarse la inferencia de este frame"""
+        gate = self.motion_gate
+        if gate is None or self.source_type != "webcam":
+            return False
+        now = time.perf_counter()
+        # La compuerta se evalúa siempre para mantener el fondo al día
+        motion = gate.has_motion(frame_bgr)
+        closed = (not motion and self._last_detections is not None
+                  and now - self._last_inference_time < gate.heartbeat_seconds)
+        if closed:
+            self._gate_skipped += 1
+        else:
+            self._gate_inferred += 1
+            self._last_inference_time = now
+        if now - self._last_gate_report >= 1.0:
+            self._last_gate_report = now
+            self.motion_gate_stats.emit(self._gate_inferred, self._gate_skipped)
+        return closed
+
+    def _report_skipped(self, count):
+        """Acumula los frames omitidos y lo notifica como máximo dos veces por segundo"""
+        if count <= 0:
+            return
+        self.skipped_frame_count += count
+        now = time.perf_counter()
+        if now - self._last_skip_report >= 0.5:
+            self._last_skip_report = now
+            self.frames_skipped.emit(self.skipped_frame_count)
 
-            if not self._is_running:
-                if self.cap:
-                    self.cap.release()
-                self.processing_finished.emit()
+    def run(self):
+        self._warm_up()
+        try:
+            while self._is_running:
+                self._wait_for_commands()
+                if not self._is_running:
+                    break
+                if self.cap is None:
+                    continue
+                stepping = self._is_paused
+                if stepping:
+                    if self._pending_frames <= 0:
+                        continue
+                    self._pending_frames -= 1
+                try:
+                    self._process_next_frame(stepping)
+                except Exception as e:
+                    self.status_update.emit(f"Error en el procesamiento: {str(e)}")
+                    self._end_session()
+        finally:
+            if self.cap is not None:
+                self.cap.release()
+                self.cap = None
+            if self._idle_camera is not None:
+                self._idle_camera.release()
+                self._idle_camera = None
+            self._is_running = False
+
+    def _process_next_frame(self, stepping):
+        """Lee, analiza y presenta un frame de la fuente actual"""
+        frame_interval = 0.0
+        if self.source_type == "video" and not stepping:
+            frame_interval = self._frame_interval()
+            if self._reset_clock:
+                self._clock_start = time.perf_counter()
+                self._clock_frame = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
+                self._reset_clock = False
+                self.inference_size = self._choose_inference_size(frame_interval)
+
+            # Si la inferencia no alcanza al reloj, descartar frames sin decodificarlos
+            next_frame = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
+            expected_frame = self._clock_frame + int((time.perf_counter() - self._clock_start) / frame_interval)
+            if self.late_policy == "drop" and expected_frame > next_frame:
+                to_skip = min(expected_frame - next_frame, max(0, self.total_frame_count - next_frame - 1))
+                skipped = 0
+                while skipped < to_skip and self.cap.grab():
+                    skipped += 1
+                self._report_skipped(skipped)
+
+        ret, frame_cv = self.frame_buffers.read(self.cap)
+        if not ret:
+            if self.source_type == "video":
+                self.status_update.emit("Video finalizado.")
+                self._end_session()
                 return
+            self.status_update.emit("Error al leer fotograma. Intentando reconectar...")
+            self.cap.release()
+            self.cap = cv2.VideoCapture(0)
+            if not self.cap.isOpened():
+                self.status_update.emit("Fallo al reconectar la cámara.")
+                self._end_session()
+            else:
+                self._configure_camera()
+            return
+
+        self._frame_counter += 1
+        work_start = time.perf_counter()
+        governor = self.fps_governor if self.source_type == "webcam" else None
+        if governor is not None:
+            self.inference_size = governor.current_size(self.base_inference_size)
+        due_time = 0.0
+        if self.source_type == "video":
+            self.current_frame = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
+            self.frame_position.emit(self.current_frame)
+            due_time = self._clock_start + (self.current_frame - self._clock_frame) * frame_interval
+
+        # Procesamiento del frame: con la política "reuse" y retraso, se
+        # reutilizan las últimas detecciones en lugar de frenar la reproducción
+        late = (self.source_type == "video" and not stepping and self.late_policy == "reuse"
+                and self._last_detections is not None
+                and time.perf_counter() - due_time > frame_interval)
+        if late:
+            detections = self._last_detections
+            self._report_skipped(1)
+        elif self._motion_gate_closed(frame_cv):
+            # Escena quieta: las últimas detecciones siguen siendo válidas
+            detections = self._last_detections
+        else:
+            detections = self._run_inference(frame_cv)
+            self._record_detections(detections)
+            if governor is not None and governor.record_inference(self._last_inference_latency, time.perf_counter()):
+                self.fallback_model_requested.emit(governor.fallback_model)
+
+        if self.statistics is not None:
+            self.statistics.add(detections)
+        if self.timeline is not None and self.source_type == "video" and not late:
+            self.timeline.add(self.current_frame - 1, detections)
+
+        # Las detecciones viajan como arreglos y el lienzo las dibuja a resolución de pantalla.
+        # Sin búfer libre la GUI va atrasada: este frame no se presenta
+        if self.present_frames:
+            display = self.frame_buffers.to_display(frame_cv)
+            if display is not None:
+                self.frame_ready.emit(self.active_session, display, detections)
+        # El búfer de captura se reutiliza en la siguiente lectura: el grabador recibe una
+        # copia sobre un búfer de la reserva, que devuelve al terminar de codificarla
+        if self.event_recorder is not None and self.source_type == "webcam":
+            submit_to_event_recorder(self.event_recorder, self.frame_buffers, frame_cv, detections)
+
+        if self._switch_requested_at is not None:
+            # Latencia del cambio: desde la petición de la GUI hasta el primer frame
+            self.source_switched.emit(self.active_session, time.perf_counter() - self._switch_requested_at)
+            self._switch_requested_at = None
+
+        if stepping:
+            self._reset_clock = True
+        elif governor is not None:
+            # Turnos equiespaciados: el trabajo se reparte en lugar de ir a ráfagas
+            now = time.perf_counter()
+            delay = governor.next_delay(now, now - work_start)
+            stats = governor.stats(now)
+            if stats is not None:
+                self.governor_stats.emit(stats)
+            self._wait_for_commands(delay)
+        elif self.source_type == "webcam":
+            self._wait_for_commands(self.webcam_pause)
+        else:
+            # Esperar hasta el instante de presentación del siguiente frame;
+            # un comando (pausa, búsqueda, parada) interrumpe la espera
+            self._wait_for_commands(due_time + frame_interval - time.perf_counter())
 
-            if self.source_type == "webcam":
-                self.status_update.emit("Cámara iniciada. Detectando...")
-            elif self.source_type == "video":
-                self.status_update.emit(f"Procesando video: {self.file_path.split('/')[-1]}")
+    def get_video_duration(self):
+        if self.source_type == "video" and self.frame_rate > 0:
+            return self.total_frame_count / self.frame_rate
+        return 0
 
-            while self._is_running:
-                if self._is_paused:
-                    self.msleep(100)
-                    continue
 
-                if not self.cap or not self.cap.isOpened():
-                    break
+# Lecturas reducidas de OpenCV (escala 1/n) de mayor a menor reducción
+REDUCED_DECODE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
 
-                ret, frame_cv = self.cap.read()
-                if not ret:
-                    if self.source_type == "video":
-                        self.status_update.emit("Video finalizado.")
-                    else:
-                        self.status_update.emit("Error al leer fotograma. Intentando reconectar...")
-                        if self.cap:
-                            self.cap.release()
-                        self.cap = cv2.VideoCapture(0)
-                        if not self.cap.isOpened():
-                            self.status_update.emit("Fallo al reconectar la cámara.")
-                            self._is_running = False
-                        self.msleep(500)
+
+def read_image_header(file_path):
+    """Obtiene formato y tamaño de la imagen sin decodificar los píxeles (requiere Pillow)"""
+    try:
+        from PIL import Image as PILImage
+        with PILImage.open(file_path) as img_pil:
+            return img_pil.format, img_pil.size
+    except Exception:
+        return None, None
+
+
+def load_image_scaled(file_path, max_side=None):
+    """Decodifica la imagen a la menor escala que conserve max_side píxeles en el lado mayor.
+
+    Para JPEG y PNG usa las lecturas reducidas de OpenCV y, si hay que recurrir
+    a PIL, su modo borrador; en ambos casos se respeta la orientación EXIF.
+    Con max_side=None se decodifica a resolución completa. Devuelve la imagen
+    BGR y la escala respecto al original.
+    """
+    image_format, size = read_image_header(file_path)
+    img_cv = None
+    if max_side and size and image_format in ("JPEG", "PNG"):
+        longest = max(size)
+        for factor, flag in REDUCED_DECODE_FLAGS:
+            if longest / factor >= max_side:
+                img_cv = cv2.imread(file_path, flag)
+                break
+    if img_cv is None:
+        img_cv = cv2.imread(file_path)
+    if img_cv is None:
+        try:
+            from PIL import Image as PILImage, ImageOps # Renombrar para evitar conflicto
+            img_pil = PILImage.open(file_path)
+            if max_side:
+                # Solo tiene efecto en JPEG: decodifica a 1/2, 1/4 o 1/8 sin pasar por el tamaño completo
+                img_pil.draft('RGB', (max_side, max_side))
+            img_pil = ImageOps.exif_transpose(img_pil)
+            img_cv = cv2.cvtColor(np.array(img_pil.convert('RGB')), cv2.COLOR_RGB2BGR)
+        except (ImportError, Exception) as pil_error:
+            raise Exception(f"No se pudo cargar la imagen con OpenCV ni PIL: {pil_error}")
+    scale = max(img_cv.shape[:2]) / float(max(size)) if size else 1.0
+    return img_cv, scale
+
+
+def scale_detections(detections, factor):
+    """Devuelve una copia de las detecciones con las cajas escaladas por factor"""
+    if factor == 1.0:
+        return detections
+    scaled = dict(detections)
+    scaled["xyxy"] = detections["xyxy"] * factor
+    return scaled
+
+
+# --- Hilo para el procesamiento de imágenes por lotes ---
+class ImageBatchThread(QThread):
+    """Decodifica imágenes en paralelo y las pasa al modelo en lotes"""
+    image_ready = pyqtSignal(object, object, str, int)  # frame BGRA, detecciones, ruta, nº de objetos
+    image_failed = pyqtSignal(str, str)         # ruta, mensaje de error
+    progress = pyqtSignal(int, int, float)      # procesadas, total, imágenes por segundo
+    batch_finished = pyqtSignal(int, int, float)  # procesadas, total, segundos
+
+    def __init__(self, yolo_model, file_paths, batch_size=4, decode_workers=4, max_side=None, imgsz=None):
+        super().__init__()
+        self.yolo_model = yolo_model
+        self.file_paths = list(file_paths)
+        self.batch_size = max(1, batch_size)
+        # Tamaño de entrada del modelo; None usa el del propio modelo
+        self.imgsz = imgsz
+        self.decode_workers = max(1, decode_workers)
+        # Lado mayor necesario para el modelo y la vista; None decodifica a tamaño completo
+        self.max_side = max_side
+        self.detection_recorder = None
+        self.detection_index = None
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        sync_thread_config(None)
+        total = len(self.file_paths)
+        processed = 0
+        start = time.perf_counter()
+        # cv2.imread libera el GIL, así que la decodificación escala con hilos
+        with ThreadPoolExecutor(max_workers=self.decode_workers) as pool:
+            # Solo se decodifican por adelantado dos lotes para acotar la memoria
+            pending = {}
+            for batch_start in range(0, total, self.batch_size):
+                if self._cancelled:
                     break
+                for index in range(batch_start, min(batch_start + 2 * self.batch_size, total)):
+                    if index not in pending:
+                        pending[index] = pool.submit(load_image_scaled, self.file_paths[index], self.max_side)
+                batch_paths = []
+                batch_images = []
+                batch_scales = []
+                for index in range(batch_start, min(batch_start + self.batch_size, total)):
+                    path = self.file_paths[index]
+                    try:
+                        img_cv, scale = pending.pop(index).result()
+                        batch_images.append(img_cv)
+                        batch_scales.append(scale)
+                        batch_paths.append(path)
+                    except Exception as e:
+                        processed += 1
+                        self.image_failed.emit(path, str(e))
+                if not batch_images:
+                    continue
 
-                if self.source_type == "video":
-                    self.current_frame = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
-                    self.frame_position.emit(self.current_frame)
+                try:
+                    frames_rgb = [cv2.cvtColor(img, cv2.COLOR_BGR2RGB) for img in batch_images]
+                    options = {"imgsz": self.imgsz} if self.imgsz else {}
+                    with MODEL_LOCK:
+                        results = self.yolo_model(frames_rgb, verbose=False, **options)
+                except Exception as e:
+                    for path in batch_paths:
+                        processed += 1
+                        self.image_failed.emit(path, str(e))
+                    continue
 
-                # Procesamiento del frame
-                frame_rgb = cv2.cvtColor(frame_cv, cv2.COLOR_BGR2RGB)
-                results = self.yolo_model(frame_rgb, verbose=False)
-
-                # Dibujar detecciones
-                for r in results:
-                    boxes, names = r.boxes, r.names
-                    if boxes is not None:
-                        for i in range(len(boxes)):
-                            box_coords = boxes[i].xyxy[0].cpu().numpy().astype(int)
-                            cls_id = int(boxes[i].cls.cpu().numpy()[0])
-                            conf = float(boxes[i].conf.cpu().numpy()[0])
-                            label = f"{names[cls_id]}: {conf:.2f}"
-                            
-                            detection_color = (79, 70, 229)
-                            text_bg_color = (67, 56, 202)
-                            text_fg_color = (255, 255, 255)
-
-                            cv2.rectangle(frame_cv, (box_coords[0], box_coords[1]), 
-                                        (box_coords[2], box_coords[3]), detection_color, 2)
-                            
-                            (w, h), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_DUPLEX, 0.6, 1)
-                            cv2.rectangle(frame_cv, (box_coords[0], box_coords[1] - h - 10), 
-                                        (box_coords[0] + w + 4, box_coords[1] - 5), text_bg_color, -1)
-                            cv2.putText(frame_cv, label, (box_coords[0] + 2, box_coords[1] - 7), 
-                                        cv2.FONT_HERSHEY_DUPLEX, 0.6, text_fg_color, 1, cv2.LINE_AA)
-
-                rgb_image_display = cv2.cvtColor(frame_cv, cv2.COLOR_BGR2RGB)
-                h, w, ch = rgb_image_display.shape
-                bytes_per_line = ch * w
-                qt_image = QImage(rgb_image_display.data, w, h, bytes_per_line, QImage.Format.Format_RGB888)
-                self.frame_ready.emit(QPixmap.fromImage(qt_image))
-
-                if self.source_type == "webcam":
-                    self.msleep(10)
+                for path, img_cv, scale, result in zip(batch_paths, batch_images, batch_scales, results):
+                    if self._cancelled:
+                        break
+                    detections = extract_detections([result])
+                    if self.detection_recorder is not None or self.detection_index is not None:
+                        # El registro guarda las cajas en coordenadas de la imagen original
+                        original = scale_detections(detections, 1.0 / scale)
+                        if self.detection_recorder is not None:
+                            self.detection_recorder.record(path, 0, 0.0, original)
+                        if self.detection_index is not None:
+                            self.detection_index.record(path, "image", 0, 0.0, original)
+                    processed += 1
+                    self.image_ready.emit(bgr_to_display(img_cv), detections, path, len(detections["cls"]))
+                    elapsed = time.perf_counter() - start
+                    self.progress.emit(processed, total, processed / max(elapsed, 1e-6))
+
+            if self._cancelled:
+                for future in pending.values():
+                    future.cancel()
+        self.batch_finished.emit(processed, total, time.perf_counter() - start)
+
+
+# --- Galería de carpetas: miniaturas en caché y precarga de detecciones ---
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".webp", ".gif")
+
+
+def list_images(folder, limit=None):
+    """Imágenes de una carpeta en orden; con limit se toma una muestra repartida"""
+    paths = sorted(
+        entry.path for entry in os.scandir(folder)
+        if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    if limit and len(paths) > limit:
+        step = len(paths) / float(limit)
+        paths = [paths[int(i * step)] for i in range(limit)]
+    return paths
+
+
+def fit_within(img, max_side):
+    """Reduce la imagen para que su lado mayor no supere max_side"""
+    h, w = img.shape[:2]
+    scale = max_side / float(max(h, w))
+    if scale >= 1.0:
+        return img
+    return cv2.resize(img, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+
+
+def bgr_to_qimage(img_bgr):
+    """Convierte un arreglo BGR en una QImage independiente de los datos NumPy"""
+    rgb_image = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
+    h, w, ch = rgb_image.shape
+    return QImage(rgb_image.data, w, h, ch * w, QImage.Format.Format_RGB888).copy()
+
+
+class ThumbnailCache:
+    """Genera miniaturas bajo demanda y las guarda en disco para las siguientes visitas.
+
+    La carpeta está acotada a max_mb: prune() borra las miniaturas usadas hace
+    más tiempo (cada acierto actualiza la fecha del archivo) hasta dejarla en
+    el 80 % del límite.
+    """
+
+    def __init__(self, cache_dir=None, size=160, max_mb=256):
+        self.cache_dir = cache_dir or os.path.join(os.path.expanduser("~"), ".cache", "yolo_vision_pro", "miniaturas")
+        self.size = size
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def prune(self):
+        """Aplica el límite de tamaño de la carpeta; devuelve cuántas miniaturas se borraron"""
+        entries = []
+        total = 0
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if entry.name.endswith(".jpg") and entry.is_file():
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+                        total += stat.st_size
+        except OSError:
+            return 0
+        if total <= self.max_bytes:
+            return 0
+        removed = 0
+        target = self.max_bytes * 0.8
+        for _, file_size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= file_size
+            removed += 1
+        return removed
+
+    def _cache_path(self, file_path):
+        # La clave incluye fecha y tamaño para invalidar miniaturas de archivos modificados
+        stat = os.stat(file_path)
+        key = f"{os.path.abspath(file_path)}|{stat.st_mtime_ns}|{stat.st_size}|{self.size}"
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".jpg")
+
+    def load(self, file_path):
+        """Devuelve la miniatura BGR, generándola y guardándola si no existe"""
+        cache_path = self._cache_path(file_path)
+        if os.path.exists(cache_path):
+            thumb = cv2.imread(cache_path)
+            if thumb is not None:
+                try:
+                    # La fecha de modificación marca el último uso para prune()
+                    os.utime(cache_path)
+                except OSError:
+                    pass
+                return thumb
+        thumb = fit_within(load_image_scaled(file_path, self.size)[0], self.size)
+        cv2.imwrite(cache_path, thumb, [cv2.IMWRITE_JPEG_QUALITY, 85])
+        return thumb
 
-        except Exception as e:
-            self.status_update.emit(f"Error en el procesamiento: {str(e)}")
-        finally:
-            if self.cap:
-                self.cap.release()
-            self.cap = None
+
+class ThumbnailLoaderThread(QThread):
+    """Atiende peticiones de miniaturas; las más recientes (las visibles) primero"""
+    thumbnail_ready = pyqtSignal(int, QImage)
+
+    def __init__(self, cache, file_paths):
+        super().__init__()
+        self.cache = cache
+        self.file_paths = file_paths
+        self._requests = deque()
+        self._requested = set()
+        self._cond = threading.Condition()
+        self._is_running = True
+
+    def request(self, indices):
+        with self._cond:
+            for index in indices:
+                if index not in self._requested:
+                    self._requested.add(index)
+                    self._requests.append(index)
+            self._cond.notify()
+
+    def forget(self, index):
+        """Permite volver a pedir una miniatura expulsada de memoria"""
+        with self._cond:
+            self._requested.discard(index)
+
+    def stop(self):
+        with self._cond:
             self._is_running = False
-            self.processing_finished.emit()
+            self._cond.notify()
 
-    def _stop_current_media_if_running(self):
-        """Detiene el procesamiento actual si hay alguno en curso"""
-        if self.media_thread and self.media_thread.isRunning():
+    def run(self):
+        # Recortar la caché aquí y no al abrir la galería: recorrer la carpeta no bloquea la GUI
+        self.cache.prune()
+        while True:
+            with self._cond:
+                while self._is_running and not self._requests:
+                    self._cond.wait()
+                if not self._is_running:
+                    return
+                index = self._requests.pop()
             try:
-                # Detener el hilo
-                self.media_thread.stop()
-                
-                # Esperar a que el hilo termine (con timeout)
-                start_time = time.time()
-                while self.media_thread.isRunning() and (time.time() - start_time) < 2.0:
-                    QApplication.processEvents()
-                    self.media_thread.wait(100)
-                
-                if self.media_thread.isRunning():
-                    print("Advertencia: El hilo no se detuvo correctamente")
-                    self.media_thread.terminate()
-                
-                # Asegurar que la cámara se ha liberado
-                if hasattr(self.media_thread, 'cap') and self.media_thread.cap:
-                    self.media_thread.cap.release()
-                    self.media_thread.cap = None
-                
-                self.media_thread = None
-                
-                # Limpiar la interfaz
-                self._clear_display()
-                if hasattr(self, 'video_controls'):
-                    self.video_controls.setVisible(False)
-                
-                return True
-            except Exception as e:
-                print(f"Error al detener el medio actual: {e}")
-                if self.media_thread:
-                    self.media_thread.terminate()
-                    self.media_thread = None
-                return True
-        return False
+                thumb = self.cache.load(self.file_paths[index])
+            except Exception:
+                continue
+            self.thumbnail_ready.emit(index, bgr_to_qimage(thumb))
 
-    def _start_webcam_mode(self):
-        """Inicia el modo de cámara web"""
-        if not self.yolo_model:
-            QMessageBox.warning(self, "Modelo no cargado", "El modelo YOLO aún no ha terminado de cargar.")
-            return
 
-        try:
-            # Detener cualquier procesamiento activo y esperar a que termine
-            if self._stop_current_media_if_running():
-                # Esperar un momento para asegurar que todo se ha liberado
-                QTimer.singleShot(1000, self._actually_start_webcam)
-            else:
-                self._actually_start_webcam()
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Error al iniciar la cámara web:\n{str(e)}")
+class GalleryPrefetchThread(QThread):
+    """Calcula las detecciones de las imágenes siguientes al cursor antes de que se pidan"""
+    annotated_ready = pyqtSignal(int, object, object, int)  # índice, frame BGRA, detecciones, nº de objetos
+    annotation_failed = pyqtSignal(int, str)
 
-    def _actually_start_webcam(self):
-        """Función interna para iniciar la cámara web"""
+    def __init__(self, yolo_model, file_paths, lookahead=3, max_display_side=1920):
+        super().__init__()
+        self.yolo_model = yolo_model
+        self.file_paths = file_paths
+        self.lookahead = lookahead
+        self.max_display_side = max_display_side
+        # Ventana de precarga más algunas imágenes ya vistas para poder volver atrás
+        self.cache_size = lookahead + 4
+        self._cache = OrderedDict()
+        self._failed = set()
+        self._thread_config_version = None
+        self._cursor = 0
+        self._cond = threading.Condition()
+        self._is_running = True
+
+    def set_cursor(self, index):
+        with self._cond:
+            self._cursor = index
+            self._cond.notify()
+
+    def cached(self, index):
+        with self._cond:
+            return self._cache.get(index)
+
+    def stop(self):
+        with self._cond:
+            self._is_running = False
+            self._cond.notify()
+
+    def _next_missing(self):
+        end = min(self._cursor + self.lookahead + 1, len(self.file_paths))
+        for index in range(self._cursor, end):
+            if index not in self._cache and index not in self._failed:
+                return index
+        return None
+
+    def _evict(self):
+        # Se descartan primero las entradas más alejadas del cursor
+        while len(self._cache) > self.cache_size:
+            farthest = max(self._cache, key=lambda i: abs(i - self._cursor))
+            del self._cache[farthest]
+
+    def run(self):
+        while True:
+            with self._cond:
+                while self._is_running and self._next_missing() is None:
+                    self._cond.wait()
+                if not self._is_running:
+                    return
+                index = self._next_missing()
+            try:
+                self._thread_config_version = sync_thread_config(self._thread_config_version)
+                img_cv = load_image_scaled(self.file_paths[index], self.max_display_side)[0]
+                frame_rgb = cv2.cvtColor(img_cv, cv2.COLOR_BGR2RGB)
+                with MODEL_LOCK:
+                    results = self.yolo_model(frame_rgb, verbose=False)
+                detections = extract_detections(results)
+                # Guardar a resolución de pantalla para acotar la memoria de la caché
+                display = fit_within(img_cv, self.max_display_side)
+                detections = scale_detections(detections, display.shape[1] / img_cv.shape[1])
+                frame = bgr_to_display(display)
+                count = len(detections["cls"])
+            except Exception as e:
+                with self._cond:
+                    self._failed.add(index)
+                self.annotation_failed.emit(index, str(e))
+                continue
+            with self._cond:
+                self._cache[index] = (frame, detections, count)
+                self._evict()
+            self.annotated_ready.emit(index, frame, detections, count)
+
+
+class FullResolutionLoaderThread(QThread):
+    """Decodifica una imagen a resolución completa para el zoom, fuera del hilo de la GUI.
+
+    Las imágenes se muestran con una decodificación reducida al área visible;
+    cuando el zoom amplía sus píxeles se pide esta versión. Si el original no
+    es mayor que lo ya mostrado no se emite nada.
+    """
+    decoded = pyqtSignal(str, object)  # ruta, frame BGRA a resolución completa
+
+    def __init__(self, file_path, shown_side):
+        super().__init__()
+        self.file_path = file_path
+        self.shown_side = shown_side
+
+    def run(self):
         try:
-            # Verificar nuevamente que no haya procesamiento activo
-            if self.media_thread and self.media_thread.isRunning():
-                QMessageBox.warning(self, "Error", "No se pudo detener el procesamiento anterior.")
+            size = read_image_header(self.file_path)[1]
+            if size and max(size) <= self.shown_side:
+                return
+            img_cv = load_image_scaled(self.file_path)[0]
+            if max(img_cv.shape[:2]) <= self.shown_side:
                 return
+            self.decoded.emit(self.file_path, bgr_to_display(img_cv))
+        except Exception as e:
+            print(f"No se pudo decodificar a resolución completa {self.file_path}: {e}")
 
-            # Ocultar controles de video si están visibles
-            if hasattr(self, 'video_controls'):
-                self.video_controls.setVisible(False)
 
-            # Limpiar cualquier estado anterior
-            self._clear_display()
-            self.current_source_type = "webcam"
-            self.current_media_path = None
+# --- Registro estructurado de detecciones ---
+class DetectionRecorder(QThread):
+    """Escribe las detecciones de cada frame en JSON Lines y en bloques columnares.
 
-            # Iniciar la cámara
-            self._start_media_processing_thread("webcam")
+    El hilo de inferencia solo encola; toda la E/S ocurre en este hilo. La cola
+    y los bloques columnares están acotados, así que la memoria no crece aunque
+    la sesión dure horas: si el disco no da abasto se descartan frames y se
+    cuentan en ``dropped_frames``.
+    """
+    status_update = pyqtSignal(str)
+
+    COLUMNS = ("frame", "timestamp", "cls", "conf", "x1", "y1", "x2", "y2")
+
+    def __init__(self, jsonl_path, chunk_rows=50000, queue_size=512, flush_interval=1.0):
+        super().__init__()
+        self.jsonl_path = jsonl_path
+        self.columns_dir = os.path.splitext(jsonl_path)[0] + "_columnas"
+        self.chunk_rows = chunk_rows
+        self.flush_interval = flush_interval
+        self.dropped_frames = 0
+        self.recorded_frames = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._chunk_index = 0
+        self._pending = []
+        self._pending_rows = 0
+
+    def record(self, source, frame_index, timestamp, detections):
+        """Encola las detecciones de un frame sin bloquear nunca al llamador"""
+        try:
+            self._queue.put_nowait((source, frame_index, timestamp, detections))
+        except queue.Full:
+            self.dropped_frames += 1
+
+    def close(self):
+        """Vacía la cola, cierra los archivos y espera al hilo"""
+        close_queue_worker(self, self._queue)
+
+    def _write_jsonl(self, handle, source, frame_index, timestamp, detections):
+        handle.write(json.dumps({"source": source, "frame": frame_index, "timestamp": timestamp,
+                                 "detections": detections_to_records(detections)}, ensure_ascii=False))
+        handle.write("\n")
+
+    def _append_columns(self, frame_index, timestamp, detections):
+        count = len(detections["cls"])
+        if count == 0:
+            return
+        # frame y timestamp van aparte: en float32 se perderían los números de
+        # frame grandes y los segundos de time.time()
+        frames = np.full(count, frame_index, dtype=np.int64)
+        timestamps = np.full(count, timestamp, dtype=np.float64)
+        block = np.empty((count, len(self.COLUMNS) - 2), dtype=np.float32)
+        block[:, 0] = detections["cls"]
+        block[:, 1] = detections["conf"]
+        block[:, 2:6] = detections["xyxy"]
+        self._pending.append((frames, timestamps, block))
+        self._pending_rows += count
+        if self._pending_rows >= self.chunk_rows:
+            self._flush_columns()
+
+    def _flush_columns(self):
+        """Guarda las filas pendientes como un bloque .npz comprimido por columnas"""
+        if not self._pending:
+            return
+        frames, timestamps, blocks = (np.concatenate(parts) for parts in zip(*self._pending))
+        self._pending = []
+        self._pending_rows = 0
+        os.makedirs(self.columns_dir, exist_ok=True)
+        self._chunk_index += 1
+        chunk_path = os.path.join(self.columns_dir, f"bloque_{self._chunk_index:06d}.npz")
+        columns = {"frame": frames, "timestamp": timestamps}
+        columns.update((name, blocks[:, i]) for i, name in enumerate(self.COLUMNS[2:]))
+        np.savez_compressed(chunk_path, **columns)
+
+    def run(self):
+        try:
+            with open(self.jsonl_path, "a", encoding="utf-8", buffering=1024 * 1024) as handle:
+                last_flush = time.perf_counter()
+                while True:
+                    try:
+                        item = self._queue.get(timeout=self.flush_interval)
+                    except queue.Empty:
+                        item = False
+                    if item is None:
+                        break
+                    if item:
+                        source, frame_index, timestamp, detections = item
+                        self._write_jsonl(handle, source, frame_index, timestamp, detections)
+                        self._append_columns(frame_index, timestamp, detections)
+                        self.recorded_frames += 1
+                    now = time.perf_counter()
+                    if now - last_flush >= self.flush_interval:
+                        handle.flush()
+                        last_flush = now
+                self._flush_columns()
         except Exception as e:
-            QMessageBox.critical(self, "Error", f"Error al iniciar la cámara web:\n{str(e)}")
+            self.status_update.emit(f"Error al registrar detecciones: {str(e)}")
 
-    def toggle_pause(self):
-        self._is_paused = not self._is_paused
-        if self._is_paused:
-            self.status_update.emit("Procesamiento pausado.")
+
+# --- Exportación de video anotado ---
+class VideoEncoderThread(QThread):
+    """Codifica frames anotados en su propio hilo para solapar escritura e inferencia"""
+    encoder_error = pyqtSignal(str)
+
+    def __init__(self, output_path, codec, fps, frame_size, quality=95, queue_size=64):
+        super().__init__()
+        self.output_path = output_path
+        self.codec = codec
+        self.fps = fps
+        self.frame_size = frame_size
+        self.quality = quality
+        self.frames_written = 0
+        self._failed = False
+        self._opened = threading.Event()
+        # Cola acotada: si el codificador va lento, el productor espera (contrapresión)
+        self._queue = queue.Queue(maxsize=queue_size)
+
+    def wait_until_open(self):
+        """Espera a que el hilo intente abrir el archivo; True si el escritor está listo"""
+        self._opened.wait()
+        return not self._failed
+
+    def submit(self, frame_bgr):
+        """Encola un frame para codificar; se descarta si el escritor falló"""
+        if not self._failed:
+            self._queue.put(frame_bgr)
+
+    def finish(self):
+        """Indica que no habrá más frames"""
+        self._queue.put(None)
+
+    def run(self):
+        try:
+            writer = cv2.VideoWriter(self.output_path, cv2.VideoWriter_fourcc(*self.codec),
+                                     self.fps, self.frame_size)
+        except cv2.error:
+            # Un códec no válido puede lanzar en lugar de devolver un escritor cerrado
+            writer = cv2.VideoWriter()
+        if not writer.isOpened():
+            self._failed = True
+            self.encoder_error.emit(f"No se pudo crear el archivo de salida con el códec {self.codec}.")
         else:
-            self.status_update.emit("Procesamiento reanudado.")
-        return self._is_paused
+            # La calidad solo la respetan algunos códecs (p. ej. MJPG)
+            writer.set(cv2.VIDEOWRITER_PROP_QUALITY, self.quality)
+        # El productor espera este aviso antes de empezar a inferir
+        self._opened.set()
+        try:
+            while True:
+                frame = self._queue.get()
+                if frame is None:
+                    break
+                if not self._failed:
+                    writer.write(frame)
+                    self.frames_written += 1
+        finally:
+            writer.release()
 
-    def seek_to_frame(self, frame_number):
-        if self.cap and self.source_type == "video":
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
-            self.current_frame = frame_number
 
-    def get_video_duration(self):
-        if self.cap and self.source_type == "video":
-            return self.total_frame_count / self.frame_rate
-        return 0
+class VideoExportThread(QThread):
+    """Procesa un video completo sin mostrarlo y guarda el resultado anotado"""
+    progress = pyqtSignal(int, int, float)  # frame actual, total, ETA en segundos
+    status_update = pyqtSignal(str)
+    export_finished = pyqtSignal(bool, str)
 
-# --- Ventana Principal ---
-class MainWindow(QMainWindow):
-    def __init__(self):
+    CODECS = {"mp4v": ".mp4", "avc1": ".mp4", "XVID": ".avi", "MJPG": ".avi"}
+
+    def __init__(self, model_path, input_path, output_path, codec="mp4v", target_height=None, quality=95):
         super().__init__()
-        self.setWindowTitle("YOLO Vision Pro - Tomson")
-        self.setGeometry(50, 50, 1280, 850)
+        self.model_path = model_path
+        self.input_path = input_path
+        self.output_path = output_path
+        self.codec = codec
+        self.target_height = target_height
+        self.quality = quality
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def _output_size(self, width, height):
+        """Calcula la resolución de salida manteniendo la relación de aspecto"""
+        if not self.target_height or self.target_height >= height:
+            return width, height
+        out_w = int(round(width * self.target_height / height / 2.0)) * 2
+        return out_w, int(self.target_height)
+
+    def _partial_path(self):
+        """Archivo temporal junto al destino; conserva la extensión para que OpenCV elija el contenedor"""
+        base, ext = os.path.splitext(self.output_path)
+        return f"{base}.parcial{ext}"
 
-        # Quitar barra de título estándar pero mantener el título en la barra de tareas
-        self.setWindowFlags(Qt.WindowType.FramelessWindowHint | Qt.WindowType.WindowSystemMenuHint | Qt.WindowType.WindowMinMaxButtonsHint)
-        
-        self.dark_mode = True
-        self.setStyleSheet(self._get_app_style_dark() if self.dark_mode else self._get_app_style_light())
+    def run(self):
+        cap = None
+        encoder = None
+        completed = False
+        partial_path = self._partial_path()
+        try:
+            sync_thread_config(None)
+            self.status_update.emit("Exportación: cargando modelo...")
+            # Modelo propio: el predictor de ultralytics no es seguro entre hilos
+            model = YOLO(self.model_path)
+            cap = cv2.VideoCapture(self.input_path)
+            if not cap.isOpened():
+                self.export_finished.emit(False, f"No se pudo abrir el video: {os.path.basename(self.input_path)}")
+                return
 
-        self.yolo_model = None
-        self.media_thread = None
-        self.current_media_path = None
-        self.current_source_type = None
-        self._is_dragging = False
-        self._drag_position = None
+            total_frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            fps = float(cap.get(cv2.CAP_PROP_FPS)) or 30.0
+            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            out_size = self._output_size(width, height)
+
+            # Se escribe en un archivo parcial que solo sustituye al destino si la exportación termina bien
+            encoder = VideoEncoderThread(partial_path, self.codec, fps, out_size, self.quality)
+            encoder.encoder_error.connect(self.status_update)
+            encoder.start()
+            if not encoder.wait_until_open():
+                self.export_finished.emit(
+                    False, f"No se pudo crear el archivo de salida con el códec {self.codec}.")
+                return
 
-        # Referencias a los botones principales
-        self.archivo_btn = None
-        self.camara_btn = None
-        self.play_pause_btn = None
-        self.stop_btn = None
+            processed = 0
+            start = time.perf_counter()
+            last_report = 0.0
+            while not self._cancelled:
+                ret, frame_cv = cap.read()
+                if not ret:
+                    break
+                frame_rgb = cv2.cvtColor(frame_cv, cv2.COLOR_BGR2RGB)
+                draw_detections(frame_cv, extract_detections(model(frame_rgb, verbose=False)))
+                if out_size != (width, height):
+                    frame_cv = cv2.resize(frame_cv, out_size, interpolation=cv2.INTER_AREA)
+                encoder.submit(frame_cv)
+                processed += 1
+
+                now = time.perf_counter()
+                if now - last_report >= 0.25:
+                    last_report = now
+                    rate = processed / max(now - start, 1e-6)
+                    remaining = max(total_frame_count - processed, 0)
+                    self.progress.emit(processed, total_frame_count, remaining / rate if rate > 0 else 0.0)
+
+            encoder.finish()
+            encoder.wait()
+            if self._cancelled:
+                self.export_finished.emit(False, "Exportación cancelada.")
+            elif encoder.frames_written == 0:
+                self.export_finished.emit(False, "No se escribió ningún frame.")
+            else:
+                os.replace(partial_path, self.output_path)
+                completed = True
+                elapsed = time.perf_counter() - start
+                self.progress.emit(processed, total_frame_count, 0.0)
+                self.export_finished.emit(
+                    True, f"Video exportado: {os.path.basename(self.output_path)} "
+                          f"({encoder.frames_written} frames en {elapsed:.1f}s)")
+        except Exception as e:
+            self.export_finished.emit(False, f"Error en la exportación: {str(e)}")
+        finally:
+            if encoder is not None and encoder.isRunning():
+                encoder.finish()
+                encoder.wait()
+            if cap is not None:
+                cap.release()
+            if not completed and os.path.exists(partial_path):
+                try:
+                    os.remove(partial_path)
+                except OSError:
+                    pass
+
+
+class ExportSettingsDialog(QDialog):
+    """Diálogo con las opciones de códec, resolución y calidad de la exportación"""
+    RESOLUTIONS = [("Original", None), ("1080p", 1080), ("720p", 720), ("480p", 480)]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Exportar video anotado")
+        layout = QFormLayout(self)
+
+        self.codec_combo = QComboBox()
+        self.codec_combo.addItems(list(VideoExportThread.CODECS.keys()))
+        layout.addRow("Códec:", self.codec_combo)
+
+        self.resolution_combo = QComboBox()
+        for label, _ in self.RESOLUTIONS:
+            self.resolution_combo.addItem(label)
+        layout.addRow("Resolución:", self.resolution_combo)
+
+        self.quality_spin = QSpinBox()
+        self.quality_spin.setRange(1, 100)
+        self.quality_spin.setValue(95)
+        layout.addRow("Calidad:", self.quality_spin)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addRow(buttons)
+
+    def settings(self):
+        return {
+            "codec": self.codec_combo.currentText(),
+            "target_height": self.RESOLUTIONS[self.resolution_combo.currentIndex()][1],
+            "quality": self.quality_spin.value(),
+        }
 
-        self._init_ui()
-        self._load_yolo_model_async()
 
-    def _get_app_style_dark(self):
-        return """
-            QMainWindow {
-                background-color: #171721; /* Fondo más oscuro y elegante */
-                color: #E0E0FF;
-                font-family: 'Segoe UI', 'Roboto', sans-serif;
-            }
-            QWidget {
-                color: #E0E0FF;
-                font-size: 10pt;
-            }
-            QLabel#VideoLabel {
-                background-color: #1E1E2A;
-                border: 2px solid #2A2A3A;
-                border-radius: 15px;
-                color: #E0E0FF;
-                padding: 8px;
-            }
-            QPushButton {
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:0, 
-                    stop:0 #4A3AFF, stop:1 #3AFFED);
-                color: white;
-                border: none;
-                padding: 12px 24px;
-                font-size: 11pt;
-                border-radius: 8px;
-                font-weight: bold;
-                min-height: 30px;
-            }
-            QPushButton:hover {
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:0, 
-                    stop:0 #5A4AFF, stop:1 #4AFFFD);
-                color: white;
-            }
-            QPushButton:pressed {
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:0, 
-                    stop:0 #3A2AEF, stop:1 #2AEFDD);
-            }
-            QPushButton:disabled {
-                background: #2A2A3A;
-                color: #505060;
-            }
-            QComboBox {
-                background-color: #2A2A3A;
-                color: #E0E0FF;
-                border: 2px solid #3A3A4A;
-                padding: 10px;
-                border-radius: 8px;
-                min-height: 28px;
-                font-weight: 600;
-            }
-            QComboBox:hover {
-                border-color: #4A3AFF;
-            }
-            QComboBox::drop-down {
-                border: none;
-                width: 30px;
-            }
-            QComboBox QAbstractItemView {
-                background-color: #2A2A3A;
-                color: #E0E0FF;
-                selection-background-color: #4A3AFF;
-                selection-color: white;
-                border: 1px solid #3A3A4A;
-                padding: 5px;
+# --- Cuantización del modelo para CPU ---
+QUANTIZED_MODEL_DIR = os.path.join(os.path.expanduser("~"), ".cache", "yolo_vision_pro", "modelos")
+
+
+def letterbox_tensor(img_bgr, size=640):
+    """Prepara una imagen como la entrada del modelo exportado: RGB, NCHW, [0, 1], con relleno 114"""
+    h, w = img_bgr.shape[:2]
+    scale = min(size / h, size / w)
+    new_w, new_h = int(round(w * scale)), int(round(h * scale))
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    top, left = (size - new_h) // 2, (size - new_w) // 2
+    canvas[top:top + new_h, left:left + new_w] = cv2.resize(img_bgr, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    tensor = cv2.cvtColor(canvas, cv2.COLOR_BGR2RGB).transpose(2, 0, 1)[np.newaxis]
+    return np.ascontiguousarray(tensor, dtype=np.float32) / 255.0
+
+
+def box_iou(boxes_a, boxes_b):
+    """IoU entre dos conjuntos de cajas xyxy (matriz len(a) x len(b))"""
+    if len(boxes_a) == 0 or len(boxes_b) == 0:
+        return np.zeros((len(boxes_a), len(boxes_b)), dtype=np.float32)
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    inter = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(boxes_a[:, 2:] - boxes_a[:, :2], axis=1)
+    area_b = np.prod(boxes_b[:, 2:] - boxes_b[:, :2], axis=1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def detection_agreement(reference, candidate, iou_threshold=0.5):
+    """Coincidencias entre dos juegos de detecciones (misma clase e IoU >= umbral).
+
+    Devuelve (coincidencias, nº de referencia, nº del candidato); el emparejamiento
+    es voraz por IoU descendente, como en la evaluación habitual de detectores.
+    """
+    iou = box_iou(reference["xyxy"], candidate["xyxy"])
+    iou[reference["cls"][:, None] != candidate["cls"][None, :]] = 0.0
+    matched = 0
+    while iou.size and iou.max() >= iou_threshold:
+        i, j = np.unravel_index(np.argmax(iou), iou.shape)
+        iou[i, :] = 0.0
+        iou[:, j] = 0.0
+        matched += 1
+    return matched, len(reference["cls"]), len(candidate["cls"])
+
+
+class ModelQuantizationThread(QThread):
+    """Genera una variante INT8 del modelo calibrada con imágenes propias y la compara con FP32.
+
+    El modelo se exporta a ONNX con forma de entrada dinámica (la aplicación
+    cambia el tamaño de entrada y procesa lotes) y se cuantiza de forma
+    estática con onnxruntime usando la carpeta de calibración; el resultado y su informe
+    se guardan en caché con una clave que depende del modelo y de las
+    imágenes, así que repetir la operación con los mismos datos es inmediato.
+    """
+    status_update = pyqtSignal(str)
+    progress = pyqtSignal(int, int)
+    quantization_finished = pyqtSignal(bool, str, object)  # éxito, mensaje, informe
+
+    def __init__(self, model_path, calibration_dir, sample_limit=64, imgsz=640):
+        super().__init__()
+        self.model_path = model_path
+        self.calibration_dir = calibration_dir
+        self.sample_limit = sample_limit
+        self.imgsz = imgsz
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def _cache_key(self, images):
+        stat = os.stat(self.model_path)
+        parts = [os.path.abspath(self.model_path), str(stat.st_mtime), str(stat.st_size), str(self.imgsz),
+                 "dinamico"]
+        for path in images:
+            image_stat = os.stat(path)
+            parts.append(f"{path}|{image_stat.st_mtime}|{image_stat.st_size}")
+        return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()[:12]
+
+    def run(self):
+        try:
+            from onnxruntime.quantization import (
+                CalibrationDataReader, QuantFormat, QuantType, quantize_static
+            )
+        except ImportError:
+            self.quantization_finished.emit(
+                False, "La cuantización requiere onnx y onnxruntime:\npip install -r requirements-int8.txt", None)
+            return
+
+        try:
+            images = list_images(self.calibration_dir, self.sample_limit)
+            if not images:
+                self.quantization_finished.emit(False, "La carpeta de calibración no contiene imágenes.", None)
+                return
+
+            os.makedirs(QUANTIZED_MODEL_DIR, exist_ok=True)
+            stem = os.path.splitext(os.path.basename(self.model_path))[0]
+            base = os.path.join(QUANTIZED_MODEL_DIR, f"{stem}_{self._cache_key(images)}")
+            int8_path = base + "_int8.onnx"
+            report_path = base + "_informe.json"
+            if os.path.exists(int8_path) and os.path.exists(report_path):
+                with open(report_path, "r", encoding="utf-8") as f:
+                    report = json.load(f)
+                self.quantization_finished.emit(True, "Modelo INT8 recuperado de la caché.", report)
+                return
+
+            if not os.path.exists(int8_path):
+                self.status_update.emit("Cuantización: exportando a ONNX...")
+                fp32_onnx = YOLO(self.model_path).export(format="onnx", imgsz=self.imgsz, dynamic=True)
+                fp32_path = base + "_fp32.onnx"
+                os.replace(fp32_onnx, fp32_path)
+
+                thread = self
+
+                class FolderCalibrationReader(CalibrationDataReader):
+                    """Entrega las imágenes de calibración con el preprocesado del modelo"""
+
+                    def __init__(self):
+                        self._paths = iter(images)
+                        self._done = 0
+
+                    def get_next(self):
+                        for path in self._paths:
+                            if thread._cancelled:
+                                return None
+                            self._done += 1
+                            thread.progress.emit(self._done, len(images))
+                            try:
+                                img_cv = load_image_scaled(path, thread.imgsz)[0]
+                            except Exception:
+                                continue
+                            return {"images": letterbox_tensor(img_cv, thread.imgsz)}
+                        return None
+
+                self.status_update.emit(f"Cuantización: calibrando con {len(images)} imágenes...")
+                quantize_static(
+                    fp32_path, int8_path, FolderCalibrationReader(),
+                    quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8,
+                    weight_type=QuantType.QInt8,
+                    per_channel=True,
+                )
+                if self._cancelled:
+                    if os.path.exists(int8_path):
+                        os.remove(int8_path)
+                    self.quantization_finished.emit(False, "Cuantización cancelada.", None)
+                    return
+
+            report = self._compare(images, int8_path)
+            if self._cancelled:
+                # Un informe parcial se quedaría en caché para siempre
+                self.quantization_finished.emit(False, "Cuantización cancelada.", None)
+                return
+            with open(report_path, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            self.quantization_finished.emit(True, "Modelo INT8 generado.", report)
+        except Exception as e:
+            self.quantization_finished.emit(False, f"Error durante la cuantización: {e}", None)
+
+    def _compare(self, images, int8_path):
+        """Mide la latencia de ambos modelos y la coincidencia de sus detecciones"""
+        self.status_update.emit("Cuantización: comparando con el modelo FP32...")
+        reference_model = YOLO(self.model_path)
+        candidate_model = YOLO(int8_path, task="detect")
+        frames = [load_image_scaled(path, self.imgsz)[0] for path in images]
+        frames = [cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) for frame in frames]
+        # Calentamiento para no medir la inicialización de cada motor
+        reference_model(frames[0], imgsz=self.imgsz, verbose=False)
+        candidate_model(frames[0], imgsz=self.imgsz, verbose=False)
+
+        reference_times, candidate_times = [], []
+        matched = reference_total = candidate_total = 0
+        for done, frame in enumerate(frames, start=1):
+            if self._cancelled:
+                break
+            start = time.perf_counter()
+            reference = extract_detections(reference_model(frame, imgsz=self.imgsz, verbose=False))
+            reference_times.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            candidate = extract_detections(candidate_model(frame, imgsz=self.imgsz, verbose=False))
+            candidate_times.append(time.perf_counter() - start)
+
+            m, r, c = detection_agreement(reference, candidate)
+            matched += m
+            reference_total += r
+            candidate_total += c
+            self.progress.emit(done, len(frames))
+
+        precision = matched / candidate_total if candidate_total else 1.0
+        recall = matched / reference_total if reference_total else 1.0
+        agreement = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        fp32_ms = float(np.median(reference_times)) * 1000
+        int8_ms = float(np.median(candidate_times)) * 1000
+        return {
+            "model_path": int8_path,
+            "dynamic": True,
+            "images": len(reference_times),
+            "fp32_ms": fp32_ms,
+            "int8_ms": int8_ms,
+            "speedup": fp32_ms / int8_ms if int8_ms > 0 else 0.0,
+            "agreement": agreement,
+            "precision": precision,
+            "recall": recall,
+            "fp32_mb": os.path.getsize(self.model_path) / 1e6,
+            "int8_mb": os.path.getsize(int8_path) / 1e6,
+        }
+
+
+class QuantizationReportDialog(QDialog):
+    """Muestra la comparación FP32 / INT8 y pregunta si se cambia de modelo"""
+
+    def __init__(self, report, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Modelo INT8 para CPU")
+        layout = QFormLayout(self)
+        layout.addRow("Imágenes evaluadas:", QLabel(str(report["images"])))
+        layout.addRow("Latencia FP32:", QLabel(f"{report['fp32_ms']:.1f} ms"))
+        layout.addRow("Latencia INT8:", QLabel(f"{report['int8_ms']:.1f} ms ({report['speedup']:.2f}x)"))
+        layout.addRow("Coincidencia de detecciones:", QLabel(
+            f"{report['agreement'] * 100:.1f} % (precisión {report['precision'] * 100:.1f} %, "
+            f"exhaustividad {report['recall'] * 100:.1f} %)"))
+        layout.addRow("Tamaño:", QLabel(f"{report['fp32_mb']:.1f} MB → {report['int8_mb']:.1f} MB"))
+
+        buttons = QDialogButtonBox()
+        buttons.addButton("Usar modelo INT8", QDialogButtonBox.ButtonRole.AcceptRole)
+        buttons.addButton("Mantener FP32", QDialogButtonBox.ButtonRole.RejectRole)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addRow(buttons)
+
+
+# --- Configuración persistente ---
+CONFIG_DIR = os.path.join(os.path.expanduser("~"), ".config", "yolo_vision_pro")
+
+
+def load_json_config(path, defaults):
+    """Configuración guardada sobre los valores por defecto; si falta o está dañada, los defectos"""
+    config = dict(defaults)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            config.update(json.load(f))
+    except (OSError, ValueError):
+        pass
+    return config
+
+
+def save_json_config(path, config):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+
+
+# --- Ajuste de hilos de CPU ---
+THREAD_CONFIG_PATH = os.path.join(CONFIG_DIR, "hilos.json")
+
+
+def default_thread_config():
+    cores = os.cpu_count() or 1
+    return {"torch_threads": cores, "torch_interop_threads": 1, "opencv_threads": cores,
+            "decode_workers": min(4, cores), "source": "predeterminado"}
+
+
+def load_thread_config():
+    return load_json_config(THREAD_CONFIG_PATH, default_thread_config())
+
+
+def save_thread_config(config):
+    save_json_config(THREAD_CONFIG_PATH, config)
+
+
+# Hilos de torch vigentes; la versión cambia cada vez que se aplica una configuración
+_THREAD_CONFIG_STATE = {"torch_threads": None, "version": 0}
+
+
+def apply_thread_config(config, startup=False):
+    """Aplica los hilos de torch y OpenCV.
+
+    Sin configuración guardada se respetan los valores de las bibliotecas. Los
+    hilos inter-op de torch solo pueden fijarse antes de cualquier trabajo en
+    paralelo, así que únicamente se aplican al arrancar.
+    """
+    if config.get("source") == "predeterminado":
+        return
+    cv2.setNumThreads(int(config["opencv_threads"]))
+    _THREAD_CONFIG_STATE["torch_threads"] = int(config["torch_threads"])
+    _THREAD_CONFIG_STATE["version"] += 1
+    sync_thread_config(None)
+    if startup:
+        try:
+            import torch
+            torch.set_num_interop_threads(int(config["torch_interop_threads"]))
+        except (ImportError, RuntimeError):
+            pass
+
+
+def sync_thread_config(version):
+    """Aplica en el hilo que llama los hilos de torch vigentes si han cambiado.
+
+    Con OpenMP el número de hilos de torch es un ajuste de cada hilo del
+    sistema, así que cada hilo que infiere lo sincroniza antes de usar el
+    modelo. Devuelve la versión aplicada.
+    """
+    current = _THREAD_CONFIG_STATE["version"]
+    if version == current or _THREAD_CONFIG_STATE["torch_threads"] is None:
+        return current
+    try:
+        import torch
+        torch.set_num_threads(_THREAD_CONFIG_STATE["torch_threads"])
+    except ImportError:
+        pass
+    return current
+
+
+class ThreadTuningThread(QThread):
+    """Mide combinaciones de hilos con una carga sintética y elige la más estable.
+
+    Cada iteración procesa la misma carga fija de BATCH_FRAMES imágenes:
+    decodificar los JPEG en el grupo de hilos de decodificación, convertir
+    color e inferir el lote. Se busca por coordenadas (torch, luego OpenCV,
+    luego decodificación) para no probar todas las combinaciones, y se
+    puntúa por imágenes por segundo; como la carga no depende de la
+    configuración, más hilos de decodificación solo ganan si la terminan antes.
+    """
+    BATCH_FRAMES = 8
+
+    status_update = pyqtSignal(str)
+    progress = pyqtSignal(int, int)
+    tuning_finished = pyqtSignal(bool, str, object)  # éxito, mensaje, (configuración, resultados)
+
+    def __init__(self, model_path, iterations=12, frame_size=(1280, 720)):
+        super().__init__()
+        self.model_path = model_path
+        self.iterations = iterations
+        self.frame_size = frame_size
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    @staticmethod
+    def _candidates(cores):
+        values = {1, cores}
+        value = 2
+        while value < cores:
+            values.add(value)
+            value *= 2
+        return sorted(values)
+
+    @staticmethod
+    def _apply_trial(config):
+        # Solo afecta a este hilo (torch) y al grupo global de OpenCV, que se restaura al terminar
+        cv2.setNumThreads(int(config["opencv_threads"]))
+        try:
+            import torch
+            torch.set_num_threads(int(config["torch_threads"]))
+        except ImportError:
+            pass
+
+    def _measure(self, model, jpeg, config):
+        self._apply_trial(config)
+        workers = int(config["decode_workers"])
+        workload = [jpeg] * self.BATCH_FRAMES
+
+        def decode(data):
+            return cv2.cvtColor(cv2.imdecode(data, cv2.IMREAD_COLOR), cv2.COLOR_BGR2RGB)
+
+        times = []
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # Calentamiento con la nueva configuración
+            model(list(pool.map(decode, workload)), verbose=False)
+            for _ in range(self.iterations):
+                if self._cancelled:
+                    break
+                start = time.perf_counter()
+                model(list(pool.map(decode, workload)), verbose=False)
+                times.append(time.perf_counter() - start)
+        if not times:
+            return None
+        return {"images_per_second": self.BATCH_FRAMES * len(times) / sum(times),
+                "p50_ms": float(np.percentile(times, 50)) * 1000,
+                "p95_ms": float(np.percentile(times, 95)) * 1000}
+
+    def run(self):
+        previous = load_thread_config()
+        opencv_threads = cv2.getNumThreads()
+        try:
+            self.status_update.emit("Ajuste de hilos: preparando carga sintética...")
+            model = YOLO(self.model_path)
+            rng = np.random.default_rng(0)
+            width, height = self.frame_size
+            # Ruido suavizado: se comprime como una escena real y no como ruido puro
+            frame = cv2.GaussianBlur(rng.integers(0, 256, (height, width, 3), dtype=np.uint8), (0, 0), 3)
+            jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 90])[1]
+
+            cores = os.cpu_count() or 1
+            candidates = self._candidates(cores)
+            worker_candidates = [w for w in (1, 2, 4) if w <= cores]
+            total = 2 * len(candidates) + len(worker_candidates)
+            best = dict(previous, torch_threads=cores, opencv_threads=1, decode_workers=1)
+            results = []
+            done = 0
+            for key, values in (("torch_threads", candidates), ("opencv_threads", candidates),
+                                ("decode_workers", worker_candidates)):
+                best_score = None
+                best_value = best[key]
+                for value in values:
+                    if self._cancelled:
+                        cv2.setNumThreads(opencv_threads)
+                        self.tuning_finished.emit(False, "Ajuste de hilos cancelado.", None)
+                        return
+                    config = dict(best, **{key: value})
+                    self.status_update.emit(f"Ajuste de hilos: {key} = {value}")
+                    score = self._measure(model, jpeg, config)
+                    done += 1
+                    self.progress.emit(done, total)
+                    if score is None:
+                        continue
+                    results.append(dict(score, torch_threads=config["torch_threads"],
+                                        opencv_threads=config["opencv_threads"],
+                                        decode_workers=config["decode_workers"]))
+                    if best_score is None or score["images_per_second"] > best_score:
+                        best_score = score["images_per_second"]
+                        best_value = value
+                best[key] = best_value
+
+            best["source"] = "autoajuste"
+            cv2.setNumThreads(opencv_threads)
+            self.tuning_finished.emit(True, "Ajuste de hilos completado.", (best, results))
+        except Exception as e:
+            cv2.setNumThreads(opencv_threads)
+            self.tuning_finished.emit(False, f"Error durante el ajuste de hilos: {e}", None)
+
+
+class ThreadSettingsDialog(QDialog):
+    """Ajuste manual de los hilos, con acceso a la medición automática"""
+    AUTOTUNE = 2  # Código de resultado para lanzar el autoajuste
+
+    def __init__(self, config, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Hilos de CPU")
+        cores = os.cpu_count() or 1
+        layout = QFormLayout(self)
+
+        self.torch_spin = QSpinBox()
+        self.torch_spin.setRange(1, cores)
+        self.torch_spin.setValue(min(int(config["torch_threads"]), cores))
+        layout.addRow("Hilos de inferencia (torch):", self.torch_spin)
+
+        self.opencv_spin = QSpinBox()
+        self.opencv_spin.setRange(1, cores)
+        self.opencv_spin.setValue(min(int(config["opencv_threads"]), cores))
+        layout.addRow("Hilos de OpenCV:", self.opencv_spin)
+
+        self.decode_spin = QSpinBox()
+        self.decode_spin.setRange(1, cores)
+        self.decode_spin.setValue(min(int(config["decode_workers"]), cores))
+        layout.addRow("Hilos de decodificación:", self.decode_spin)
+
+        layout.addRow(QLabel(f"Origen: {config.get('source', 'predeterminado')} · {cores} núcleos"))
+
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        autotune = buttons.addButton("Medir automáticamente", QDialogButtonBox.ButtonRole.ActionRole)
+        autotune.clicked.connect(lambda: self.done(self.AUTOTUNE))
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addRow(buttons)
+        self._config = config
+
+    def settings(self):
+        return dict(self._config,
+                    torch_threads=self.torch_spin.value(),
+                    opencv_threads=self.opencv_spin.value(),
+                    decode_workers=self.decode_spin.value(),
+                    source="manual")
+
+
+# --- Perfiles de rendimiento ---
+PROFILES_CONFIG_PATH = os.path.join(CONFIG_DIR, "perfiles.json")
+DEFAULT_PROFILE = "Equilibrado"
+PROFILE_DEFAULTS = {
+    "model": "yolov8n.pt",
+    "backend": "pytorch",        # "pytorch" o "int8" (modelo cuantizado con Optimizar Modelo)
+    "input_size": 640,           # tamaño mínimo de entrada del modelo
+    "batch_size": 4,             # imágenes por llamada al modelo en los lotes
+    "threads": None,             # None: usar hilos.json; o torch_threads/opencv_threads/decode_workers
+    "late_policy": "drop",       # video retrasado: "drop" salta frames, "reuse" repite detecciones
+    "camera_buffer": 0,          # frames en cola del controlador de la cámara (0 = su valor)
+    "camera_pause_ms": 10,       # pausa tras cada frame de la cámara
+}
+BUILTIN_PROFILES = {
+    "Equilibrado": {},
+    "Baja latencia": {"input_size": 480, "batch_size": 1, "camera_buffer": 1, "camera_pause_ms": 0},
+    "Máximo rendimiento": {"batch_size": 16, "late_policy": "reuse", "camera_buffer": 4},
+    "Bajo consumo": {"backend": "int8", "input_size": 320, "batch_size": 2, "camera_buffer": 1,
+                     "camera_pause_ms": 30,
+                     "threads": {"torch_threads": 2, "opencv_threads": 1, "decode_workers": 1}},
+}
+
+
+def load_profiles():
+    """(perfil activo, {nombre: perfil}) con los perfiles guardados sobre los predefinidos.
+
+    perfiles.json puede redefinir los predefinidos o añadir otros; los campos
+    que falten toman el valor de PROFILE_DEFAULTS.
+    """
+    config = load_json_config(PROFILES_CONFIG_PATH, {"active": DEFAULT_PROFILE, "profiles": {}})
+    profiles = {}
+    for source in (BUILTIN_PROFILES, config.get("profiles") or {}):
+        for name, values in source.items():
+            profiles[name] = dict(PROFILE_DEFAULTS, **values)
+    active = config.get("active")
+    return (active if active in profiles else DEFAULT_PROFILE), profiles
+
+
+def save_active_profile(name):
+    config = load_json_config(PROFILES_CONFIG_PATH, {"active": DEFAULT_PROFILE, "profiles": {}})
+    config["active"] = name
+    save_json_config(PROFILES_CONFIG_PATH, config)
+
+
+def is_dynamic_int8_model(path):
+    """True si el informe de la variante INT8 indica que admite cualquier tamaño de entrada y lote"""
+    report_path = path[:-len("_int8.onnx")] + "_informe.json"
+    return bool(load_json_config(report_path, {}).get("dynamic"))
+
+
+def profile_model_path(profile):
+    """Modelo que usa el perfil; para "int8", la variante cuantizada más reciente (o None si no hay).
+
+    Solo se usan variantes exportadas con forma dinámica: el perfil fija su
+    propio tamaño de entrada y lote, que una exportación estática no admite.
+    """
+    if profile["backend"] != "int8":
+        return profile["model"]
+    stem = os.path.splitext(os.path.basename(profile["model"]))[0]
+    try:
+        candidates = [os.path.join(QUANTIZED_MODEL_DIR, name) for name in os.listdir(QUANTIZED_MODEL_DIR)
+                      if name.startswith(stem + "_") and name.endswith("_int8.onnx")]
+    except OSError:
+        return None
+    candidates = [path for path in candidates if is_dynamic_int8_model(path)]
+    return max(candidates, key=os.path.getmtime) if candidates else None
+
+
+def profile_thread_config(profile):
+    """Configuración de hilos del perfil, o la guardada en hilos.json si el perfil no fija ninguna"""
+    if not profile["threads"]:
+        return load_thread_config()
+    config = default_thread_config()
+    config.update(profile["threads"])
+    config["source"] = "perfil"
+    return config
+
+
+# --- Compuerta de movimiento ---
+MOTION_CONFIG_PATH = os.path.join(CONFIG_DIR, "movimiento.json")
+DEFAULT_MOTION_CONFIG = {
+    "enabled": False,
+    "sensitivity": 50,        # 1-100: a mayor sensibilidad, menor diferencia de gris necesaria
+    "min_area_percent": 0.5,  # porcentaje de la zona vigilada que debe cambiar
+    "heartbeat_seconds": 5,   # inferencia periódica aunque no haya movimiento
+    "mask_path": "",          # imagen en blanco y negro: blanco = zona vigilada
+}
+
+
+class MotionGate:
+    """Detecta movimiento comparando frames muy reducidos con un fondo promediado.
+
+    Trabaja sobre una versión en gris de unos 160 píxeles de ancho, así que su
+    coste es despreciable frente a la inferencia. El fondo se actualiza con una
+    media móvil para tolerar cambios lentos de iluminación.
+    """
+    WIDTH = 160
+    BACKGROUND_RATE = 0.05
+
+    def __init__(self, sensitivity=50, min_area_percent=0.5, heartbeat_seconds=5, mask_path=""):
+        self.pixel_threshold = 5 + (100 - max(1, min(sensitivity, 100))) * 0.5
+        self.min_area = max(min_area_percent, 0.0) / 100.0
+        self.heartbeat_seconds = heartbeat_seconds
+        self.mask_path = mask_path
+        self._mask_source = None
+        if mask_path:
+            self._mask_source = cv2.imread(mask_path, cv2.IMREAD_GRAYSCALE)
+            if self._mask_source is None:
+                raise ValueError(f"No se pudo leer la máscara: {os.path.basename(mask_path)}")
+        self._mask = None
+        self._background = None
+        self._small_size = None
+        # Búferes de trabajo reutilizados en cada frame
+        self._small = None
+        self._gray = None
+        self._gray_f = None
+        self._diff = None
+        self._changed = None
+
+    @classmethod
+    def from_config(cls, config):
+        if not config.get("enabled"):
+            return None
+        return cls(config["sensitivity"], config["min_area_percent"],
+                   config["heartbeat_seconds"], config.get("mask_path", ""))
+
+    def reset(self):
+        self._background = None
+
+    def has_motion(self, frame_bgr):
+        """Indica si el frame difiere lo suficiente del fondo en la zona vigilada"""
+        h, w = frame_bgr.shape[:2]
+        if self._small_size is None or self._small_size[2:] != (w, h):
+            small_h = max(1, int(h * self.WIDTH / w))
+            self._small_size = (self.WIDTH, small_h, w, h)
+            self._background = None
+            self._mask = None
+            if self._mask_source is not None:
+                self._mask = cv2.resize(self._mask_source, (self.WIDTH, small_h),
+                                        interpolation=cv2.INTER_NEAREST) > 127
+            self._small = np.empty((small_h, self.WIDTH, 3), dtype=np.uint8)
+            self._gray = np.empty((small_h, self.WIDTH), dtype=np.uint8)
+            self._gray_f = np.empty((small_h, self.WIDTH), dtype=np.float32)
+            self._diff = np.empty_like(self._gray_f)
+            self._changed = np.empty((small_h, self.WIDTH), dtype=bool)
+        cv2.resize(frame_bgr, self._small_size[:2], dst=self._small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        cv2.GaussianBlur(self._gray, (5, 5), 0, dst=self._gray)
+        self._gray_f[...] = self._gray
+        if self._background is None:
+            self._background = self._gray_f.copy()
+            return True
+        cv2.absdiff(self._gray_f, self._background, dst=self._diff)
+        np.greater(self._diff, self.pixel_threshold, out=self._changed)
+        cv2.accumulateWeighted(self._gray_f, self._background, self.BACKGROUND_RATE)
+        if self._mask is not None:
+            watched = np.count_nonzero(self._mask)
+            if watched == 0:
+                return False
+            np.logical_and(self._changed, self._mask, out=self._changed)
+        else:
+            watched = self._changed.size
+        return np.count_nonzero(self._changed) >= self.min_area * watched
+
+
+class MotionGateDialog(QDialog):
+    """Opciones de la compuerta de movimiento para la cámara"""
+
+    def __init__(self, config, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Detección por movimiento")
+        layout = QFormLayout(self)
+
+        self.enabled_check = QCheckBox("Inferir solo cuando haya movimiento")
+        self.enabled_check.setChecked(bool(config["enabled"]))
+        layout.addRow(self.enabled_check)
+
+        self.sensitivity_spin = QSpinBox()
+        self.sensitivity_spin.setRange(1, 100)
+        self.sensitivity_spin.setValue(int(config["sensitivity"]))
+        layout.addRow("Sensibilidad:", self.sensitivity_spin)
+
+        self.area_spin = QDoubleSpinBox()
+        self.area_spin.setRange(0.0, 100.0)
+        self.area_spin.setDecimals(2)
+        self.area_spin.setSuffix(" %")
+        self.area_spin.setValue(float(config["min_area_percent"]))
+        layout.addRow("Área mínima con cambios:", self.area_spin)
+
+        self.heartbeat_spin = QSpinBox()
+        self.heartbeat_spin.setRange(1, 3600)
+        self.heartbeat_spin.setSuffix(" s")
+        self.heartbeat_spin.setValue(int(config["heartbeat_seconds"]))
+        layout.addRow("Inferencia periódica cada:", self.heartbeat_spin)
+
+        self.mask_path = config.get("mask_path", "")
+        self.mask_label = QLabel(os.path.basename(self.mask_path) or "Toda la imagen")
+        mask_buttons = QHBoxLayout()
+        choose = QPushButton("Elegir...")
+        choose.clicked.connect(self._choose_mask)
+        clear = QPushButton("Quitar")
+        clear.clicked.connect(self._clear_mask)
+        mask_buttons.addWidget(self.mask_label, 1)
+        mask_buttons.addWidget(choose)
+        mask_buttons.addWidget(clear)
+        layout.addRow("Máscara:", mask_buttons)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addRow(buttons)
+
+    def _choose_mask(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Seleccionar Máscara (blanco = zona vigilada)", "", "Imágenes (*.png *.jpg *.bmp)")
+        if path:
+            self.mask_path = path
+            self.mask_label.setText(os.path.basename(path))
+
+    def _clear_mask(self):
+        self.mask_path = ""
+        self.mask_label.setText("Toda la imagen")
+
+    def settings(self):
+        return {
+            "enabled": self.enabled_check.isChecked(),
+            "sensitivity": self.sensitivity_spin.value(),
+            "min_area_percent": self.area_spin.value(),
+            "heartbeat_seconds": self.heartbeat_spin.value(),
+            "mask_path": self.mask_path,
+        }
+
+
+# --- Regulador de FPS de la cámara ---
+GOVERNOR_CONFIG_PATH = os.path.join(CONFIG_DIR, "regulador.json")
+DEFAULT_GOVERNOR_CONFIG = {
+    "enabled": False,
+    "target_fps": 10,
+    "adapt_input": True,      # reducir la entrada del modelo si la latencia sube
+    "min_input_size": 320,
+    "fallback_model": "",     # modelo más ligero si ni con la entrada mínima se llega
+}
+
+
+class FpsGovernor:
+    """Limita la inferencia de la cámara a target_fps con turnos equiespaciados.
+
+    En lugar de inferir sin pausa (y que el equipo se caliente y acabe
+    frenando), cada frame ocupa un turno de 1/target_fps segundos; si uno se
+    retrasa, el siguiente empieza en cuanto termina, sin ráfagas para
+    recuperar. Cuando la latencia media se mantiene por encima del
+    presupuesto, la entrada del modelo baja un escalón (y sube de nuevo cuando
+    sobra holgura); ya en el mínimo, se pide el modelo de reserva.
+    """
+    BUDGET = 0.7            # fracción del turno que puede ocupar la inferencia
+    SIZE_STEP = 64
+    DOWNGRADE_AFTER = 3.0   # segundos seguidos por encima del presupuesto
+    UPGRADE_AFTER = 15.0    # segundos seguidos con holgura de sobra
+
+    def __init__(self, target_fps=10, adapt_input=True, min_input_size=320, fallback_model=""):
+        self.target_fps = max(0.1, float(target_fps))
+        self.period = 1.0 / self.target_fps
+        self.adapt_input = adapt_input
+        self.min_input_size = int(min_input_size)
+        self.fallback_model = fallback_model
+        self.reset()
+
+    @classmethod
+    def from_config(cls, config):
+        if not config.get("enabled"):
+            return None
+        return cls(config["target_fps"], config["adapt_input"], config["min_input_size"],
+                   config.get("fallback_model", ""))
+
+    def reset(self):
+        self._next_slot = None
+        self._base_size = None
+        self.input_size = None
+        self._latency = None
+        self._over_since = None
+        self._under_since = None
+        self._fallback_requested = False
+        self._window_start = time.perf_counter()
+        self._window_cpu = time.process_time()
+        self._window_frames = 0
+        self._window_busy = 0.0
+
+    def current_size(self, base_size):
+        """Tamaño de entrada vigente; vuelve al base si este cambia (p. ej. otro perfil)"""
+        if base_size != self._base_size:
+            self._base_size = base_size
+            self.input_size = base_size
+        return self.input_size
+
+    def record_inference(self, latency, now):
+        """Anota la latencia de una inferencia; devuelve True si hay que pasar al modelo de reserva"""
+        self._latency = latency if self._latency is None else 0.8 * self._latency + 0.2 * latency
+        budget = self.period * self.BUDGET
+        if self._latency > budget:
+            self._under_since = None
+            if self._over_since is None:
+                self._over_since = now
+            elif now - self._over_since >= self.DOWNGRADE_AFTER:
+                self._over_since = now
+                if self.adapt_input and self.input_size > self.min_input_size:
+                    self.input_size = max(self.min_input_size, self.input_size - self.SIZE_STEP)
+                    self._latency = None
+                elif self.fallback_model and not self._fallback_requested:
+                    self._fallback_requested = True
+                    return True
+        elif self._latency < budget * 0.5 and self.input_size < self._base_size:
+            self._over_since = None
+            if self._under_since is None:
+                self._under_since = now
+            elif now - self._under_since >= self.UPGRADE_AFTER:
+                self._under_since = now
+                self.input_size = min(self._base_size, self.input_size + self.SIZE_STEP)
+                self._latency = None
+        else:
+            self._over_since = None
+            self._under_since = None
+        return False
+
+    def next_delay(self, now, busy):
+        """Anota el trabajo del frame y devuelve la espera hasta el siguiente turno"""
+        self._window_frames += 1
+        self._window_busy += busy
+        self._next_slot = (now if self._next_slot is None else self._next_slot) + self.period
+        if self._next_slot < now:
+            self._next_slot = now
+        return self._next_slot - now
+
+    def stats(self, now):
+        """FPS logrados, ciclo de trabajo y CPU estimada del último segundo (None si no ha pasado)"""
+        elapsed = now - self._window_start
+        if elapsed < 1.0:
+            return None
+        cpu_now = time.process_time()
+        stats = {
+            "fps": self._window_frames / elapsed,
+            "target_fps": self.target_fps,
+            "duty_percent": 100.0 * self._window_busy / elapsed,
+            # Tiempo de CPU de todo el proceso repartido entre los núcleos del equipo
+            "cpu_percent": 100.0 * (cpu_now - self._window_cpu) / elapsed / (os.cpu_count() or 1),
+            "latency_ms": (self._latency or 0.0) * 1000,
+            "input_size": self.input_size,
+        }
+        self._window_start = now
+        self._window_cpu = cpu_now
+        self._window_frames = 0
+        self._window_busy = 0.0
+        return stats
+
+
+class FpsGovernorDialog(QDialog):
+    """Opciones del regulador de FPS de la cámara"""
+
+    def __init__(self, config, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Regulador de FPS")
+        layout = QFormLayout(self)
+
+        self.enabled_check = QCheckBox("Limitar la inferencia de la cámara")
+        self.enabled_check.setChecked(bool(config["enabled"]))
+        layout.addRow(self.enabled_check)
+
+        self.fps_spin = QDoubleSpinBox()
+        self.fps_spin.setRange(0.5, 120.0)
+        self.fps_spin.setDecimals(1)
+        self.fps_spin.setSuffix(" FPS")
+        self.fps_spin.setValue(float(config["target_fps"]))
+        layout.addRow("Objetivo:", self.fps_spin)
+
+        self.adapt_check = QCheckBox("Reducir la entrada del modelo si la latencia sube")
+        self.adapt_check.setChecked(bool(config["adapt_input"]))
+        layout.addRow(self.adapt_check)
+
+        self.min_size_spin = QSpinBox()
+        self.min_size_spin.setRange(160, 1280)
+        self.min_size_spin.setSingleStep(32)
+        self.min_size_spin.setSuffix(" px")
+        self.min_size_spin.setValue(int(config["min_input_size"]))
+        layout.addRow("Entrada mínima:", self.min_size_spin)
+
+        self.fallback_model = config.get("fallback_model", "")
+        self.fallback_label = QLabel(os.path.basename(self.fallback_model) or "Ninguno")
+        model_buttons = QHBoxLayout()
+        choose = QPushButton("Elegir...")
+        choose.clicked.connect(self._choose_model)
+        clear = QPushButton("Quitar")
+        clear.clicked.connect(self._clear_model)
+        model_buttons.addWidget(self.fallback_label, 1)
+        model_buttons.addWidget(choose)
+        model_buttons.addWidget(clear)
+        layout.addRow("Modelo de reserva:", model_buttons)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addRow(buttons)
+
+    def _choose_model(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Seleccionar Modelo de Reserva", "", "Modelos (*.pt *.onnx)")
+        if path:
+            self.fallback_model = path
+            self.fallback_label.setText(os.path.basename(path))
+
+    def _clear_model(self):
+        self.fallback_model = ""
+        self.fallback_label.setText("Ninguno")
+
+    def settings(self):
+        return {
+            "enabled": self.enabled_check.isChecked(),
+            "target_fps": self.fps_spin.value(),
+            "adapt_input": self.adapt_check.isChecked(),
+            "min_input_size": self.min_size_spin.value(),
+            "fallback_model": self.fallback_model,
+        }
+
+
+# --- Grabación de clips por eventos ---
+EVENT_CONFIG_PATH = os.path.join(CONFIG_DIR, "eventos.json")
+DEFAULT_EVENT_CONFIG = {
+    "classes": "person",      # nombres separados por comas; vacío = cualquier clase
+    "min_confidence": 0.5,
+    "pre_roll_seconds": 5,
+    "cooldown_seconds": 5,
+    "output_dir": os.path.join(os.path.expanduser("~"), "Videos", "eventos"),
+}
+
+
+class EventClipRecorder(QThread):
+    """Graba clips cuando aparecen ciertas clases, incluyendo los segundos previos.
+
+    El hilo de inferencia solo encola el frame y sus detecciones; la compresión,
+    el búfer circular y la escritura del clip ocurren en este hilo. El búfer
+    guarda los frames en JPEG y está acotado en segundos y en bytes, y la cola
+    descarta frames (contados en ``dropped_frames``) si el disco no da abasto.
+    """
+    status_update = pyqtSignal(str)
+    clip_started = pyqtSignal(str)
+    clip_saved = pyqtSignal(str, float)  # ruta, duración en segundos
+
+    def __init__(self, output_dir, classes=(), min_confidence=0.5, pre_roll_seconds=5,
+                 cooldown_seconds=5, max_buffer_mb=64, queue_size=8, codec="mp4v"):
+        super().__init__()
+        self.output_dir = output_dir
+        self.classes = {name.strip() for name in classes if name.strip()}
+        self.min_confidence = min_confidence
+        self.pre_roll_seconds = pre_roll_seconds
+        self.cooldown_seconds = cooldown_seconds
+        self.max_buffer_bytes = int(max_buffer_mb * 1024 * 1024)
+        self.codec = codec
+        self.dropped_frames = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._ring = deque()  # (instante, JPEG, detecciones)
+        self._ring_bytes = 0
+        self._writer = None
+        self._clip_path = None
+        self._clip_start = 0.0
+        self._frame_size = None
+        self._last_trigger = 0.0
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config["output_dir"], config["classes"].split(","), config["min_confidence"],
+                   config["pre_roll_seconds"], config["cooldown_seconds"])
+
+    def submit(self, frame_bgr, detections, timestamp=None, release=None):
+        """Encola un frame sin bloquear nunca al llamador.
+
+        El frame no debe reutilizarse hasta que este hilo lo devuelva llamando
+        a release(frame), si se indica.
+        """
+        try:
+            self._queue.put_nowait((time.time() if timestamp is None else timestamp, frame_bgr, detections, release))
+        except queue.Full:
+            self.dropped_frames += 1
+            if release is not None:
+                release(frame_bgr)
+
+    def close(self):
+        """Termina el clip en curso y espera al hilo"""
+        close_queue_worker(self, self._queue)
+
+    def _is_trigger(self, detections):
+        if detections is None or len(detections["cls"]) == 0:
+            return False
+        names = detections["names"]
+        for conf, cls_id in zip(detections["conf"], detections["cls"]):
+            if conf >= self.min_confidence and (not self.classes or names[int(cls_id)] in self.classes):
+                return True
+        return False
+
+    def _buffer(self, timestamp, frame_bgr, detections):
+        ok, jpeg = cv2.imencode(".jpg", frame_bgr, [cv2.IMWRITE_JPEG_QUALITY, 85])
+        if not ok:
+            return
+        self._ring.append((timestamp, jpeg, detections))
+        self._ring_bytes += jpeg.nbytes
+        while self._ring and (self._ring_bytes > self.max_buffer_bytes
+                              or timestamp - self._ring[0][0] > self.pre_roll_seconds):
+            self._ring_bytes -= self._ring.popleft()[1].nbytes
+
+    def _estimated_fps(self):
+        if len(self._ring) >= 2:
+            span = self._ring[-1][0] - self._ring[0][0]
+            if span > 0:
+                return min(max((len(self._ring) - 1) / span, 1.0), 60.0)
+        return 15.0
+
+    def _write(self, frame_bgr, detections):
+        if (frame_bgr.shape[1], frame_bgr.shape[0]) != self._frame_size:
+            frame_bgr = cv2.resize(frame_bgr, self._frame_size, interpolation=cv2.INTER_AREA)
+        self._writer.write(draw_detections(frame_bgr, detections))
+
+    def _start_clip(self, timestamp, frame_bgr):
+        os.makedirs(self.output_dir, exist_ok=True)
+        name = time.strftime("evento_%Y%m%d_%H%M%S", time.localtime(timestamp)) + ".mp4"
+        self._clip_path = os.path.join(self.output_dir, name)
+        self._frame_size = (frame_bgr.shape[1], frame_bgr.shape[0])
+        self._writer = cv2.VideoWriter(self._clip_path, cv2.VideoWriter_fourcc(*self.codec),
+                                       self._estimated_fps(), self._frame_size)
+        if not self._writer.isOpened():
+            self._writer = None
+            self.status_update.emit(f"No se pudo crear el clip: {name}")
+            return
+        self._clip_start = self._ring[0][0] if self._ring else timestamp
+        # Vaciar el búfer circular: son los segundos previos al evento
+        while self._ring:
+            _, jpeg, detections = self._ring.popleft()
+            self._write(cv2.imdecode(jpeg, cv2.IMREAD_COLOR), detections)
+        self._ring_bytes = 0
+        self.clip_started.emit(self._clip_path)
+
+    def _finish_clip(self, timestamp):
+        if self._writer is None:
+            return
+        self._writer.release()
+        self._writer = None
+        self.clip_saved.emit(self._clip_path, max(0.0, timestamp - self._clip_start))
+
+    def _process(self, timestamp, frame_bgr, detections):
+        if self._is_trigger(detections):
+            self._last_trigger = timestamp
+            if self._writer is None:
+                self._start_clip(timestamp, frame_bgr)
+        if self._writer is not None:
+            self._write(frame_bgr, detections)
+            if timestamp - self._last_trigger >= self.cooldown_seconds:
+                self._finish_clip(timestamp)
+        else:
+            self._buffer(timestamp, frame_bgr, detections)
+
+    def run(self):
+        timestamp = time.time()
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                timestamp, frame_bgr, detections, release = item
+                try:
+                    self._process(timestamp, frame_bgr, detections)
+                finally:
+                    if release is not None:
+                        release(frame_bgr)
+        except Exception as e:
+            self.status_update.emit(f"Error al grabar eventos: {str(e)}")
+        finally:
+            self._finish_clip(timestamp)
+
+
+def submit_to_event_recorder(recorder, buffers, frame_bgr, detections, timestamp=None):
+    """Entrega al grabador una copia del frame hecha sobre la reserva de FrameBuffers"""
+    copy = buffers.copy_for_recording(frame_bgr)
+    if copy is None:
+        # El grabador tiene todos los búferes: va tan retrasado como con la cola llena
+        recorder.dropped_frames += 1
+        return
+    recorder.submit(copy, detections, timestamp, release=buffers.release_recording)
+
+
+class EventRecordingDialog(QDialog):
+    """Opciones de la grabación de clips por eventos"""
+
+    def __init__(self, config, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Grabación por eventos")
+        layout = QFormLayout(self)
+
+        self.classes_edit = QLineEdit(config["classes"])
+        self.classes_edit.setPlaceholderText("Cualquier clase")
+        layout.addRow("Clases (separadas por comas):", self.classes_edit)
+
+        self.confidence_spin = QDoubleSpinBox()
+        self.confidence_spin.setRange(0.05, 1.0)
+        self.confidence_spin.setSingleStep(0.05)
+        self.confidence_spin.setValue(float(config["min_confidence"]))
+        layout.addRow("Confianza mínima:", self.confidence_spin)
+
+        self.pre_roll_spin = QSpinBox()
+        self.pre_roll_spin.setRange(0, 60)
+        self.pre_roll_spin.setSuffix(" s")
+        self.pre_roll_spin.setValue(int(config["pre_roll_seconds"]))
+        layout.addRow("Segundos previos:", self.pre_roll_spin)
+
+        self.cooldown_spin = QSpinBox()
+        self.cooldown_spin.setRange(1, 600)
+        self.cooldown_spin.setSuffix(" s")
+        self.cooldown_spin.setValue(int(config["cooldown_seconds"]))
+        layout.addRow("Cerrar clip tras:", self.cooldown_spin)
+
+        self.output_dir = config["output_dir"]
+        self.output_label = QLabel(self.output_dir)
+        choose = QPushButton("Elegir...")
+        choose.clicked.connect(self._choose_output_dir)
+        output_row = QHBoxLayout()
+        output_row.addWidget(self.output_label, 1)
+        output_row.addWidget(choose)
+        layout.addRow("Carpeta de clips:", output_row)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addRow(buttons)
+
+    def _choose_output_dir(self):
+        folder = QFileDialog.getExistingDirectory(self, "Seleccionar Carpeta de Clips", self.output_dir)
+        if folder:
+            self.output_dir = folder
+            self.output_label.setText(folder)
+
+    def settings(self):
+        return {
+            "classes": self.classes_edit.text(),
+            "min_confidence": self.confidence_spin.value(),
+            "pre_roll_seconds": self.pre_roll_spin.value(),
+            "cooldown_seconds": self.cooldown_spin.value(),
+            "output_dir": self.output_dir,
+        }
+
+
+# --- Estadísticas de detección en vivo ---
+class DetectionStatistics:
+    """Agregados por clase sobre ventanas móviles, con coste constante por frame.
+
+    La historia se guarda en anillos NumPy de cubetas de un segundo (una hora
+    como máximo). Cada ventana mantiene sus sumas: al llegar un frame se suman
+    sus detecciones y, al avanzar un segundo, se resta la cubeta que sale de
+    la ventana, así que nunca se recorre la historia para responder.
+    """
+    HISTORY_SECONDS = 3600
+    WINDOWS = (60, 600, 3600)
+    CONFIDENCE_BINS = 10
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.names = {}
+        self._num_classes = 0
+        self._current_second = None
+
+    def _allocate(self, names):
+        self.names = dict(names)
+        self._num_classes = max(self.names) + 1 if self.names else 1
+        shape = (self.HISTORY_SECONDS, self._num_classes)
+        self._frames = np.zeros(self.HISTORY_SECONDS, dtype=np.int32)
+        self._counts = np.zeros(shape, dtype=np.int32)
+        self._conf_sum = np.zeros(shape, dtype=np.float32)
+        self._hist = np.zeros(shape + (self.CONFIDENCE_BINS,), dtype=np.uint16)
+        self._sums = {
+            window: {
+                "frames": 0,
+                "counts": np.zeros(self._num_classes, dtype=np.int64),
+                "conf_sum": np.zeros(self._num_classes, dtype=np.float64),
+                "hist": np.zeros((self._num_classes, self.CONFIDENCE_BINS), dtype=np.int64),
             }
-            QToolBar {
-                background-color: #1A1A25;
-                border: none;
-                border-bottom: 2px solid #4A3AFF;
-                padding: 8px;
-                spacing: 10px;
+            for window in self.WINDOWS
+        }
+        self._current_second = None
+
+    def reset(self):
+        with self._lock:
+            if self.names:
+                self._allocate(self.names)
+
+    def _advance(self, second):
+        """Avanza el anillo hasta 'second' restando las cubetas que salen de cada ventana"""
+        if self._current_second is None or second - self._current_second > self.HISTORY_SECONDS:
+            self._allocate(self.names)
+            self._current_second = second
+            return
+        while self._current_second < second:
+            self._current_second += 1
+            for window, sums in self._sums.items():
+                leaving = (self._current_second - window) % self.HISTORY_SECONDS
+                sums["frames"] -= self._frames[leaving]
+                sums["counts"] -= self._counts[leaving]
+                sums["conf_sum"] -= self._conf_sum[leaving]
+                sums["hist"] -= self._hist[leaving]
+            slot = self._current_second % self.HISTORY_SECONDS
+            self._frames[slot] = 0
+            self._counts[slot] = 0
+            self._conf_sum[slot] = 0
+            self._hist[slot] = 0
+
+    def add(self, detections, timestamp=None):
+        """Suma las detecciones de un frame (llamado desde el hilo de inferencia)"""
+        if detections is None:
+            return
+        second = int(time.monotonic() if timestamp is None else timestamp)
+        with self._lock:
+            if not self.names or len(detections["names"]) != len(self.names):
+                self._allocate(detections["names"])
+            self._advance(second)
+            slot = second % self.HISTORY_SECONDS
+            cls = detections["cls"].astype(np.intp)
+            conf = detections["conf"]
+            bins = np.clip((conf * self.CONFIDENCE_BINS).astype(np.intp), 0, self.CONFIDENCE_BINS - 1)
+            counts = np.bincount(cls, minlength=self._num_classes)
+            conf_sum = np.bincount(cls, weights=conf, minlength=self._num_classes)
+            self._frames[slot] += 1
+            self._counts[slot] += counts.astype(np.int32)
+            self._conf_sum[slot] += conf_sum.astype(np.float32)
+            np.add.at(self._hist[slot], (cls, bins), 1)
+            for sums in self._sums.values():
+                sums["frames"] += 1
+                sums["counts"] += counts
+                sums["conf_sum"] += conf_sum
+                np.add.at(sums["hist"], (cls, bins), 1)
+
+    def snapshot(self, window, chart_points=60):
+        """Agregados de la ventana y la serie de detecciones por segundo para el gráfico"""
+        with self._lock:
+            if not self.names or self._current_second is None:
+                return None
+            # Avanzar el reloj aunque no lleguen frames, para que la ventana se vacíe
+            self._advance(max(self._current_second, int(time.monotonic())))
+            sums = self._sums[window]
+            end = self._current_second + 1
+            slots = np.arange(end - window, end) % self.HISTORY_SECONDS
+            series = self._counts[slots].sum(axis=1)
+            result = {
+                "window": window,
+                "frames": int(sums["frames"]),
+                "counts": sums["counts"].copy(),
+                "conf_sum": sums["conf_sum"].copy(),
+                "hist": sums["hist"].copy(),
+                "names": self.names,
             }
-            QToolBar QToolButton {
-                font-weight: bold;
+        # El gráfico agrupa la serie en chart_points cubetas (fuera del cerrojo)
+        group = max(1, window // chart_points)
+        usable = len(series) - len(series) % group
+        result["series"] = series[len(series) - usable:].reshape(-1, group).sum(axis=1) / float(group)
+        return result
+
+
+class RateChart(QWidget):
+    """Gráfico de líneas sencillo de las detecciones por segundo"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMinimumHeight(110)
+        self._series = np.zeros(0)
+
+    def set_series(self, series):
+        self._series = np.asarray(series, dtype=np.float64)
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing, True)
+        area = QRectF(self.rect()).adjusted(6, 6, -6, -18)
+        text_color = self.palette().color(QPalette.ColorRole.WindowText)
+        painter.setPen(QPen(text_color, 1, Qt.PenStyle.DotLine))
+        painter.drawRect(area)
+        if len(self._series) < 2:
+            return
+        peak = max(float(self._series.max()), 1.0)
+        step = area.width() / (len(self._series) - 1)
+        points = [QPointF(area.left() + i * step, area.bottom() - value / peak * area.height())
+                  for i, value in enumerate(self._series)]
+        painter.setPen(QPen(QColor(*DETECTION_COLOR[::-1]), 2))
+        painter.drawPolyline(points)
+        painter.setPen(text_color)
+        painter.drawText(QRectF(self.rect()).adjusted(6, 0, -6, 0),
+                         Qt.AlignmentFlag.AlignBottom | Qt.AlignmentFlag.AlignLeft,
+                         f"máx. {peak:.1f} detecciones/s")
+
+
+class StatisticsWindow(QDialog):
+    """Panel no modal con los agregados por clase; se redibuja una vez por segundo"""
+    WINDOW_LABELS = (("1 minuto", 60), ("10 minutos", 600), ("1 hora", 3600))
+    REFRESH_MS = 1000
+
+    def __init__(self, statistics, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Estadísticas de detección")
+        self.setModal(False)
+        self.resize(520, 460)
+        self.statistics = statistics
+        layout = QVBoxLayout(self)
+
+        controls = QHBoxLayout()
+        self.window_combo = QComboBox()
+        for label, _ in self.WINDOW_LABELS:
+            self.window_combo.addItem(label)
+        self.window_combo.currentIndexChanged.connect(self._refresh)
+        reset = QPushButton("Reiniciar")
+        reset.clicked.connect(self._reset)
+        self.summary_label = QLabel("")
+        controls.addWidget(QLabel("Ventana:"))
+        controls.addWidget(self.window_combo)
+        controls.addWidget(self.summary_label, 1)
+        controls.addWidget(reset)
+        layout.addLayout(controls)
+
+        self.table = QTableWidget(0, 5)
+        self.table.setHorizontalHeaderLabels(["Clase", "Detecciones", "Por minuto", "Por frame", "Confianza"])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.table, 1)
+
+        self.chart = RateChart()
+        layout.addWidget(self.chart)
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(self.REFRESH_MS)
+        self._timer.timeout.connect(self._refresh)
+
+    def showEvent(self, event):
+        self._refresh()
+        self._timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self._timer.stop()
+        super().hideEvent(event)
+
+    def _reset(self):
+        self.statistics.reset()
+        self._refresh()
+
+    def _refresh(self):
+        window = self.WINDOW_LABELS[self.window_combo.currentIndex()][1]
+        data = self.statistics.snapshot(window)
+        if data is None:
+            self.summary_label.setText("Sin datos todavía")
+            self.table.setRowCount(0)
+            self.chart.set_series([])
+            return
+        counts = data["counts"]
+        present = np.flatnonzero(counts)
+        present = present[np.argsort(counts[present])[::-1]]
+        frames = max(data["frames"], 1)
+        self.summary_label.setText(f"{data['frames']} frames")
+        self.table.setRowCount(len(present))
+        for row, cls_id in enumerate(present):
+            total = int(counts[cls_id])
+            hist = data["hist"][cls_id]
+            # Mediana aproximada a partir del histograma de confianza
+            median_bin = int(np.searchsorted(np.cumsum(hist), hist.sum() / 2.0))
+            values = (
+                data["names"].get(int(cls_id), str(cls_id)),
+                str(total),
+                f"{total * 60.0 / window:.1f}",
+                f"{total / frames:.2f}",
+                f"media {data['conf_sum'][cls_id] / total:.2f} · "
+                f"mediana ~{(median_bin + 0.5) / DetectionStatistics.CONFIDENCE_BINS:.2f}",
+            )
+            for column, value in enumerate(values):
+                item = self.table.item(row, column)
+                if item is None:
+                    self.table.setItem(row, column, QTableWidgetItem(value))
+                elif item.text() != value:
+                    item.setText(value)
+        self.chart.set_series(data["series"])
+
+
+# --- Índice local de detecciones ---
+DETECTION_INDEX_PATH = os.path.join(os.path.expanduser("~"), ".local", "share", "yolo_vision_pro", "indice.sqlite")
+
+DETECTION_INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,
+    fps REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS classes (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS detections (
+    file_id INTEGER NOT NULL,
+    frame INTEGER NOT NULL,
+    slot INTEGER NOT NULL,
+    time REAL NOT NULL,
+    class_id INTEGER NOT NULL,
+    conf REAL NOT NULL,
+    x1 REAL, y1 REAL, x2 REAL, y2 REAL,
+    PRIMARY KEY (file_id, frame, slot)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_detections_class_conf ON detections (class_id, conf);
+CREATE INDEX IF NOT EXISTS idx_detections_file_time ON detections (file_id, time);
+"""
+
+
+def open_detection_index(path=DETECTION_INDEX_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    connection = sqlite3.connect(path, timeout=10)
+    # WAL: las consultas de la GUI leen mientras el hilo de escritura inserta
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(DETECTION_INDEX_SCHEMA)
+    return connection
+
+
+class DetectionIndex(QThread):
+    """Mantiene un índice SQLite de las detecciones de videos e imágenes procesados.
+
+    Igual que el registro estructurado, el hilo de inferencia solo encola; aquí
+    las filas se acumulan y se escriben en una transacción por lote (cada
+    segundo o cada ``batch_rows`` filas). Volver a procesar un archivo
+    sustituye las filas de sus frames en lugar de duplicarlas.
+    """
+    status_update = pyqtSignal(str)
+
+    def __init__(self, path=DETECTION_INDEX_PATH, batch_rows=5000, queue_size=1024, flush_interval=1.0):
+        super().__init__()
+        self.path = path
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval
+        self.dropped_frames = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._file_ids = {}
+        self._class_ids = {}
+
+    def record(self, path, kind, frame_index, timestamp, detections, fps=0.0):
+        """Encola las detecciones de un frame sin bloquear nunca al llamador"""
+        try:
+            self._queue.put_nowait((path, kind, frame_index, timestamp, detections, fps))
+        except queue.Full:
+            self.dropped_frames += 1
+
+    def close(self):
+        close_queue_worker(self, self._queue)
+
+    def _file_id(self, connection, path, kind, fps):
+        file_id = self._file_ids.get(path)
+        if file_id is None:
+            connection.execute("INSERT OR IGNORE INTO files (path, kind, fps) VALUES (?, ?, ?)", (path, kind, fps))
+            connection.execute("UPDATE files SET kind = ?, fps = ? WHERE path = ?", (kind, fps, path))
+            file_id = connection.execute("SELECT id FROM files WHERE path = ?", (path,)).fetchone()[0]
+            self._file_ids[path] = file_id
+        return file_id
+
+    def _class_id(self, connection, name):
+        class_id = self._class_ids.get(name)
+        if class_id is None:
+            connection.execute("INSERT OR IGNORE INTO classes (name) VALUES (?)", (name,))
+            class_id = connection.execute("SELECT id FROM classes WHERE name = ?", (name,)).fetchone()[0]
+            self._class_ids[name] = class_id
+        return class_id
+
+    def _write_batch(self, connection, items):
+        # Un mismo frame puede llegar dos veces en un lote (paso atrás, búsqueda,
+        # rebobinado): vale la última versión
+        latest = {}
+        for item in items:
+            latest[(item[0], item[2])] = item
+        frames = []
+        rows = []
+        with connection:
+            for path, kind, frame_index, timestamp, detections, fps in latest.values():
+                file_id = self._file_id(connection, path, kind, fps)
+                frames.append((file_id, frame_index))
+                names = detections["names"]
+                for slot, (box, conf, cls_id) in enumerate(zip(detections["xyxy"].tolist(),
+                                                               detections["conf"].tolist(),
+                                                               detections["cls"].tolist())):
+                    rows.append((file_id, frame_index, slot, timestamp,
+                                 self._class_id(connection, names[cls_id]), conf, *box))
+            connection.executemany("DELETE FROM detections WHERE file_id = ? AND frame = ?", frames)
+            connection.executemany("INSERT INTO detections VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def run(self):
+        try:
+            connection = open_detection_index(self.path)
+        except Exception as e:
+            self.status_update.emit(f"Error al abrir el índice de detecciones: {str(e)}")
+            return
+        pending = []
+        pending_rows = 0
+        last_flush = time.perf_counter()
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    item = False
+                if item is None:
+                    break
+                if item:
+                    pending.append(item)
+                    pending_rows += max(1, len(item[4]["cls"]))
+                now = time.perf_counter()
+                if pending and (pending_rows >= self.batch_rows or now - last_flush >= self.flush_interval):
+                    self._flush(connection, pending)
+                    pending = []
+                    pending_rows = 0
+                    last_flush = now
+            if pending:
+                self._flush(connection, pending)
+        finally:
+            connection.close()
+
+    def _flush(self, connection, items):
+        """Escribe un lote; si falla se descarta ese lote y el hilo sigue indexando"""
+        try:
+            self._write_batch(connection, items)
+        except Exception as e:
+            # La transacción se deshizo: los identificadores creados en ella ya no existen
+            self._file_ids.clear()
+            self._class_ids.clear()
+            self.status_update.emit(f"Error al indexar detecciones: {str(e)}")
+
+
+def query_detection_index(connection, class_name=None, min_confidence=0.0, file_path=None,
+                          time_from=None, time_to=None, limit=500):
+    """Busca frames con detecciones; devuelve (ruta, tipo, frame, tiempo, clase, confianza)"""
+    clauses = ["d.conf >= ?"]
+    params = [min_confidence]
+    if class_name:
+        clauses.append("d.class_id = (SELECT id FROM classes WHERE name = ?)")
+        params.append(class_name)
+    if file_path:
+        clauses.append("d.file_id = (SELECT id FROM files WHERE path = ?)")
+        params.append(file_path)
+    if time_from is not None:
+        clauses.append("d.time >= ?")
+        params.append(time_from)
+    if time_to is not None:
+        clauses.append("d.time <= ?")
+        params.append(time_to)
+    params.append(limit)
+    sql = (
+        "SELECT f.path, f.kind, d.frame, d.time, c.name, d.conf "
+        "FROM detections d JOIN files f ON f.id = d.file_id JOIN classes c ON c.id = d.class_id "
+        f"WHERE {' AND '.join(clauses)} ORDER BY d.conf DESC LIMIT ?"
+    )
+    return connection.execute(sql, params).fetchall()
+
+
+class DetectionSearchDialog(QDialog):
+    """Búsqueda en el índice; doble clic en un resultado lo abre en ese frame"""
+    result_activated = pyqtSignal(str, str, int)  # ruta, tipo, frame
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Buscar detecciones")
+        self.setModal(False)
+        self.resize(720, 480)
+        self._connection = None
+        layout = QVBoxLayout(self)
+
+        form = QFormLayout()
+        self.class_combo = QComboBox()
+        self.class_combo.setEditable(True)
+        form.addRow("Clase:", self.class_combo)
+
+        self.confidence_spin = QDoubleSpinBox()
+        self.confidence_spin.setRange(0.0, 1.0)
+        self.confidence_spin.setSingleStep(0.05)
+        self.confidence_spin.setValue(0.5)
+        form.addRow("Confianza mínima:", self.confidence_spin)
+
+        self.file_combo = QComboBox()
+        form.addRow("Archivo:", self.file_combo)
+
+        time_row = QHBoxLayout()
+        self.time_from_spin = QDoubleSpinBox()
+        self.time_to_spin = QDoubleSpinBox()
+        for spin in (self.time_from_spin, self.time_to_spin):
+            spin.setRange(0.0, 1e7)
+            spin.setSuffix(" s")
+        self.time_to_spin.setSpecialValueText("sin límite")
+        time_row.addWidget(self.time_from_spin)
+        time_row.addWidget(QLabel("a"))
+        time_row.addWidget(self.time_to_spin)
+        form.addRow("Tiempo en el video:", time_row)
+        layout.addLayout(form)
+
+        search = QPushButton("Buscar")
+        search.setDefault(True)
+        search.clicked.connect(self._search)
+        layout.addWidget(search)
+
+        self.table = QTableWidget(0, 5)
+        self.table.setHorizontalHeaderLabels(["Archivo", "Frame", "Tiempo", "Clase", "Confianza"])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.table.cellDoubleClicked.connect(self._activate)
+        layout.addWidget(self.table, 1)
+
+        self.summary_label = QLabel("")
+        layout.addWidget(self.summary_label)
+        self._results = []
+
+    def showEvent(self, event):
+        self._load_filters()
+        super().showEvent(event)
+
+    def _ensure_connection(self):
+        if self._connection is None:
+            self._connection = open_detection_index()
+        return self._connection
+
+    def _load_filters(self):
+        try:
+            connection = self._ensure_connection()
+            classes = [row[0] for row in connection.execute("SELECT name FROM classes ORDER BY name")]
+            files = [row[0] for row in connection.execute("SELECT path FROM files ORDER BY path")]
+        except Exception as e:
+            self.summary_label.setText(f"No se pudo abrir el índice: {e}")
+            return
+        current_class = self.class_combo.currentText()
+        current_file = self.file_combo.currentData()
+        self.class_combo.clear()
+        self.class_combo.addItem("")
+        self.class_combo.addItems(classes)
+        self.class_combo.setCurrentText(current_class)
+        self.file_combo.clear()
+        self.file_combo.addItem("Todos", None)
+        for path in files:
+            self.file_combo.addItem(os.path.basename(path), path)
+        index = self.file_combo.findData(current_file)
+        self.file_combo.setCurrentIndex(max(index, 0))
+
+    def _search(self):
+        start = time.perf_counter()
+        time_to = self.time_to_spin.value()
+        try:
+            self._results = query_detection_index(
+                self._ensure_connection(),
+                class_name=self.class_combo.currentText().strip() or None,
+                min_confidence=self.confidence_spin.value(),
+                file_path=self.file_combo.currentData(),
+                time_from=self.time_from_spin.value() or None,
+                time_to=time_to if time_to > 0 else None,
+            )
+        except Exception as e:
+            self.summary_label.setText(f"Error en la búsqueda: {e}")
+            return
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.table.setRowCount(len(self._results))
+        for row, (path, kind, frame, timestamp, name, conf) in enumerate(self._results):
+            values = (os.path.basename(path), str(frame), f"{timestamp:.2f} s", name, f"{conf:.2f}")
+            for column, value in enumerate(values):
+                self.table.setItem(row, column, QTableWidgetItem(value))
+        self.summary_label.setText(f"{len(self._results)} resultados en {elapsed_ms:.0f} ms")
+
+    def _activate(self, row, column):
+        path, kind, frame = self._results[row][:3]
+        self.result_activated.emit(path, kind, frame)
+
+    def closeEvent(self, event):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+        super().closeEvent(event)
+
+
+# --- Densidad de detecciones en la línea de tiempo ---
+class TimelineDensity:
+    """Histograma de detecciones a lo largo de un video con un número fijo de cubetas.
+
+    Se alimenta frame a frame desde el hilo de inferencia (o de golpe desde el
+    índice de detecciones); cada frame se cuenta una sola vez aunque se vuelva
+    a reproducir. Como el número de cubetas es fijo, dibujarlo cuesta lo mismo
+    para un clip corto que para una grabación de dos horas.
+    """
+    BINS = 400
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset(0)
+
+    def reset(self, total_frames):
+        with self._lock:
+            self.total_frames = max(0, int(total_frames))
+            self._seen = np.zeros(self.total_frames, dtype=bool)
+            self._analysed = np.zeros(self.BINS, dtype=np.int32)
+            self._totals = np.zeros(self.BINS, dtype=np.int32)
+            self._per_class = {}
+            self.version = 0
+
+    def _bin(self, frame_index):
+        return min(self.BINS - 1, frame_index * self.BINS // self.total_frames)
+
+    def _add_counts(self, frame_index, counts_by_name):
+        if not 0 <= frame_index < self.total_frames or self._seen[frame_index]:
+            return False
+        self._seen[frame_index] = True
+        bin_index = self._bin(frame_index)
+        self._analysed[bin_index] += 1
+        for name, count in counts_by_name.items():
+            if name not in self._per_class:
+                self._per_class[name] = np.zeros(self.BINS, dtype=np.int32)
+            self._per_class[name][bin_index] += count
+            self._totals[bin_index] += count
+        return True
+
+    def add(self, frame_index, detections):
+        """Cuenta las detecciones de un frame (llamado desde el hilo de inferencia)"""
+        names = detections["names"]
+        classes, counts = np.unique(detections["cls"], return_counts=True)
+        counts_by_name = {names[int(c)]: int(n) for c, n in zip(classes, counts)}
+        with self._lock:
+            if self._add_counts(frame_index, counts_by_name):
+                self.version += 1
+
+    def add_rows(self, rows):
+        """Incorpora filas (frame, clase, cantidad) leídas del índice de detecciones"""
+        by_frame = {}
+        for frame_index, name, count in rows:
+            by_frame.setdefault(frame_index, {})[name] = count
+        with self._lock:
+            for frame_index, counts_by_name in by_frame.items():
+                self._add_counts(frame_index, counts_by_name)
+            self.version += 1
+
+    def class_names(self):
+        with self._lock:
+            return sorted(self._per_class)
+
+    def snapshot(self, class_name=None):
+        """(versión, detecciones por cubeta, frames analizados por cubeta)"""
+        with self._lock:
+            values = self._per_class.get(class_name) if class_name else self._totals
+            values = values.copy() if values is not None else np.zeros(self.BINS, dtype=np.int32)
+            return self.version, values, self._analysed.copy()
+
+
+class TimelinePrefillThread(QThread):
+    """Carga del índice las detecciones ya conocidas de un video para la línea de tiempo"""
+    prefill_ready = pyqtSignal(str, object)  # ruta, filas (frame, clase, cantidad)
+
+    def __init__(self, video_path):
+        super().__init__()
+        self.video_path = video_path
+
+    def run(self):
+        try:
+            connection = open_detection_index()
+            try:
+                rows = connection.execute(
+                    "SELECT d.frame, c.name, COUNT(*) FROM detections d "
+                    "JOIN classes c ON c.id = d.class_id "
+                    "WHERE d.file_id = (SELECT id FROM files WHERE path = ?) "
+                    "GROUP BY d.frame, d.class_id", (self.video_path,)).fetchall()
+            finally:
+                connection.close()
+        except Exception as e:
+            print(f"No se pudo leer el índice para la línea de tiempo: {e}")
+            return
+        if rows:
+            self.prefill_ready.emit(self.video_path, rows)
+
+
+class DensityStrip(QWidget):
+    """Franja de densidad sobre la barra de progreso; un clic busca esa posición"""
+    seek_requested = pyqtSignal(float)  # fracción del video
+    REFRESH_MS = 500
+
+    def __init__(self, density, parent=None):
+        super().__init__(parent)
+        self.density = density
+        self.class_name = None
+        self.setFixedHeight(14)
+        self.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.setToolTip("Densidad de detecciones · clic para ir · clic derecho para elegir la clase")
+        self._image = None
+        self._version = None
+        self._timer = QTimer(self)
+        self._timer.setInterval(self.REFRESH_MS)
+        self._timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        self._timer.start()
+        self.refresh()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self._timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self, force=False):
+        """Reconstruye la imagen de 1 píxel de alto solo si el histograma ha cambiado"""
+        version, values, analysed = self.density.snapshot(self.class_name)
+        if version == self._version and not force:
+            return
+        self._version = version
+        peak = max(int(values.max()), 1)
+        color = QColor(*DETECTION_COLOR[::-1])
+        rgba = np.zeros((1, len(values), 4), dtype=np.uint8)
+        # Cubetas sin analizar: gris tenue; analizadas: color con opacidad según la densidad
+        rgba[0, analysed == 0] = (128, 128, 128, 40)
+        alpha = np.sqrt(values / float(peak))
+        hot = (analysed > 0) & (values > 0)
+        rgba[0, hot, 0] = color.red()
+        rgba[0, hot, 1] = color.green()
+        rgba[0, hot, 2] = color.blue()
+        rgba[0, hot, 3] = (60 + 195 * alpha[hot]).astype(np.uint8)
+        self._image = QImage(rgba.data, len(values), 1, len(values) * 4, QImage.Format.Format_RGBA8888).copy()
+        self.update()
+
+    def paintEvent(self, event):
+        if self._image is None:
+            return
+        painter = QPainter(self)
+        painter.drawImage(QRectF(self.rect()), self._image)
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton and self.width() > 0:
+            self.seek_requested.emit(min(max(event.position().x() / self.width(), 0.0), 1.0))
+
+    def contextMenuEvent(self, event):
+        menu = QMenu(self)
+        for label, name in [("Todas las clases", None)] + [(n, n) for n in self.density.class_names()]:
+            action = menu.addAction(label)
+            action.setCheckable(True)
+            action.setChecked(name == self.class_name)
+            action.triggered.connect(lambda checked, n=name: self._set_class(n))
+        menu.exec(event.globalPos())
+
+    def _set_class(self, name):
+        self.class_name = name
+        self.refresh(force=True)
+
+
+# --- Servidor local de detección ---
+SERVER_CONFIG_PATH = os.path.join(CONFIG_DIR, "servidor.json")
+DEFAULT_SERVER_CONFIG = {
+    "port": 8765,
+    "max_batch": 8,        # imágenes por llamada al modelo
+    "max_wait_ms": 10,     # espera máxima para completar un lote
+    "max_queue": 32,       # peticiones en espera antes de rechazar (503)
+    "max_upload_mb": 32,
+}
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+class ServerBusy(Exception):
+    """La cola del servidor está llena: el cliente debe reintentar más tarde"""
+
+
+class DetectionRequest:
+    """Imagen pendiente de inferencia con su resultado y sus marcas de tiempo"""
+    __slots__ = ("image_rgb", "received", "started", "finished", "detections", "error", "batch_size", "_done")
+
+    def __init__(self, image_rgb):
+        self.image_rgb = image_rgb
+        self.received = time.perf_counter()
+        self.started = None
+        self.finished = None
+        self.detections = None
+        self.error = None
+        self.batch_size = 0
+        self._done = threading.Event()
+
+    def resolve(self, detections=None, error=None):
+        self.detections = detections
+        self.error = error
+        self.finished = time.perf_counter()
+        self._done.set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def response(self):
+        """Cuerpo JSON de la respuesta con el desglose de la latencia"""
+        height, width = self.image_rgb.shape[:2]
+        return {
+            "width": width,
+            "height": height,
+            "detections": detections_to_records(self.detections),
+            "batch_size": self.batch_size,
+            "latency_ms": {
+                "queue": round((self.started - self.received) * 1000, 2),
+                "inference": round((self.finished - self.started) * 1000, 2),
+                "total": round((self.finished - self.received) * 1000, 2),
+            },
+        }
+
+
+def websocket_read_message(rfile, max_bytes):
+    """Lee un mensaje WebSocket completo (uniendo fragmentos); devuelve (opcode, datos) o (None, None)"""
+    opcode = None
+    chunks = []
+    size = 0
+    while True:
+        header = rfile.read(2)
+        if len(header) < 2:
+            return None, None
+        fin = header[0] & 0x80
+        frame_opcode = header[0] & 0x0F
+        length = header[1] & 0x7F
+        if length == 126:
+            length = struct.unpack(">H", rfile.read(2))[0]
+        elif length == 127:
+            length = struct.unpack(">Q", rfile.read(8))[0]
+        size += length
+        if size > max_bytes:
+            raise ValueError("Mensaje demasiado grande")
+        mask = rfile.read(4) if header[1] & 0x80 else None
+        payload = rfile.read(length)
+        if len(payload) < length:
+            return None, None
+        if mask:
+            data = np.frombuffer(payload, dtype=np.uint8)
+            payload = (data ^ np.resize(np.frombuffer(mask, dtype=np.uint8), length)).tobytes()
+        if frame_opcode >= 0x8:
+            # Los mensajes de control pueden intercalarse entre fragmentos
+            return frame_opcode, payload
+        if frame_opcode != 0:
+            opcode = frame_opcode
+        chunks.append(payload)
+        if fin:
+            return opcode, b"".join(chunks)
+
+
+def websocket_send(wfile, opcode, payload):
+    """Envía un mensaje WebSocket sin máscara (sentido servidor → cliente)"""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack(">BB", 0x80 | opcode, length)
+    elif length < 1 << 16:
+        header = struct.pack(">BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack(">BBQ", 0x80 | opcode, 127, length)
+    wfile.write(header + payload)
+    wfile.flush()
+
+
+class DetectionServer(QThread):
+    """Expone el modelo cargado en http://127.0.0.1:<puerto> para otras aplicaciones.
+
+    Los hilos HTTP solo decodifican la imagen y la encolan; este hilo agrupa
+    las peticiones que llegan juntas en un lote de hasta max_batch imágenes,
+    esperando como mucho max_wait_ms a que se complete, y hace una sola
+    llamada al modelo por lote. Con la cola llena se responde 503 en lugar de
+    acumular trabajo (contrapresión).
+
+    - POST /detectar (cuerpo: imagen JPEG/PNG) → detecciones y latencia en JSON
+    - GET /ws → WebSocket: cada mensaje binario es una imagen y se responde
+      con un mensaje de texto JSON, en orden y de uno en uno por conexión
+    - GET /estado → contadores y percentiles de latencia
+    """
+    status_update = pyqtSignal(str)
+    stats_update = pyqtSignal(object)
+    REQUEST_TIMEOUT = 30.0
+    LATENCY_WINDOW = 1000
+
+    def __init__(self, yolo_model, config):
+        super().__init__()
+        self.yolo_model = yolo_model
+        self.port = int(config["port"])
+        self.max_batch = max(1, int(config["max_batch"]))
+        self.max_wait = max(0.0, float(config["max_wait_ms"]) / 1000.0)
+        self.max_upload = int(config["max_upload_mb"] * 1024 * 1024)
+        self._queue = queue.Queue(maxsize=max(1, int(config["max_queue"])))
+        self._running = False
+        self._httpd = None
+        self._stats_lock = threading.Lock()
+        self._latencies = deque(maxlen=self.LATENCY_WINDOW)
+        self.served = 0
+        self.rejected = 0
+        self.failed = 0
+        self.batches = 0
+        self._thread_config_version = None
+
+    # --- Lado de los clientes (hilos HTTP) ---
+    def submit(self, image_bgr):
+        """Encola una imagen y espera su resultado; ServerBusy si la cola está llena"""
+        request = DetectionRequest(cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB))
+        if not self._running:
+            raise ServerBusy("El servidor se está deteniendo")
+        try:
+            self._queue.put_nowait(request)
+        except queue.Full:
+            with self._stats_lock:
+                self.rejected += 1
+            raise ServerBusy("Cola llena")
+        if not request.wait(self.REQUEST_TIMEOUT):
+            raise TimeoutError("La inferencia no terminó a tiempo")
+        if request.error is not None:
+            raise RuntimeError(request.error)
+        return request.response()
+
+    def stats(self):
+        with self._stats_lock:
+            latencies = np.array(self._latencies, dtype=np.float64)
+            stats = {"served": self.served, "rejected": self.rejected, "failed": self.failed,
+                     "batches": self.batches, "queued": self._queue.qsize(),
+                     "mean_batch": round(self.served / self.batches, 2) if self.batches else 0.0}
+        if len(latencies):
+            stats["latency_ms"] = {"p50": round(float(np.percentile(latencies, 50)), 2),
+                                   "p95": round(float(np.percentile(latencies, 95)), 2),
+                                   "max": round(float(latencies.max()), 2)}
+        return stats
+
+    def stop(self):
+        self._running = False
+        if self._httpd is not None:
+            threading.Thread(target=self._httpd.shutdown, daemon=True).start()
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+    # --- Hilo de inferencia ---
+    def run(self):
+        try:
+            self._httpd = ThreadingHTTPServer(("127.0.0.1", self.port), self._handler_class())
+        except OSError as e:
+            self.status_update.emit(f"No se pudo abrir el puerto {self.port}: {e}")
+            return
+        self._httpd.daemon_threads = True
+        self._running = True
+        http_thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        http_thread.start()
+        self.status_update.emit(f"Servidor de detección en http://127.0.0.1:{self.port}")
+        last_stats = time.perf_counter()
+        try:
+            while self._running:
+                batch = self._collect_batch()
+                if batch:
+                    self._run_batch(batch)
+                now = time.perf_counter()
+                if now - last_stats >= 1.0:
+                    last_stats = now
+                    self.stats_update.emit(self.stats())
+        finally:
+            self._running = False
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            # Las peticiones que quedaron en cola no se atenderán
+            while True:
+                try:
+                    request = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if request is not None:
+                    request.resolve(error="Servidor detenido")
+            self.status_update.emit("Servidor de detección detenido.")
+
+    def _collect_batch(self):
+        """Primera petición sin límite de espera; las siguientes hasta completar el lote o agotar max_wait"""
+        try:
+            first = self._queue.get(timeout=0.5)
+        except queue.Empty:
+            return []
+        if first is None:
+            return []
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                break
+            batch.append(request)
+        return batch
+
+    def _run_batch(self, batch):
+        model = self.yolo_model
+        started = time.perf_counter()
+        for request in batch:
+            request.started = started
+            request.batch_size = len(batch)
+        if model is None:
+            for request in batch:
+                request.resolve(error="Modelo no disponible")
+            return
+        self._thread_config_version = sync_thread_config(self._thread_config_version)
+        try:
+            with MODEL_LOCK:
+                results = model([request.image_rgb for request in batch], verbose=False)
+        except Exception as e:
+            with self._stats_lock:
+                self.failed += len(batch)
+            for request in batch:
+                request.resolve(error=str(e))
+            return
+        for request, result in zip(batch, results):
+            request.resolve(extract_detections([result]))
+        with self._stats_lock:
+            self.batches += 1
+            self.served += len(batch)
+            self._latencies.extend((request.finished - request.received) * 1000 for request in batch)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status, body, headers=None):
+                data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _detect(self, payload):
+                """(estado HTTP, cuerpo, cabeceras) para una imagen codificada"""
+                image = cv2.imdecode(np.frombuffer(payload, dtype=np.uint8), cv2.IMREAD_COLOR)
+                if image is None:
+                    return 400, {"error": "No se pudo decodificar la imagen"}, None
+                try:
+                    return 200, server.submit(image), None
+                except ServerBusy as e:
+                    return 503, {"error": str(e)}, {"Retry-After": "1"}
+                except TimeoutError as e:
+                    return 504, {"error": str(e)}, None
+                except RuntimeError as e:
+                    return 500, {"error": str(e)}, None
+
+            def do_GET(self):
+                if self.path == "/estado":
+                    self._send_json(200, server.stats())
+                elif self.path == "/ws" and self.headers.get("Upgrade", "").lower() == "websocket":
+                    self._serve_websocket()
+                else:
+                    self._send_json(404, {"error": "Ruta desconocida"})
+
+            def do_POST(self):
+                if self.path != "/detectar":
+                    self._send_json(404, {"error": "Ruta desconocida"})
+                    return
+                length = int(self.headers.get("Content-Length") or 0)
+                if length <= 0 or length > server.max_upload:
+                    self.close_connection = True
+                    self._send_json(413 if length > 0 else 400, {"error": "Tamaño de imagen no válido"})
+                    return
+                status, body, headers = self._detect(self.rfile.read(length))
+                self._send_json(status, body, headers)
+
+            def _serve_websocket(self):
+                key = self.headers.get("Sec-WebSocket-Key", "")
+                accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+                self.send_response(101, "Switching Protocols")
+                self.send_header("Upgrade", "websocket")
+                self.send_header("Connection", "Upgrade")
+                self.send_header("Sec-WebSocket-Accept", accept)
+                self.end_headers()
+                self.wfile.flush()
+                self.close_connection = True
+                try:
+                    while server._running:
+                        opcode, payload = websocket_read_message(self.rfile, server.max_upload)
+                        if opcode is None or opcode == 0x8:
+                            websocket_send(self.wfile, 0x8, b"")
+                            break
+                        if opcode == 0x9:
+                            websocket_send(self.wfile, 0xA, payload)
+                        elif opcode == 0x2:
+                            # Se responde antes de leer la siguiente imagen: un cliente
+                            # rápido queda frenado por TCP en lugar de llenar la cola
+                            status, body, _ = self._detect(payload)
+                            body["status"] = status
+                            websocket_send(self.wfile, 0x1, json.dumps(body, ensure_ascii=False).encode("utf-8"))
+                except (OSError, ValueError):
+                    pass
+
+        return Handler
+
+
+class ServerSettingsDialog(QDialog):
+    """Puerto y parámetros de agrupación del servidor de detección"""
+
+    def __init__(self, config, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Servidor de detección")
+        layout = QFormLayout(self)
+
+        self.port_spin = QSpinBox()
+        self.port_spin.setRange(1024, 65535)
+        self.port_spin.setValue(int(config["port"]))
+        layout.addRow("Puerto (solo 127.0.0.1):", self.port_spin)
+
+        self.batch_spin = QSpinBox()
+        self.batch_spin.setRange(1, 64)
+        self.batch_spin.setValue(int(config["max_batch"]))
+        layout.addRow("Imágenes por lote:", self.batch_spin)
+
+        self.wait_spin = QSpinBox()
+        self.wait_spin.setRange(0, 1000)
+        self.wait_spin.setSuffix(" ms")
+        self.wait_spin.setValue(int(config["max_wait_ms"]))
+        layout.addRow("Espera máxima del lote:", self.wait_spin)
+
+        self.queue_spin = QSpinBox()
+        self.queue_spin.setRange(1, 1024)
+        self.queue_spin.setValue(int(config["max_queue"]))
+        layout.addRow("Peticiones en cola:", self.queue_spin)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        buttons.button(QDialogButtonBox.StandardButton.Ok).setText("Iniciar")
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addRow(buttons)
+        self._max_upload_mb = config["max_upload_mb"]
+
+    def settings(self):
+        return {
+            "port": self.port_spin.value(),
+            "max_batch": self.batch_spin.value(),
+            "max_wait_ms": self.wait_spin.value(),
+            "max_queue": self.queue_spin.value(),
+            "max_upload_mb": self._max_upload_mb,
+        }
+
+
+# --- Ingesta de frames por memoria compartida ---
+SHM_DEFAULT_NAME = "yolo_vision"
+SHM_MAX_DETECTIONS = 256
+SHM_NAMES_BYTES = 16384
+# Cabecera del anillo de frames, al inicio del bloque "<nombre>_frames"
+SHM_RING_HEADER = np.dtype([("magic", "S8"), ("slots", "<u4"), ("max_width", "<u4"),
+                            ("max_height", "<u4"), ("_pad", "<u4"), ("write_seq", "<u8")])
+# Cabecera de cada ranura; le siguen max_height × max_width × 3 bytes BGR
+SHM_SLOT_HEADER = np.dtype([("version", "<u8"), ("seq", "<u8"), ("width", "<u4"),
+                            ("height", "<u4"), ("timestamp", "<f8")])
+# Tabla de resultados, bloque "<nombre>_resultados"
+SHM_RESULTS_HEADER = np.dtype([("magic", "S8"), ("slots", "<u4"), ("max_detections", "<u4"),
+                               ("names_length", "<u4"), ("_pad", "<u4"), ("names", "S%d" % SHM_NAMES_BYTES)])
+SHM_RESULT_SLOT = np.dtype([("version", "<u8"), ("seq", "<u8"), ("count", "<u4"), ("latency_ms", "<f4"),
+                            ("rows", "<f4", (SHM_MAX_DETECTIONS, 6))])  # x1, y1, x2, y2, confianza, clase
+
+
+def _align64(size):
+    return (size + 63) & ~63
+
+
+def attach_shared_memory(name):
+    """Abre un bloque existente sin que este proceso lo borre al salir"""
+    from multiprocessing import shared_memory
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: en POSIX el rastreador de recursos borraría el bloque del
+        # productor; en Windows no hay rastreador y el bloque vive mientras alguien lo tenga abierto
+        shm = shared_memory.SharedMemory(name=name)
+        if os.name == "posix":
+            try:
+                from multiprocessing import resource_tracker
+                resource_tracker.unregister(shm._name, "shared_memory")
+            except Exception:
+                shm.close()
+                raise
+        return shm
+
+
+class SharedFrameRing:
+    """Anillo de frames BGR en memoria compartida.
+
+    Cada ranura lleva un contador de versión que es impar mientras el
+    productor escribe (seqlock): el lector compara la versión antes y después
+    de leer y descarta el frame si cambió. write_seq es el número del último
+    frame completo; el frame n ocupa la ranura n % slots.
+    """
+    MAGIC = b"YVFRAME1"
+
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+        self.header = np.ndarray(1, dtype=SHM_RING_HEADER, buffer=shm.buf)[0]
+        if bytes(self.header["magic"]) != self.MAGIC:
+            raise ValueError(f"El bloque {shm.name} no es un anillo de frames")
+        self.slots = int(self.header["slots"])
+        self.max_width = int(self.header["max_width"])
+        self.max_height = int(self.header["max_height"])
+        self._slot_size = self.slot_size(self.max_width, self.max_height)
+        self._slot_headers = [
+            np.ndarray(1, dtype=SHM_SLOT_HEADER, buffer=shm.buf, offset=self._slot_offset(i))[0]
+            for i in range(self.slots)
+        ]
+
+    @staticmethod
+    def slot_size(max_width, max_height):
+        return _align64(SHM_SLOT_HEADER.itemsize + max_width * max_height * 3)
+
+    def _slot_offset(self, index):
+        return _align64(SHM_RING_HEADER.itemsize) + index * self._slot_size
+
+    @classmethod
+    def create(cls, name, slots, max_width, max_height):
+        from multiprocessing import shared_memory
+        size = _align64(SHM_RING_HEADER.itemsize) + slots * cls.slot_size(max_width, max_height)
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray(1, dtype=SHM_RING_HEADER, buffer=shm.buf)
+        header[0] = (cls.MAGIC, slots, max_width, max_height, 0, 0)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        return cls(attach_shared_memory(name), owner=False)
+
+    def _pixels(self, index, width, height):
+        return np.ndarray((height, width, 3), dtype=np.uint8, buffer=self.shm.buf,
+                          offset=self._slot_offset(index) + SHM_SLOT_HEADER.itemsize)
+
+    # --- Productor ---
+    def begin_write(self, width, height):
+        """Reserva la siguiente ranura y devuelve (seq, vista) para escribir el frame en ella"""
+        if width > self.max_width or height > self.max_height:
+            raise ValueError(f"Frame de {width}x{height} mayor que el máximo del anillo")
+        seq = int(self.header["write_seq"]) + 1
+        slot = self._slot_headers[seq % self.slots]
+        slot["version"] += 1  # impar: escribiendo
+        slot["seq"] = seq
+        slot["width"] = width
+        slot["height"] = height
+        return seq, self._pixels(seq % self.slots, width, height)
+
+    def commit(self, seq):
+        """Publica el frame escrito en la ranura de seq"""
+        slot = self._slot_headers[seq % self.slots]
+        slot["timestamp"] = time.time()
+        slot["version"] += 1
+        self.header["write_seq"] = seq
+
+    def write(self, frame_bgr):
+        """Copia un frame al anillo y devuelve su número"""
+        height, width = frame_bgr.shape[:2]
+        seq, view = self.begin_write(width, height)
+        np.copyto(view, frame_bgr)
+        self.commit(seq)
+        return seq
+
+    # --- Detector ---
+    def latest_seq(self):
+        return int(self.header["write_seq"])
+
+    def read_view(self, seq):
+        """(versión, vista sin copiar) del frame seq, o None si se está escribiendo o ya se sustituyó"""
+        index = seq % self.slots
+        slot = self._slot_headers[index]
+        version = int(slot["version"])
+        if version % 2 or int(slot["seq"]) != seq:
+            return None
+        return version, self._pixels(index, int(slot["width"]), int(slot["height"]))
+
+    def unchanged(self, seq, version):
+        return int(self._slot_headers[seq % self.slots]["version"]) == version
+
+    def close(self):
+        # Las vistas NumPy deben soltarse antes de cerrar el bloque
+        self.header = None
+        self._slot_headers = []
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class SharedResultsTable:
+    """Detecciones publicadas por el detector, una ranura por frame (seq % slots).
+
+    Usa el mismo esquema de versiones que SharedFrameRing; los nombres de las
+    clases se publican una vez como JSON en la cabecera.
+    """
+    MAGIC = b"YVRESUL1"
+
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+        self.header = np.ndarray(1, dtype=SHM_RESULTS_HEADER, buffer=shm.buf)[0]
+        if bytes(self.header["magic"]) != self.MAGIC:
+            raise ValueError(f"El bloque {shm.name} no es una tabla de resultados")
+        self.slots = int(self.header["slots"])
+        self.rows = np.ndarray(self.slots, dtype=SHM_RESULT_SLOT, buffer=shm.buf,
+                               offset=_align64(SHM_RESULTS_HEADER.itemsize))
+
+    @classmethod
+    def create(cls, name, slots):
+        from multiprocessing import shared_memory
+        size = _align64(SHM_RESULTS_HEADER.itemsize) + slots * SHM_RESULT_SLOT.itemsize
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray(1, dtype=SHM_RESULTS_HEADER, buffer=shm.buf)
+        header[0] = (cls.MAGIC, slots, SHM_MAX_DETECTIONS, 0, 0, b"")
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        return cls(attach_shared_memory(name), owner=False)
+
+    def publish_names(self, names):
+        data = json.dumps({str(k): v for k, v in names.items()}, ensure_ascii=False).encode("utf-8")
+        if len(data) <= SHM_NAMES_BYTES:
+            self.header["names"] = data
+            self.header["names_length"] = len(data)
+
+    def class_names(self):
+        length = int(self.header["names_length"])
+        if not length:
+            return {}
+        return {int(k): v for k, v in json.loads(bytes(self.header["names"])[:length].decode("utf-8")).items()}
+
+    def publish(self, seq, detections, latency_ms):
+        row = self.rows[seq % self.slots]
+        count = min(len(detections["conf"]), SHM_MAX_DETECTIONS)
+        row["version"] += 1
+        row["seq"] = seq
+        row["count"] = count
+        row["latency_ms"] = latency_ms
+        boxes = row["rows"]
+        boxes[:count, :4] = detections["xyxy"][:count]
+        boxes[:count, 4] = detections["conf"][:count]
+        boxes[:count, 5] = detections["cls"][:count]
+        row["version"] += 1
+
+    def read(self, seq):
+        """Copia de las detecciones del frame seq, o None si aún no están o ya se sustituyeron"""
+        row = self.rows[seq % self.slots]
+        version = int(row["version"])
+        if version % 2 or int(row["seq"]) != seq:
+            return None
+        count = int(row["count"])
+        boxes = row["rows"][:count].copy()
+        latency = float(row["latency_ms"])
+        if int(row["version"]) != version:
+            return None
+        return {"xyxy": boxes[:, :4], "conf": boxes[:, 4], "cls": boxes[:, 5].astype(np.int32),
+                "latency_ms": latency}
+
+    def close(self):
+        self.header = None
+        self.rows = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class SharedFrameProducer:
+    """Lado del productor: crea el anillo de frames y la tabla de resultados.
+
+    Ejemplo desde el software de captura::
+
+        producer = SharedFrameProducer("yolo_vision", max_width=1920, max_height=1080)
+        seq, view = producer.ring.begin_write(w, h)
+        cap.read(view)                 # o copiar el frame que ya se tiene
+        producer.ring.commit(seq)
+        ...
+        detections = producer.results.read(seq)   # None hasta que el detector lo publique
+
+    Los productores en otros lenguajes pueden escribir el mismo formato
+    (SHM_RING_HEADER, SHM_SLOT_HEADER y SHM_RESULT_SLOT).
+    """
+
+    def __init__(self, name=SHM_DEFAULT_NAME, slots=4, max_width=1920, max_height=1080, result_slots=64):
+        self.ring = SharedFrameRing.create(f"{name}_frames", slots, max_width, max_height)
+        try:
+            self.results = SharedResultsTable.create(f"{name}_resultados", result_slots)
+        except Exception:
+            self.ring.close()
+            raise
+
+    def write(self, frame_bgr):
+        return self.ring.write(frame_bgr)
+
+    def close(self):
+        self.results.close()
+        self.ring.close()
+
+
+class SharedMemoryIngest(QThread):
+    """Detector sobre el anillo de memoria compartida de un productor local.
+
+    Siempre analiza el frame más reciente: si el productor va más rápido que
+    la inferencia, los frames intermedios se saltan en lugar de acumular
+    retraso. La lectura del anillo se hace en la misma pasada que la
+    conversión a RGB que necesita el modelo, sobre un búfer reutilizado, así
+    que no hay copia ni codificación adicional; si el productor reescribe la
+    ranura durante esa pasada el frame se descarta.
+    """
+    status_update = pyqtSignal(str)
+    stats_update = pyqtSignal(object)
+    POLL_INTERVAL = 0.0005
+
+    def __init__(self, yolo_model, name=SHM_DEFAULT_NAME):
+        super().__init__()
+        self.yolo_model = yolo_model
+        self.name = name
+        self._running = True
+        self._thread_config_version = None
+        self.processed = 0
+        self.skipped = 0
+        self.torn = 0
+
+    def stop(self):
+        self._running = False
+
+    def _attach(self):
+        """Espera a que el productor cree los bloques"""
+        announced = False
+        while self._running:
+            try:
+                ring = SharedFrameRing.attach(f"{self.name}_frames")
+            except FileNotFoundError:
+                if not announced:
+                    self.status_update.emit(f"Esperando al productor de memoria compartida «{self.name}»...")
+                    announced = True
+                self.msleep(500)
+                continue
+            try:
+                return ring, SharedResultsTable.attach(f"{self.name}_resultados")
+            except Exception:
+                ring.close()
+                raise
+        return None, None
+
+    def run(self):
+        try:
+            ring, results = self._attach()
+        except (OSError, ValueError) as e:
+            self.status_update.emit(f"No se pudo abrir la memoria compartida: {e}")
+            return
+        if ring is None:
+            return
+        self.status_update.emit(f"Ingesta por memoria compartida «{self.name}» conectada.")
+        buffers = FrameBuffers()
+        names_published = False
+        last_seq = ring.latest_seq()
+        last_stats = time.perf_counter()
+        latencies = deque(maxlen=100)
+        view = pixels = None
+        try:
+            while self._running:
+                now = time.perf_counter()
+                if now - last_stats >= 1.0:
+                    last_stats = now
+                    self.stats_update.emit({"processed": self.processed, "skipped": self.skipped,
+                                            "torn": self.torn,
+                                            "latency_ms": float(np.mean(latencies)) if latencies else 0.0})
+                seq = ring.latest_seq()
+                model = self.yolo_model
+                if seq == last_seq or model is None:
+                    time.sleep(self.POLL_INTERVAL)
+                    continue
+                self.skipped += max(0, seq - last_seq - 1)
+                last_seq = seq
+                view = ring.read_view(seq)
+                if view is None:
+                    self.torn += 1
+                    continue
+                version, pixels = view
+                frame_rgb = buffers.to_rgb(pixels)
+                if not ring.unchanged(seq, version):
+                    self.torn += 1
+                    continue
+                self._thread_config_version = sync_thread_config(self._thread_config_version)
+                start = time.perf_counter()
+                with MODEL_LOCK:
+                    detections = extract_detections(model(frame_rgb, verbose=False))
+                latency_ms = (time.perf_counter() - start) * 1000
+                if not names_published:
+                    results.publish_names(detections["names"])
+                    names_published = True
+                results.publish(seq, detections, latency_ms)
+                latencies.append(latency_ms)
+                self.processed += 1
+        except Exception as e:
+            self.status_update.emit(f"Error en la ingesta por memoria compartida: {e}")
+        finally:
+            # Las vistas sobre la memoria compartida deben soltarse antes de cerrarla
+            view = pixels = None
+            results.close()
+            ring.close()
+        self.status_update.emit("Ingesta por memoria compartida detenida.")
+
+
+# --- Lienzo de video ---
+class VideoCanvas(QWidget):
+    """Muestra el último frame y dibuja las detecciones como vectores a resolución de pantalla.
+
+    El frame llega como arreglo BGRA y se envuelve en una QImage sin copiarlo;
+    las cajas se pintan en paintEvent a partir de los arreglos del modelo, de
+    modo que ocultarlas, hacer zoom o desplazar la vista no requiere volver a
+    procesar nada. La transformación imagen→pantalla se calcula solo cuando
+    cambian el tamaño del widget, el del frame, el zoom o el desplazamiento.
+    """
+    frame_released = pyqtSignal(object)  # arreglo BGRA que el lienzo deja de mostrar
+    view_scale_changed = pyqtSignal(float)  # píxeles de pantalla por píxel del frame, tras el zoom
+
+    MIN_ZOOM = 1.0
+    MAX_ZOOM = 8.0
+    ZOOM_STEP = 1.25
+
+    def __init__(self, text="", parent=None):
+        super().__init__(parent)
+        self.setAttribute(Qt.WidgetAttribute.WA_StyledBackground, True)
+        self.setAttribute(Qt.WidgetAttribute.WA_OpaquePaintEvent, False)
+        self._text = text
+        self._frame = None          # arreglo BGRA que respalda a _image
+        self._image = None
+        self._detections = None
+        self._overlays_visible = True
+        self._zoom = 1.0
+        self._pan = QPointF(0, 0)
+        self._transform = None
+        self._pan_anchor = None
+        self._label_font = QFont("Segoe UI", 9, QFont.Weight.DemiBold)
+        self._box_pen = QPen(QColor(*DETECTION_COLOR[::-1]), 2)
+        self._box_pen.setCosmetic(True)
+        self._label_bg = QColor(*TEXT_BG_COLOR[::-1])
+        self._label_fg = QColor(*TEXT_FG_COLOR[::-1])
+
+    # --- Contenido ---
+    def set_frame(self, frame_bgra, detections=None):
+        """Muestra un frame BGRA (NumPy) con sus detecciones en coordenadas del frame"""
+        h, w = frame_bgra.shape[:2]
+        if self._image is None or self._image.width() != w or self._image.height() != h:
+            self._transform = None
+        previous = self._frame
+        self._frame = frame_bgra
+        self._image = QImage(frame_bgra.data, w, h, frame_bgra.strides[0], QImage.Format.Format_RGB32)
+        self._detections = detections
+        self._text = ""
+        self.update()
+        if previous is not None and previous is not frame_bgra:
+            self.frame_released.emit(previous)
+
+    def set_detail_frame(self, frame_bgra):
+        """Sustituye el frame por una versión mayor de la misma imagen conservando zoom y desplazamiento"""
+        if self._image is None:
+            return
+        factor = frame_bgra.shape[1] / self._image.width()
+        detections = scale_detections(self._detections, factor) if self._detections is not None else None
+        # El zoom es relativo al ajuste a la vista, así que la región visible no cambia
+        self.set_frame(frame_bgra, detections)
+
+    def clear(self, text=""):
+        previous = self._frame
+        self._frame = None
+        self._image = None
+        self._detections = None
+        self._text = text
+        self.reset_view()
+        if previous is not None:
+            self.frame_released.emit(previous)
+
+    def has_frame(self):
+        return self._image is not None
+
+    def frame_side(self):
+        """Lado mayor en píxeles del frame mostrado (0 si no hay)"""
+        if self._image is None:
+            return 0
+        return max(self._image.width(), self._image.height())
+
+    def view_scale(self):
+        """Píxeles de pantalla por píxel del frame con el zoom actual"""
+        if self._image is None:
+            return 0.0
+        return self._image_transform().m11()
+
+    def displayed_size(self):
+        """Tamaño en pantalla del frame con el zoom actual"""
+        if self._image is None:
+            return QSize(0, 0)
+        rect = self._image_transform().mapRect(QRectF(self._image.rect()))
+        return QSize(int(rect.width()), int(rect.height()))
+
+    # --- Vista ---
+    def overlays_visible(self):
+        return self._overlays_visible
+
+    def set_overlays_visible(self, visible):
+        self._overlays_visible = visible
+        self.update()
+
+    def reset_view(self):
+        self._zoom = 1.0
+        self._pan = QPointF(0, 0)
+        self._transform = None
+        self.update()
+
+    def _content_rect(self):
+        # Margen interior equivalente al padding de la etiqueta anterior
+        return QRectF(self.rect()).adjusted(8, 8, -8, -8)
+
+    def _image_transform(self):
+        if self._transform is None and self._image is not None:
+            area = self._content_rect()
+            iw, ih = self._image.width(), self._image.height()
+            fit = min(area.width() / iw, area.height() / ih) if iw and ih else 1.0
+            scale = max(fit, 1e-6) * self._zoom
+            # Limitar el desplazamiento para que el frame no salga de la vista
+            max_x = max(0.0, (iw * scale - area.width()) / 2)
+            max_y = max(0.0, (ih * scale - area.height()) / 2)
+            self._pan = QPointF(min(max(self._pan.x(), -max_x), max_x),
+                                min(max(self._pan.y(), -max_y), max_y))
+            dx = area.center().x() - iw * scale / 2 + self._pan.x()
+            dy = area.center().y() - ih * scale / 2 + self._pan.y()
+            self._transform = QTransform(scale, 0, 0, scale, dx, dy)
+        return self._transform
+
+    # --- Eventos ---
+    def resizeEvent(self, event):
+        self._transform = None
+        super().resizeEvent(event)
+
+    def wheelEvent(self, event):
+        if self._image is None:
+            return
+        factor = self.ZOOM_STEP if event.angleDelta().y() > 0 else 1 / self.ZOOM_STEP
+        zoom = min(max(self._zoom * factor, self.MIN_ZOOM), self.MAX_ZOOM)
+        if zoom == self._zoom:
+            return
+        # Mantener fijo el punto bajo el cursor
+        center = self._content_rect().center()
+        offset = event.position() - center - self._pan
+        self._pan = self._pan - offset * (zoom / self._zoom - 1)
+        self._zoom = zoom
+        self._transform = None
+        self.update()
+        self.view_scale_changed.emit(self.view_scale())
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton and self._zoom > 1.0:
+            self._pan_anchor = event.position() - self._pan
+            self.setCursor(Qt.CursorShape.ClosedHandCursor)
+
+    def mouseMoveEvent(self, event):
+        if self._pan_anchor is not None:
+            self._pan = event.position() - self._pan_anchor
+            self._transform = None
+            self.update()
+
+    def mouseReleaseEvent(self, event):
+        if self._pan_anchor is not None:
+            self._pan_anchor = None
+            self.unsetCursor()
+
+    def mouseDoubleClickEvent(self, event):
+        self.reset_view()
+
+    def contextMenuEvent(self, event):
+        menu = QMenu(self)
+        toggle = menu.addAction("Mostrar detecciones")
+        toggle.setCheckable(True)
+        toggle.setChecked(self._overlays_visible)
+        toggle.toggled.connect(self.set_overlays_visible)
+        reset = menu.addAction("Restablecer zoom")
+        reset.setEnabled(self._zoom != 1.0)
+        reset.triggered.connect(self.reset_view)
+        menu.exec(event.globalPos())
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        # Fondo y borde definidos por la hoja de estilos del tema
+        option = QStyleOption()
+        option.initFrom(self)
+        self.style().drawPrimitive(QStyle.PrimitiveElement.PE_Widget, option, painter, self)
+
+        if self._image is None:
+            if self._text:
+                painter.setPen(self.palette().color(QPalette.ColorRole.WindowText))
+                painter.setFont(self.font())
+                painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, self._text)
+            return
+
+        transform = self._image_transform()
+        painter.setClipRect(self._content_rect())
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform, True)
+        painter.setTransform(transform)
+        painter.drawImage(0, 0, self._image)
+        painter.resetTransform()
+
+        if self._overlays_visible and self._detections is not None and len(self._detections["cls"]):
+            self._paint_detections(painter, transform)
+
+    def _paint_detections(self, painter, transform):
+        names = self._detections["names"]
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing, True)
+        painter.setFont(self._label_font)
+        metrics = QFontMetrics(self._label_font)
+        for box, conf, cls_id in zip(self._detections["xyxy"], self._detections["conf"], self._detections["cls"]):
+            rect = transform.mapRect(QRectF(float(box[0]), float(box[1]),
+                                            float(box[2] - box[0]), float(box[3] - box[1])))
+            painter.setPen(self._box_pen)
+            painter.setBrush(Qt.BrushStyle.NoBrush)
+            painter.drawRect(rect)
+
+            label = f"{names[int(cls_id)]}: {float(conf):.2f}"
+            text_rect = QRectF(metrics.boundingRect(label)).adjusted(-3, -2, 3, 2)
+            text_rect.moveBottomLeft(QPointF(rect.left() - 1, rect.top()))
+            if text_rect.top() < 0:
+                text_rect.moveTopLeft(rect.topLeft())
+            painter.fillRect(text_rect, self._label_bg)
+            painter.setPen(self._label_fg)
+            painter.drawText(text_rect, Qt.AlignmentFlag.AlignCenter, label)
+
+
+# --- Motor de temas ---
+class ThemeManager:
+    """Genera una sola hoja de estilos con todos los temas y la instala en la aplicación.
+
+    Cada tema se construye una vez y se acota con el selector
+    ``QMainWindow[theme="clave"]``; cambiar de tema consiste en cambiar esa
+    propiedad dinámica y repulir los widgets, sin volver a analizar CSS.
+    """
+    THEMES = {
+        "🌙 Oscuro": {
+            "bg": "#1a1a2e",
+            "accent": "#4A3AFF",
+            "secondary": "#28283A",
+            "border": "#3A3A4C",
+            "text": "#E0E0FF",
+            "text_secondary": "#B0B0C0",
+            "disabled": "#666680",
+            "hover": "#323248",
+            "pressed": "#3A3A58"
+        },
+        "☀️ Claro": {
+            "bg": "#FFFFFF",
+            "accent": "#6366F1",
+            "secondary": "#F8F9FA",
+            "border": "#E2E8F0",
+            "text": "#1E293B",
+            "text_secondary": "#64748B",
+            "disabled": "#CBD5E1",
+            "hover": "#F1F5F9",
+            "pressed": "#E2E8F0"
+        },
+        "🌺 Rosa": {
+            "bg": "#2D1A2E",
+            "accent": "#FF3AFF",
+            "secondary": "#3A1A3C",
+            "border": "#4C1A4E",
+            "text": "#FFE0FF",
+            "text_secondary": "#FFB0FF",
+            "disabled": "#806680",
+            "hover": "#4C2A4E",
+            "pressed": "#5C3A5E"
+        },
+        "🌊 Océano": {
+            "bg": "#1A2D2E",
+            "accent": "#3AFFFF",
+            "secondary": "#1A3A3C",
+            "border": "#1A4C4E",
+            "text": "#E0FFFF",
+            "text_secondary": "#B0FFFF",
+            "disabled": "#668080",
+            "hover": "#2A4D4E",
+            "pressed": "#3A5D5E"
+        },
+        "🍃 Bosque": {
+            "bg": "#1A2E1A",
+            "accent": "#3AFF3A",
+            "secondary": "#1A3C1A",
+            "border": "#1A4E1A",
+            "text": "#E0FFE0",
+            "text_secondary": "#B0FFB0",
+            "disabled": "#668066",
+            "hover": "#2A4E2A",
+            "pressed": "#3A5E3A"
+        },
+        "🌅 Atardecer": {
+            "bg": "#2E1A1A",
+            "accent": "#FF3A3A",
+            "secondary": "#3C1A1A",
+            "border": "#4E1A1A",
+            "text": "#FFE0E0",
+            "text_secondary": "#FFB0B0",
+            "disabled": "#806666",
+            "hover": "#4E2A2A",
+            "pressed": "#5E3A3A"
+        }
+    }
+
+    DEFAULT_THEME = "🌙 Oscuro"
+
+    def __init__(self):
+        self._style_cache = {}
+        self._combined_style = None
+
+    @staticmethod
+    def theme_key(theme_name):
+        """Clave ASCII del tema para usarla en el selector de propiedad"""
+        return re.sub(r"[^a-z]", "", theme_name.lower().encode("ascii", "ignore").decode()) or "tema"
+
+    def theme_style(self, theme_name):
+        """Hoja de estilos acotada de un tema (se genera una sola vez)"""
+        if theme_name not in self._style_cache:
+            self._style_cache[theme_name] = self._scope(
+                self.build_style(self.THEMES[theme_name]), self.theme_key(theme_name))
+        return self._style_cache[theme_name]
+
+    def combined_style(self):
+        if self._combined_style is None:
+            self._combined_style = "\n".join(self.theme_style(name) for name in self.THEMES)
+        return self._combined_style
+
+    def install(self, app):
+        """Instala la hoja combinada a nivel de aplicación (un único análisis)"""
+        app.setStyleSheet(self.combined_style())
+
+    def apply(self, window, theme_name):
+        """Activa un tema en la ventana cambiando solo la propiedad dinámica"""
+        window.setProperty("theme", self.theme_key(theme_name))
+        style = window.style()
+        for widget in [window] + window.findChildren(QWidget):
+            style.unpolish(widget)
+            style.polish(widget)
+        window.update()
+
+    @staticmethod
+    def _scope(sheet, key):
+        """Antepone el selector del tema a cada regla de la hoja"""
+        scope = f'QMainWindow[theme="{key}"]'
+        sheet = re.sub(r"/\*.*?\*/", "", sheet, flags=re.S)
+        rules = []
+        for block in sheet.split("}"):
+            if "{" not in block:
+                continue
+            selectors, body = block.split("{", 1)
+            scoped = []
+            for selector in selectors.split(","):
+                selector = selector.strip()
+                if not selector:
+                    continue
+                if selector.startswith("QMainWindow"):
+                    scoped.append(scope + selector[len("QMainWindow"):])
+                else:
+                    scoped.append(f"{scope} {selector}")
+            rules.append(", ".join(scoped) + " {" + body + "}")
+        return "\n".join(rules)
+
+    @staticmethod
+    def build_style(colors):
+        """Hoja de estilos de un tema a partir de su paleta"""
+        return f"""
+            /* Estilo general de la ventana */
+            QMainWindow {{
+                background-color: {colors['bg']};
+                color: {colors['text']};
+                font-family: 'Segoe UI', 'Roboto', sans-serif;
+            }}
+            QWidget {{
+                color: {colors['text']};
                 font-size: 10pt;
-                color: #E0E0FF;
-                background-color: transparent;
-                border: 2px solid transparent;
-                border-radius: 8px;
-                padding: 8px;
-            }
-            QToolBar QToolButton:hover {
-                background-color: rgba(74, 58, 255, 0.2);
-                border-color: #4A3AFF;
-            }
-            QToolBar QToolButton:pressed {
-                background-color: rgba(74, 58, 255, 0.3);
-            }
-            QStatusBar {
-                background-color: #1A1A25;
-                color: #B0B0D0;
-                font-size: 9pt;
-                font-weight: 500;
-                border-top: 1px solid #2A2A3A;
-            }
-            QMenuBar {
-                background-color: #1A1A25;
-                color: #E0E0FF;
-                border-bottom: 2px solid #2A2A3A;
-                font-weight: 600;
-            }
-            QMenuBar::item {
-                background-color: transparent;
-                padding: 8px 15px;
-            }
-            QMenuBar::item:selected {
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:0, 
-                    stop:0 #4A3AFF, stop:1 #3AFFED);
-                color: white;
-            }
-            QMenu {
-                background-color: #2A2A3A;
-                color: #E0E0FF;
-                border: 1px solid #3A3A4A;
-                border-radius: 8px;
-                padding: 8px;
-            }
-            QMenu::item {
-                padding: 10px 30px 10px 25px;
+            }}
+
+            /* Header */
+            QFrame#Header {{
+                background: {colors['bg']};
+                border-bottom: 2px solid {colors['border']};
+            }}
+            QLabel#LogoLabel {{
+                color: {colors['accent']};
+                font-size: 18px;
+                padding: 2px;
+            }}
+            QLabel#TitleLabel {{
+                color: {colors['text']};
+                font-size: 14px;
+                font-weight: bold;
+            }}
+            QPushButton#MenuButton {{
+                background: transparent;
+                border: none;
+                color: {colors['text']};
+                font-size: 13px;
+                padding: 5px 15px;
                 border-radius: 4px;
-                margin: 3px;
-            }
-            QMenu::item:selected {
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:0, 
-                    stop:0 #4A3AFF, stop:1 #3AFFED);
+            }}
+            QPushButton#MenuButton:hover {{
+                background: {colors['hover']};
+            }}
+            QPushButton#MenuButton:pressed {{
+                background: {colors['pressed']};
+            }}
+            QPushButton#ThemeButton {{
+                background: transparent;
+                border: 1px solid {colors['border']};
+                border-radius: 15px;
+                color: {colors['text']};
+                font-size: 16px;
+                padding: 2px;
+            }}
+            QPushButton#ThemeButton:hover {{
+                background: {colors['hover']};
+                border-color: {colors['accent']};
+            }}
+            QPushButton#MinimizeButton, 
+            QPushButton#MaximizeButton, 
+            QPushButton#CloseButton {{
+                background: transparent;
+                border: none;
+                border-radius: 15px;
+                color: {colors['text']};
+                font-size: 14px;
+                padding: 2px;
+            }}
+            QPushButton#MinimizeButton:hover, 
+            QPushButton#MaximizeButton:hover {{
+                background: {colors['hover']};
+            }}
+            QPushButton#CloseButton:hover {{
+                background: #FF4444;
                 color: white;
-            }
-            QMenu::separator {
-                height: 1px;
-                background: #3A3A4A;
-                margin: 6px 12px;
-            }
-            QScrollBar:vertical {
-                background-color: #1A1A25;
-                width: 12px;
-                margin: 0px;
-                border-radius: 6px;
-            }
-            QScrollBar::handle:vertical {
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:0, 
-                    stop:0 #4A3AFF, stop:1 #3AFFED);
-                min-height: 25px;
-                border-radius: 6px;
-            }
-            QScrollBar::handle:vertical:hover {
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:0, 
-                    stop:0 #5A4AFF, stop:1 #4AFFFD);
-            }
-            QScrollBar:horizontal {
-                background-color: #1A1A25;
-                height: 12px;
-                margin: 0px;
-                border-radius: 6px;
-            }
-            QScrollBar::handle:horizontal {
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:0, 
-                    stop:0 #4A3AFF, stop:1 #3AFFED);
-                min-width: 25px;
+            }}
+
+            /* Barra de herramientas */
+            QToolBar {{
+                background-color: {colors['bg']};
+                border: none;
+                padding: 5px;
+                border-bottom: 1px solid {colors['border']};
+            }}
+            QPushButton#ToolbarButton {{
+                background-color: {colors['secondary']};
+                border: 1px solid {colors['border']};
                 border-radius: 6px;
-            }
-            QScrollBar::handle:horizontal:hover {
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:0, 
-                    stop:0 #5A4AFF, stop:1 #4AFFFD);
-            }
-            QMessageBox {
-                background-color: #2A2A3A;
-                color: #E0E0FF;
-            }
-            QMessageBox QLabel {
-                color: #E0E0FF;
-            }
-            QFileDialog {
-                background-color: #2A2A3A;
-                color: #E0E0FF;
-            }
-            QFrame#InfoPanel {
-                background-color: #1E1E2A;
-                border-radius: 10px;
-                border: 2px solid #2A2A3A;
-            }
-            QLabel#InfoLabel {
-                color: #B0B0D0;
-                font-size: 10pt;
-                font-weight: 600;
-            }
-        """
+                padding: 10px 20px;
+                color: {colors['text']};
+                font-size: 13px;
+                font-weight: 500;
+            }}
+            QPushButton#ToolbarButton:hover {{
+                background-color: {colors['hover']};
+                border-color: {colors['accent']};
+            }}
+            QPushButton#ToolbarButton:pressed {{
+                background-color: {colors['pressed']};
+            }}
+            QPushButton#ToolbarButton:disabled {{
+                background-color: {colors['secondary']};
+                border-color: {colors['border']};
+                color: {colors['disabled']};
+            }}
 
-    def _get_app_style_light(self):
-        return """
-            QMainWindow {
-                background-color: #F8F9FC;
-                color: #2C3E50;
-                font-family: 'Segoe UI', 'Roboto', sans-serif;
-            }
-            QWidget {
-                color: #2C3E50;
-                font-size: 10pt;
-            }
-            QLabel#VideoLabel {
-                background-color: white;
-                border: 2px solid #E8EAF6;
+            /* Área de video */
+            #VideoLabel {{
+                background-color: {colors['secondary']};
+                border: 2px solid {colors['border']};
                 border-radius: 15px;
-                color: #2C3E50;
+                color: {colors['text']};
                 padding: 8px;
-            }
-            QPushButton {
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:0, 
-                    stop:0 #6366F1, stop:1 #60A5FA);
-                color: white;
-                border: none;
-                padding: 12px 24px;
-                font-size: 11pt;
-                border-radius: 8px;
+            }}
+
+            /* Controles de video */
+            QFrame#VideoControls {{
+                background-color: {colors['bg']};
+                border: 2px solid {colors['border']};
+                border-radius: 15px;
+            }}
+            QLabel#TimeLabel {{
+                color: {colors['text']};
                 font-weight: bold;
-                min-height: 30px;
-            }
-            QPushButton:hover {
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:0, 
-                    stop:0 #818CF8, stop:1 #7DD3FC);
-            }
-            QPushButton:pressed {
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:0, 
-                    stop:0 #4F46E5, stop:1 #3B82F6);
-            }
-            QPushButton:disabled {
-                background: #E2E8F0;
-                color: #94A3B8;
-            }
-            QComboBox {
-                background-color: white;
-                color: #2C3E50;
-                border: 2px solid #E2E8F0;
+                min-width: 60px;
+            }}
+            QPushButton#VideoControlButton {{
+                background: {colors['secondary']};
+                border: 2px solid {colors['border']};
+                border-radius: 20px;
                 padding: 10px;
-                border-radius: 8px;
-                min-height: 28px;
-                font-weight: 600;
-            }
-            QComboBox:hover {
-                border-color: #6366F1;
-            }
-            QComboBox::drop-down {
-                border: none;
-                width: 30px;
-            }
-            QComboBox QAbstractItemView {
-                background-color: white;
-                color: #2C3E50;
-                selection-background-color: #6366F1;
-                selection-color: white;
-                border: 1px solid #E2E8F0;
-                padding: 5px;
-            }
-            QToolBar {
-                background-color: #F1F5F9;
-                border: none;
-                border-bottom: 2px solid #6366F1;
-                padding: 8px;
-                spacing: 10px;
-            }
-            QToolBar QToolButton {
+                min-width: 40px;
+                min-height: 40px;
+                color: {colors['text']};
+            }}
+            QPushButton#VideoControlButton:hover {{
+                background: {colors['hover']};
+                border-color: {colors['accent']};
+            }}
+            QPushButton#VideoControlButton:pressed {{
+                background: {colors['pressed']};
+            }}
+            QPushButton#SpeedButton {{
+                background: {colors['secondary']};
+                border: 2px solid {colors['border']};
+                border-radius: 15px;
+                padding: 5px 15px;
+                color: {colors['text']};
                 font-weight: bold;
-                font-size: 10pt;
-                color: #2C3E50;
-                background-color: transparent;
-                border: 2px solid transparent;
+            }}
+            QPushButton#SpeedButton:hover {{
+                background: {colors['hover']};
+                border-color: {colors['accent']};
+            }}
+            QSlider#ProgressSlider {{
+                height: 30px;
+            }}
+            QSlider#ProgressSlider::groove:horizontal {{
+                border: none;
+                height: 6px;
+                background: {colors['border']};
+                margin: 0px;
+                border-radius: 3px;
+            }}
+            QSlider#ProgressSlider::handle:horizontal {{
+                background: {colors['accent']};
+                border: 2px solid {colors['text']};
+                width: 16px;
+                margin: -5px 0;
                 border-radius: 8px;
-                padding: 8px;
-            }
-            QToolBar QToolButton:hover {
-                background-color: rgba(99, 102, 241, 0.1);
-                border-color: #6366F1;
-            }
-            QToolBar QToolButton:pressed {
-                background-color: rgba(99, 102, 241, 0.2);
-            }
-            QStatusBar {
-                background-color: #F1F5F9;
-                color: #64748B;
+            }}
+            QSlider#ProgressSlider::sub-page:horizontal {{
+                background: {colors['accent']};
+                border-radius: 3px;
+            }}
+
+            /* Panel de información */
+            QFrame#InfoPanel {{
+                background-color: {colors['secondary']};
+                border-radius: 8px;
+                border: 1px solid {colors['border']};
+            }}
+            QLabel#InfoLabel {{
+                color: {colors['text_secondary']};
+                font-size: 10pt;
+                font-weight: 600;
+            }}
+
+            /* Barra de estado */
+            QStatusBar {{
+                background-color: {colors['bg']};
+                color: {colors['text_secondary']};
                 font-size: 9pt;
                 font-weight: 500;
-                border-top: 1px solid #E2E8F0;
-            }
-            QMenuBar {
-                background-color: #F1F5F9;
-                color: #2C3E50;
-                border-bottom: 2px solid #E2E8F0;
-                font-weight: 600;
-            }
-            QMenuBar::item {
-                background-color: transparent;
-                padding: 8px 15px;
-            }
-            QMenuBar::item:selected {
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:0, 
-                    stop:0 #6366F1, stop:1 #60A5FA);
-                color: white;
-            }
-            QMenu {
-                background-color: white;
-                color: #2C3E50;
-                border: 1px solid #E2E8F0;
+                border-top: 1px solid {colors['border']};
+            }}
+
+            /* Menús */
+            QMenu {{
+                background-color: {colors['bg']};
+                border: 1px solid {colors['border']};
                 border-radius: 8px;
                 padding: 8px;
-            }
-            QMenu::item {
-                padding: 10px 30px 10px 25px;
+            }}
+            QMenu::item {{
+                color: {colors['text']};
+                padding: 8px 20px;
                 border-radius: 4px;
-                margin: 3px;
-            }
-            QMenu::item:selected {
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:0, 
-                    stop:0 #6366F1, stop:1 #60A5FA);
-                color: white;
-            }
-            QMenu::separator {
+                margin: 4px;
+            }}
+            QMenu::item:selected {{
+                background: {colors['hover']};
+                color: {colors['text']};
+            }}
+            QMenu::separator {{
                 height: 1px;
-                background: #E2E8F0;
+                background: {colors['border']};
                 margin: 6px 12px;
-            }
-            QScrollBar:vertical {
-                background-color: #F1F5F9;
-                width: 12px;
-                margin: 0px;
-                border-radius: 6px;
-            }
-            QScrollBar::handle:vertical {
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:0, 
-                    stop:0 #6366F1, stop:1 #60A5FA);
-                min-height: 25px;
+            }}
+            /* Controles comunes */
+            QComboBox, QSpinBox {{
+                background-color: {colors['secondary']};
+                color: {colors['text']};
+                border: 2px solid {colors['border']};
+                padding: 6px;
+                border-radius: 8px;
+            }}
+            QComboBox:hover, QSpinBox:hover {{
+                border-color: {colors['accent']};
+            }}
+            QComboBox QAbstractItemView {{
+                background-color: {colors['secondary']};
+                color: {colors['text']};
+                selection-background-color: {colors['accent']};
+                border: 1px solid {colors['border']};
+            }}
+            QScrollBar:vertical, QScrollBar:horizontal {{
+                background-color: {colors['bg']};
                 border-radius: 6px;
-            }
-            QScrollBar::handle:vertical:hover {
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:0, 
-                    stop:0 #818CF8, stop:1 #7DD3FC);
-            }
-            QScrollBar:horizontal {
-                background-color: #F1F5F9;
-                height: 12px;
-                margin: 0px;
+            }}
+            QScrollBar::handle:vertical, QScrollBar::handle:horizontal {{
+                background: {colors['accent']};
                 border-radius: 6px;
-            }
-            QScrollBar::handle:horizontal {
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:0, 
-                    stop:0 #6366F1, stop:1 #60A5FA);
+                min-height: 25px;
                 min-width: 25px;
-                border-radius: 6px;
-            }
-            QScrollBar::handle:horizontal:hover {
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:0, 
-                    stop:0 #818CF8, stop:1 #7DD3FC);
-            }
-            QMessageBox {
-                background-color: white;
-                color: #2C3E50;
-            }
-            QMessageBox QLabel {
-                color: #2C3E50;
-            }
-            QFileDialog {
-                background-color: white;
-                color: #2C3E50;
-            }
-            QFrame#InfoPanel {
-                background-color: white;
-                border-radius: 10px;
-                border: 2px solid #E8EAF6;
-            }
-            QLabel#InfoLabel {
-                color: #64748B;
-                font-size: 10pt;
-                font-weight: 600;
-            }
+            }}
+            QDialog, QMessageBox, QFileDialog {{
+                background-color: {colors['bg']};
+                color: {colors['text']};
+            }}
+            QListWidget#GalleryStrip {{
+                background-color: {colors['secondary']};
+                border: 1px solid {colors['border']};
+                border-radius: 8px;
+            }}
+            QListWidget#GalleryStrip::item:selected {{
+                background: {colors['hover']};
+                border: 2px solid {colors['accent']};
+            }}
         """
 
+
+# --- Ventana Principal ---
+VIEW_CONFIG_PATH = os.path.join(CONFIG_DIR, "vista.json")
+DEFAULT_VIEW_CONFIG = {
+    "detect_when_hidden": True,  # False: la fuente se pausa mientras la ventana no se ve
+}
+
+
+class MainWindow(QMainWindow):
+    # Tamaño de las miniaturas y límites de memoria del modo galería
+    GALLERY_THUMB_SIZE = 120
+    GALLERY_MAX_ICONS = 300
+    GALLERY_LOOKAHEAD = 3
+    # Tamaño de entrada por defecto del modelo YOLOv8
+    MODEL_INPUT_SIZE = 640
+    # Latencia máxima deseada al cambiar de fuente (petición → primer frame)
+    SWITCH_LATENCY_TARGET_MS = 200
+    POSITION_UPDATE_INTERVAL_MS = 100
+
+    def __init__(self, profile_name=None):
+        super().__init__()
+        self.setWindowTitle("YOLO Vision Pro - Tomson")
+        self.setGeometry(50, 50, 1280, 850)
+
+        # Quitar barra de título estándar pero mantener el título en la barra de tareas
+        self.setWindowFlags(Qt.WindowType.FramelessWindowHint | Qt.WindowType.WindowSystemMenuHint | Qt.WindowType.WindowMinMaxButtonsHint)
+        
+        self.dark_mode = True
+        self.theme_manager = ThemeManager()
+
+        self.yolo_model = None
+        self.model_path = 'yolov8n.pt'
+        # Modelo FP32 original, para poder volver a él tras usar una variante INT8
+        self.base_model_path = self.model_path
+        self.quantization_thread = None
+        self.thread_config = load_thread_config()
+        self.image_batch_size = 4
+        self.model_input_size = self.MODEL_INPUT_SIZE
+        # Perfil de rendimiento: modelo, hilos (antes de cargar el modelo) y parámetros del motor
+        self.active_profile, self.profiles = load_profiles()
+        self._apply_profile(profile_name or self.active_profile, startup=True)
+        self.tuning_thread = None
+        self.motion_config = load_json_config(MOTION_CONFIG_PATH, DEFAULT_MOTION_CONFIG)
+        self.governor_config = load_json_config(GOVERNOR_CONFIG_PATH, DEFAULT_GOVERNOR_CONFIG)
+        # Tras cambiar al modelo de reserva del regulador se vuelve a abrir la cámara
+        self._resume_webcam_after_load = False
+        # Motor de medios persistente; media_thread apunta a él solo mientras
+        # hay una fuente activa (cámara o video)
+        self.media_engine = None
+        self.media_thread = None
+        self._media_session = 0
+        self.export_thread = None
+        self.detection_recorder = None
+        self.event_recorder = None
+        self.event_config = load_json_config(EVENT_CONFIG_PATH, DEFAULT_EVENT_CONFIG)
+        self.detection_statistics = DetectionStatistics()
+        self.statistics_window = None
+        # Índice SQLite de detecciones: siempre activo, escribe por lotes en su hilo
+        self.detection_index = DetectionIndex()
+        self.detection_index.status_update.connect(self._update_status)
+        self.detection_index.start()
+        self.search_dialog = None
+        # Servidor local que comparte el modelo con otras aplicaciones
+        self.detection_server = None
+        self.shm_ingest = None
+        self.server_config = load_json_config(SERVER_CONFIG_PATH, DEFAULT_SERVER_CONFIG)
+        self.timeline_density = TimelineDensity()
+        self._prefill_threads = set()
+        self.image_thread = None
+        self._retired_threads = []
+        self.gallery_paths = []
+        self.gallery_thumbnail_thread = None
+        self.gallery_prefetch_thread = None
+        self._gallery_loaded_icons = OrderedDict()
+        # Coalescencia de actualizaciones de la interfaz durante la reproducción
+        self._pending_frame = None
+        self._pending_frame_position = None
+        self._last_present_time = 0.0
+        # Con la ventana minimizada u oculta no se hace ningún trabajo de presentación
+        self.view_config = load_json_config(VIEW_CONFIG_PATH, DEFAULT_VIEW_CONFIG)
+        self._view_visible = True
+        self._paused_while_hidden = False
+        self._watched_window = None
+        self._info_label_style_key = None
+        self._video_label_font_mode = None
+        self.current_media_path = None
+        self.current_source_type = None
+        # Imagen cuya versión a resolución completa se muestra o se está decodificando
+        self._full_resolution_path = None
+        self._full_resolution_thread = None
+        self._is_dragging = False
+        self._drag_position = None
+
+        # Referencias a los botones principales
+        self.archivo_btn = None
+        self.camara_btn = None
+        self.play_pause_btn = None
+        self.stop_btn = None
+
+        self._init_ui()
+        self.theme_manager.install(QApplication.instance())
+        self._apply_theme(ThemeManager.DEFAULT_THEME)
+        self._load_yolo_model_async()
+
     def _init_ui(self):
         self._create_central_widget()
         self._create_status_bar()
@@ -744,73 +4848,6 @@ class MainWindow(QMainWindow):
         header_layout.addStretch()
         header_layout.addWidget(controls_container)
 
-        # Estilo del header actualizado
-        self.header.setStyleSheet("""
-            QFrame#Header {
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:0, 
-                    stop:0 #1a1a2e, stop:1 #2d2d44);
-                border-bottom: 2px solid rgba(74, 58, 255, 0.3);
-            }
-            QLabel#LogoLabel {
-                color: #4A3AFF;
-                font-size: 18px;
-                padding: 2px;
-            }
-            QLabel#TitleLabel {
-                color: #E0E0FF;
-                font-size: 14px;
-                font-weight: bold;
-                font-family: 'Segoe UI';
-            }
-            QPushButton#MenuButton {
-                background: transparent;
-                border: none;
-                color: #E0E0FF;
-                font-family: 'Segoe UI';
-                font-size: 13px;
-                padding: 5px 15px;
-                border-radius: 4px;
-                text-align: left;
-            }
-            QPushButton#MenuButton:hover {
-                background: rgba(74, 58, 255, 0.2);
-            }
-            QPushButton#MenuButton:pressed {
-                background: rgba(74, 58, 255, 0.3);
-            }
-            QPushButton#ThemeButton {
-                background: transparent;
-                border: 1px solid rgba(74, 58, 255, 0.3);
-                border-radius: 15px;
-                color: #E0E0FF;
-                font-size: 16px;
-                padding: 2px;
-            }
-            QPushButton#ThemeButton:hover {
-                background: rgba(74, 58, 255, 0.2);
-                border-color: rgba(74, 58, 255, 0.5);
-            }
-            QPushButton#ThemeButton:pressed {
-                background: rgba(74, 58, 255, 0.3);
-            }
-            QPushButton#MinimizeButton, QPushButton#MaximizeButton, QPushButton#CloseButton {
-                background: transparent;
-                border: none;
-                border-radius: 15px;
-                color: #E0E0FF;
-                font-family: 'Segoe UI';
-                font-size: 14px;
-                padding: 2px;
-            }
-            QPushButton#MinimizeButton:hover, QPushButton#MaximizeButton:hover {
-                background: rgba(74, 58, 255, 0.2);
-            }
-            QPushButton#CloseButton:hover {
-                background: #FF4444;
-                color: white;
-            }
-        """)
-
         main_layout.addWidget(self.header)
 
         # Crear y agregar la barra de herramientas después del header
@@ -831,9 +4868,10 @@ class MainWindow(QMainWindow):
         video_layout.setContentsMargins(0, 0, 0, 0)
 
         welcome_message = "YOLO Vision Pro - Tomson"
-        self.video_label = QLabel(welcome_message)
+        self.video_label = VideoCanvas(welcome_message)
         self.video_label.setObjectName("VideoLabel")
-        self.video_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.video_label.frame_released.connect(self._release_display_buffer)
+        self.video_label.view_scale_changed.connect(self._on_view_scale_changed)
         self.video_label.setMinimumSize(640, 480)
         self.video_label.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
 
@@ -870,8 +4908,17 @@ class MainWindow(QMainWindow):
         self.time_label_total = QLabel("00:00")
         self.time_label_total.setObjectName("TimeLabel")
 
+        # Franja de densidad de detecciones alineada con la barra de progreso
+        self.density_strip = DensityStrip(self.timeline_density)
+        self.density_strip.seek_requested.connect(self._on_density_seek)
+        timeline_layout = QVBoxLayout()
+        timeline_layout.setContentsMargins(0, 0, 0, 0)
+        timeline_layout.setSpacing(2)
+        timeline_layout.addWidget(self.density_strip)
+        timeline_layout.addWidget(self.progress_slider)
+
         progress_layout.addWidget(self.time_label_current)
-        progress_layout.addWidget(self.progress_slider, 1)
+        progress_layout.addLayout(timeline_layout, 1)
         progress_layout.addWidget(self.time_label_total)
 
         # Botones de control
@@ -925,82 +4972,39 @@ class MainWindow(QMainWindow):
         video_controls_layout.addWidget(progress_container)
         video_controls_layout.addWidget(controls_container)
 
-        # Estilo para los controles de video
-        self.video_controls.setStyleSheet("""
-            QFrame#VideoControls {
-                background-color: rgba(23, 23, 33, 0.95);
-                border: 2px solid rgba(74, 58, 255, 0.2);
-                border-radius: 15px;
-                margin: 0px 15px;
-            }
-            QFrame#ProgressContainer, QFrame#ControlsContainer {
-                background: transparent;
-                border: none;
-            }
-            QLabel#TimeLabel {
-                color: #E0E0FF;
-                font-family: 'Segoe UI';
-                font-size: 10pt;
-                font-weight: bold;
-                min-width: 60px;
-            }
-            QPushButton#VideoControlButton {
-                background: rgba(74, 58, 255, 0.1);
-                border: 2px solid rgba(74, 58, 255, 0.2);
-                border-radius: 20px;
-                padding: 10px;
-                min-width: 40px;
-                min-height: 40px;
-            }
-            QPushButton#VideoControlButton:hover {
-                background: rgba(74, 58, 255, 0.2);
-                border-color: rgba(74, 58, 255, 0.4);
-            }
-            QPushButton#VideoControlButton:pressed {
-                background: rgba(74, 58, 255, 0.3);
-                border-color: rgba(74, 58, 255, 0.6);
-            }
-            QPushButton#SpeedButton {
-                background: rgba(74, 58, 255, 0.1);
-                border: 2px solid rgba(74, 58, 255, 0.2);
-                border-radius: 15px;
-                padding: 5px 15px;
-                color: #E0E0FF;
-                font-weight: bold;
-            }
-            QPushButton#SpeedButton:hover {
-                background: rgba(74, 58, 255, 0.2);
-                border-color: rgba(74, 58, 255, 0.4);
-            }
-            QSlider#ProgressSlider {
-                height: 30px;
-            }
-            QSlider#ProgressSlider::groove:horizontal {
-                border: none;
-                height: 6px;
-                background: rgba(74, 58, 255, 0.1);
-                margin: 0px;
-                border-radius: 3px;
-            }
-            QSlider#ProgressSlider::handle:horizontal {
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:0, 
-                    stop:0 #4A3AFF, stop:1 #3AFFED);
-                border: 2px solid #E0E0FF;
-                width: 16px;
-                margin: -5px 0;
-                border-radius: 8px;
-            }
-            QSlider#ProgressSlider::sub-page:horizontal {
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:0, 
-                    stop:0 #4A3AFF, stop:1 #3AFFED);
-                border-radius: 3px;
-            }
-        """)
-
         video_container.setLayout(video_layout)
         content_layout.addWidget(video_container, 1)
         content_layout.addWidget(self.video_controls)
 
+        # Tira de miniaturas del modo galería
+        self.gallery_list = QListWidget()
+        self.gallery_list.setObjectName("GalleryStrip")
+        self.gallery_list.setViewMode(QListWidget.ViewMode.IconMode)
+        self.gallery_list.setFlow(QListWidget.Flow.LeftToRight)
+        self.gallery_list.setWrapping(False)
+        self.gallery_list.setUniformItemSizes(True)
+        self.gallery_list.setIconSize(QSize(self.GALLERY_THUMB_SIZE, self.GALLERY_THUMB_SIZE * 3 // 4))
+        self.gallery_list.setFixedHeight(self.GALLERY_THUMB_SIZE + 30)
+        self.gallery_list.currentRowChanged.connect(self._on_gallery_row_changed)
+        self.gallery_list.horizontalScrollBar().valueChanged.connect(self._schedule_visible_thumbnails)
+        self.gallery_list.setVisible(False)
+        content_layout.addWidget(self.gallery_list)
+
+        self._gallery_thumb_timer = QTimer(self)
+        self._gallery_thumb_timer.setSingleShot(True)
+        self._gallery_thumb_timer.setInterval(50)
+        self._gallery_thumb_timer.timeout.connect(self._request_visible_thumbnails)
+
+        # Presentación de frames al ritmo de refresco de la pantalla y
+        # controles de posición a ~10 Hz (solo se muestra el último valor)
+        self._present_timer = QTimer(self)
+        self._present_timer.setSingleShot(True)
+        self._present_timer.timeout.connect(self._present_pending_frame)
+        self._position_timer = QTimer(self)
+        self._position_timer.setSingleShot(True)
+        self._position_timer.setInterval(self.POSITION_UPDATE_INTERVAL_MS)
+        self._position_timer.timeout.connect(self._flush_frame_position)
+
         # Info panel
         info_panel = QFrame()
         info_panel.setObjectName("InfoPanel")
@@ -1055,6 +5059,13 @@ class MainWindow(QMainWindow):
         btn_video.setObjectName("ToolbarButton")
         btn_video.clicked.connect(self._select_video_file)
         archivo_layout.addWidget(btn_video)
+
+        # Botón Abrir Carpeta (modo galería)
+        btn_carpeta = QPushButton("Abrir Carpeta")
+        btn_carpeta.setIcon(QIcon.fromTheme("folder-open"))
+        btn_carpeta.setObjectName("ToolbarButton")
+        btn_carpeta.clicked.connect(self._open_image_folder)
+        archivo_layout.addWidget(btn_carpeta)
         
         # Grupo Cámara
         camara_group = QFrame()
@@ -1092,6 +5103,21 @@ class MainWindow(QMainWindow):
         self.btn_detener.clicked.connect(self._stop_current_media)
         self.btn_detener.setEnabled(False)
         control_layout.addWidget(self.btn_detener)
+
+        # Botón Cancelar (lotes de imágenes)
+        self.btn_cancelar = QPushButton("Cancelar")
+        self.btn_cancelar.setIcon(QIcon.fromTheme("process-stop"))
+        self.btn_cancelar.setObjectName("ToolbarButton")
+        self.btn_cancelar.clicked.connect(self._cancel_image_batch)
+        self.btn_cancelar.setEnabled(False)
+        control_layout.addWidget(self.btn_cancelar)
+
+        # Botón Estadísticas (panel en vivo por clase)
+        btn_estadisticas = QPushButton("Estadísticas")
+        btn_estadisticas.setIcon(QIcon.fromTheme("x-office-spreadsheet"))
+        btn_estadisticas.setObjectName("ToolbarButton")
+        btn_estadisticas.clicked.connect(self._show_statistics)
+        control_layout.addWidget(btn_estadisticas)
         
         # Agregar grupos al layout de la toolbar
         toolbar_layout.addWidget(archivo_group)
@@ -1104,93 +5130,28 @@ class MainWindow(QMainWindow):
         toolbar_widget.setLayout(toolbar_layout)
         toolbar.addWidget(toolbar_widget)
 
-        # Definir estilos para ambos temas
-        style_dark = """
-            QToolBar {
-                background-color: #1a1a2e;
-                border: none;
-                padding: 5px;
-                border-bottom: 1px solid #3A3A4C;
-            }
-            QFrame#ToolbarGroup {
-                background: transparent;
-            }
-            QPushButton#ToolbarButton {
-                background-color: #28283A;
-                border: 1px solid #3A3A4C;
-                border-radius: 6px;
-                padding: 10px 20px;
-                color: #E0E0FF;
-                font-size: 13px;
-                font-weight: 500;
-            }
-            QPushButton#ToolbarButton:hover {
-                background-color: #323248;
-                border-color: #4A3AFF;
-            }
-            QPushButton#ToolbarButton:pressed {
-                background-color: #3A3A58;
-            }
-            QPushButton#ToolbarButton:disabled {
-                background-color: #28283A;
-                border-color: #3A3A4C;
-                color: #666680;
-            }
-        """
-        
-        style_light = """
-            QToolBar {
-                background-color: #f8f9fa;
-                border: none;
-                padding: 5px;
-                border-bottom: 1px solid #dee2e6;
-            }
-            QFrame#ToolbarGroup {
-                background: transparent;
-            }
-            QPushButton#ToolbarButton {
-                background-color: #ffffff;
-                border: 1px solid #dee2e6;
-                border-radius: 6px;
-                padding: 10px 20px;
-                color: #495057;
-                font-size: 13px;
-                font-weight: 500;
-            }
-            QPushButton#ToolbarButton:hover {
-                background-color: #e9ecef;
-                border-color: #ced4da;
-            }
-            QPushButton#ToolbarButton:pressed {
-                background-color: #dee2e6;
-            }
-            QPushButton#ToolbarButton:disabled {
-                background-color: #e9ecef;
-                border-color: #dee2e6;
-                color: #adb5bd;
-            }
-        """
-        
-        # Guardar los estilos como atributos de la clase
-        self.toolbar_style_dark = style_dark
-        self.toolbar_style_light = style_light
-        
-        # Aplicar el estilo inicial según el modo
-        toolbar.setStyleSheet(style_dark if self.dark_mode else style_light)
-        
         self.toolbar = toolbar
         return toolbar
 
     def _load_yolo_model_async(self):
-        self.status_bar.showMessage("Cargando modelo YOLOv8n, por favor espera...")
+        self.status_bar.showMessage(f"Cargando modelo {os.path.basename(self.model_path)}, por favor espera...")
         QTimer.singleShot(100, self._perform_model_load)
 
     def _perform_model_load(self):
         try:
-            self.yolo_model = YOLO('yolov8n.pt')
-            self.status_bar.showMessage("Modelo YOLOv8n cargado. Sistema listo.", 5000)
+            self.yolo_model = YOLO(self.model_path)
+            self._ensure_media_engine()
+            if self.detection_server is not None:
+                self.detection_server.yolo_model = self.yolo_model
+            if self.shm_ingest is not None:
+                self.shm_ingest.yolo_model = self.yolo_model
+            if self._resume_webcam_after_load:
+                self._resume_webcam_after_load = False
+                self._start_webcam_mode()
+            model_name = os.path.basename(self.model_path)
+            self.status_bar.showMessage(f"Modelo {model_name} cargado. Sistema listo.", 5000)
             self._update_button_states()
-            print("Modelo YOLOv8n cargado.")
+            print(f"Modelo {model_name} cargado.")
         except Exception as e:
             self.status_bar.showMessage(f"Error crítico al cargar modelo YOLO: {e}")
             QMessageBox.critical(self, "Error de Modelo", f"No se pudo cargar el modelo YOLOv8n:\n{e}")
@@ -1203,6 +5164,21 @@ class MainWindow(QMainWindow):
         self.status_bar = QStatusBar()
         self.setStatusBar(self.status_bar)
         self.status_bar.showMessage("Listo.")
+        # Proporción de frames inferidos con la compuerta de movimiento activa
+        self.motion_label = QLabel("")
+        self.motion_label.setVisible(False)
+        self.status_bar.addPermanentWidget(self.motion_label)
+        # FPS logrados y CPU estimada con el regulador de FPS activo
+        self.governor_label = QLabel("")
+        self.governor_label.setVisible(False)
+        self.status_bar.addPermanentWidget(self.governor_label)
+        # Peticiones atendidas y latencia del servidor de detección
+        self.server_label = QLabel("")
+        self.server_label.setVisible(False)
+        self.status_bar.addPermanentWidget(self.server_label)
+        self.ingest_label = QLabel("")
+        self.ingest_label.setVisible(False)
+        self.status_bar.addPermanentWidget(self.ingest_label)
 
     def _update_button_states(self):
         """Actualiza el estado de todos los botones según el estado actual"""
@@ -1229,6 +5205,9 @@ class MainWindow(QMainWindow):
         if hasattr(self, 'btn_detener'):
             self.btn_detener.setEnabled(media_active)
 
+        if hasattr(self, 'btn_cancelar'):
+            self.btn_cancelar.setEnabled(self.image_thread is not None and self.image_thread.isRunning())
+
         # Actualizar estado de los controles de video
         if is_video and media_active:
             # Habilitar todos los controles de video
@@ -1270,23 +5249,25 @@ class MainWindow(QMainWindow):
                 if hasattr(self, 'progress_slider'):
                     self.progress_slider.setEnabled(False)
 
-    def _update_display_pixmap(self, pixmap):
-        if self.video_label:
-            self.video_label.setFont(QFont("Segoe UI", 10)) # Fuente normal para el video
+    @staticmethod
+    def _set_label_text(label, text):
+        """Cambia el texto de una etiqueta solo si es distinto del actual"""
+        if label.text() != text:
+            label.setText(text)
 
-            available_width = self.video_label.width() - 10 # Menos padding
-            available_height = self.video_label.height() - 10
+    def _update_display_frame(self, frame_bgra, detections=None):
+        """Entrega el frame y sus detecciones al lienzo; el dibujo ocurre al pintar"""
+        if self.video_label:
+            if self._video_label_font_mode != "video":
+                self.video_label.setFont(QFont("Segoe UI", 10)) # Fuente normal para el video
+                self._video_label_font_mode = "video"
 
-            scaled_pixmap = pixmap.scaled(
-                available_width,
-                available_height,
-                Qt.AspectRatioMode.KeepAspectRatio,
-                Qt.TransformationMode.SmoothTransformation
-            )
-            self.video_label.setPixmap(scaled_pixmap)
+            self.video_label.set_frame(frame_bgra, detections)
+            self._full_resolution_path = None
+            displayed = self.video_label.displayed_size()
 
             if hasattr(self, 'info_label') and self.info_label:
-                img_size = f"{scaled_pixmap.width()}x{scaled_pixmap.height()}"
+                img_size = f"{displayed.width()}x{displayed.height()}"
                 source_name = ""
                 if self.current_source_type == "webcam":
                     source_name = "Cámara web activa"
@@ -1295,7 +5276,7 @@ class MainWindow(QMainWindow):
                 elif self.current_source_type == "image":
                     source_name = self.current_media_path.split('/')[-1] if self.current_media_path else "Imagen"
                 
-                self.info_label.setText(f"{source_name} | {img_size}")
+                self._set_label_text(self.info_label, f"{source_name} | {img_size}")
                 # Restaurar estilo normal del info_label (se colorea en _update_status)
                 self._set_info_label_style("normal")
 
@@ -1306,7 +5287,7 @@ class MainWindow(QMainWindow):
             self.status_bar.showMessage(message)
 
         if hasattr(self, 'info_label') and self.info_label:
-            self.info_label.setText(message)
+            self._set_label_text(self.info_label, message)
             if "Error" in message or "error" in message or "Fallo" in message:
                 self._set_info_label_style("error", message)
             elif "éxito" in message or "completado" in message or "procesada" in message or "listo" in message or "Cámara iniciada" in message or "Procesando video" in message:
@@ -1321,6 +5302,13 @@ class MainWindow(QMainWindow):
         if not hasattr(self, 'info_label') or not self.info_label:
             return
 
+        # El estilo solo se reescribe cuando cambia (reanalizar la hoja es costoso)
+        style_key = (style_type, self.dark_mode)
+        if style_key == self._info_label_style_key:
+            if message: self._set_label_text(self.info_label, message)
+            return
+        self._info_label_style_key = style_key
+
         # Base style
         base_style_dark = "color: #B0B0C0; font-weight: 600;"
         base_style_light = "color: #566573; font-weight: 600;"
@@ -1338,17 +5326,26 @@ class MainWindow(QMainWindow):
         else: # normal
             self.info_label.setStyleSheet(current_base_style)
         
-        if message: self.info_label.setText(message)
+        if message: self._set_label_text(self.info_label, message)
 
 
     def _clear_display(self):
         """Limpia la pantalla y resetea los controles"""
+        # Descartar actualizaciones pendientes de la fuente anterior
+        if self._pending_frame is not None:
+            self._release_display_buffer(self._pending_frame[0])
+        self._pending_frame = None
+        self._pending_frame_position = None
+        if hasattr(self, '_present_timer'):
+            self._present_timer.stop()
+            self._position_timer.stop()
+
         if self.video_label:
             welcome_message = "YOLO Vision Pro - Tomson"
-            self.video_label.setText(welcome_message)
-            self.video_label.setPixmap(QPixmap())
+            self.video_label.clear(welcome_message)
             font = QFont("Segoe UI Light", 30, QFont.Weight.ExtraLight)
             self.video_label.setFont(font)
+            self._video_label_font_mode = "bienvenida"
 
         # Resetear controles de video
         if hasattr(self, 'progress_slider'):
@@ -1361,25 +5358,18 @@ class MainWindow(QMainWindow):
             self.speed_btn.setText("1.0x")
             self._current_speed = 1.0
 
+        if hasattr(self, 'motion_label'):
+            self.motion_label.setVisible(False)
+
         if hasattr(self, 'info_label') and self.info_label:
             self._set_info_label_style("normal", "Seleccione una fuente o inicie la cámara")
 
     def _stop_current_media_if_running(self):
-        """Detiene el procesamiento actual si hay alguno en curso"""
-        if self.media_thread and self.media_thread.isRunning():
+        """Cierra la fuente actual si hay alguna activa; el motor sigue vivo"""
+        if self.media_thread:
             try:
-                # Detener el hilo
-                self.media_thread.stop()
-                
-                # Esperar a que el hilo termine (con timeout)
-                if not self.media_thread.wait(2000):  # aumentado a 2 segundos
-                    print("Advertencia: El hilo no se detuvo correctamente")
-                    self.media_thread.terminate()  # Forzar terminación
-                
-                # Liberar recursos de la cámara si estaba activa
-                if hasattr(self.media_thread, 'cap') and self.media_thread.cap:
-                    self.media_thread.cap.release()
-                
+                # El cierre es un comando: el propio hilo libera (o aparca) la captura
+                self.media_thread.close_source()
                 self.media_thread = None
                 
                 # Limpiar la interfaz
@@ -1394,125 +5384,325 @@ class MainWindow(QMainWindow):
                 return True
         return False
 
+    def _retire_thread(self, thread):
+        """Conserva la referencia a un hilo que sigue terminando hasta que emita finished.
+
+        Destruir un QThread en marcha aborta la aplicación; el hilo se libera
+        con deleteLater cuando termina de verdad.
+        """
+        if not thread.isRunning():
+            thread.deleteLater()
+            return
+        self._retired_threads.append(thread)
+        thread.finished.connect(lambda t=thread: self._release_retired_thread(t))
+
+    def _release_retired_thread(self, thread):
+        if thread in self._retired_threads:
+            self._retired_threads.remove(thread)
+        thread.deleteLater()
+
+    def _ensure_media_engine(self):
+        """Crea (una sola vez) el motor de medios con el modelo ya cargado"""
+        if self.media_engine is not None:
+            return self.media_engine
+        engine = MediaProcessingThread(self.yolo_model)
+        engine.frame_ready.connect(self._on_media_frame)
+        engine.status_update.connect(self._update_status)
+        engine.processing_finished.connect(self._on_media_processing_finished)
+        engine.frame_position.connect(self._on_frame_position_update)
+        engine.total_frames.connect(self._on_total_frames_update)
+        engine.frames_skipped.connect(self._on_frames_skipped)
+        engine.source_switched.connect(self._on_source_switched)
+        engine.motion_gate_stats.connect(self._on_motion_gate_stats)
+        engine.governor_stats.connect(self._on_governor_stats)
+        engine.fallback_model_requested.connect(self._on_fallback_model_requested)
+        engine.motion_gate = self._build_motion_gate()
+        engine.fps_governor = FpsGovernor.from_config(self.governor_config)
+        engine.statistics = self.detection_statistics
+        engine.detection_index = self.detection_index
+        engine.timeline = self.timeline_density
+        # Antes de arrancar: el precalentamiento ya usa el tamaño de entrada del perfil
+        for name, value in self._engine_profile_parameters().items():
+            setattr(engine, name, value)
+        engine.present_frames = self._view_visible
+        engine.start()
+        self.media_engine = engine
+        return engine
+
     def _select_image_file(self):
         if not self.yolo_model:
             QMessageBox.warning(self, "Modelo no cargado", "El modelo YOLO aún no ha terminado de cargar.")
             return
-        if self._stop_current_media_if_running():
-            QTimer.singleShot(150, self.__proceed_with_image_selection) # Dar tiempo al hilo a parar
-        else:
-            self.__proceed_with_image_selection()
+        if self.image_thread and self.image_thread.isRunning():
+            QMessageBox.information(self, "Imágenes", "Ya hay un lote de imágenes en proceso.")
+            return
+        self._close_gallery()
+        self._stop_current_media_if_running()
+        self.__proceed_with_image_selection()
 
     def __proceed_with_image_selection(self):
-        self.current_source_type = "image"
-        file_path, _ = QFileDialog.getOpenFileName(
-            self, "Seleccionar Imagen", "",
+        file_paths, _ = QFileDialog.getOpenFileNames(
+            self, "Seleccionar Imágenes", "",
             "Archivos de Imagen (*.png *.jpg *.jpeg *.bmp *.webp *.gif)"
         )
+        if not file_paths:
+            return
+        self._process_image_files(file_paths)
 
-        if file_path:
-            self.current_media_path = file_path
-            file_name = os.path.basename(file_path)
-            self._update_status(f"Procesando imagen: {file_name}...")
-            self._set_info_label_style("info", f"Procesando {file_name}...")
-            QApplication.processEvents()
+    def _process_image_files(self, file_paths):
+        """Analiza una o varias imágenes en el hilo de trabajo por lotes"""
+        self.current_source_type = "image"
+        self.current_media_path = file_paths[0]
+        count_text = os.path.basename(file_paths[0]) if len(file_paths) == 1 else f"{len(file_paths)} imágenes"
+        self._update_status(f"Procesando imagen: {count_text}...")
+        self._set_info_label_style("info", f"Procesando {count_text}...")
 
-            try:
-                img_cv = cv2.imread(file_path)
-                if img_cv is None:
-                    try:
-                        from PIL import Image as PILImage # Renombrar para evitar conflicto
-                        img_pil = PILImage.open(file_path)
-                        img_cv = cv2.cvtColor(np.array(img_pil.convert('RGB')), cv2.COLOR_RGB2BGR)
-                    except (ImportError, Exception) as pil_error:
-                        raise Exception(f"No se pudo cargar la imagen con OpenCV ni PIL: {pil_error}")
+        try:
+            # La decodificación, la inferencia y el dibujo ocurren en el hilo de trabajo
+            self.image_thread = ImageBatchThread(self.yolo_model, file_paths,
+                                                 batch_size=self.image_batch_size,
+                                                 decode_workers=int(self.thread_config["decode_workers"]),
+                                                 max_side=self._image_decode_side(),
+                                                 imgsz=self.model_input_size)
+            self.image_thread.detection_recorder = self.detection_recorder
+            self.image_thread.detection_index = self.detection_index
+            self.image_thread.image_ready.connect(self._on_batch_image_ready)
+            self.image_thread.image_failed.connect(self._on_batch_image_failed)
+            self.image_thread.progress.connect(self._on_batch_progress)
+            self.image_thread.batch_finished.connect(self._on_batch_finished)
+            self.image_thread.finished.connect(self._on_image_thread_done)
+            self.image_thread.start()
+        except Exception as e:
+            self.image_thread = None
+            QMessageBox.warning(self, "Error de Imagen", f"No se pudo procesar la imagen:\n{e}")
+        self._update_button_states()
 
-                frame_rgb = cv2.cvtColor(img_cv, cv2.COLOR_BGR2RGB)
-                results = self.yolo_model(frame_rgb, verbose=False)
-                
-                # Dibujar resultados con estilo mejorado
-                for r in results:
-                    boxes, names = r.boxes, r.names
-                    if boxes is not None:
-                        for i in range(len(boxes)):
-                            box_coords = boxes[i].xyxy[0].cpu().numpy().astype(int)
-                            cls_id = int(boxes[i].cls.cpu().numpy()[0])
-                            conf = float(boxes[i].conf.cpu().numpy()[0])
-                            label = f"{names[cls_id]}: {conf:.2f}"
-
-                            detection_color = (79, 70, 229) # Indigo-600
-                            text_bg_color = (67, 56, 202) # Indigo-700
-                            text_fg_color = (255, 255, 255) # Blanco
-
-                            cv2.rectangle(img_cv, (box_coords[0], box_coords[1]), (box_coords[2], box_coords[3]), detection_color, 2)
-                            
-                            # Fondo para el texto con estilo moderno
-                            (w, h), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_DUPLEX, 0.6, 1)
-                            cv2.rectangle(img_cv, (box_coords[0], box_coords[1] - h - 10), (box_coords[0] + w + 4, box_coords[1] - 5), text_bg_color, -1)
-                            cv2.putText(img_cv, label, (box_coords[0] + 2, box_coords[1] - 7), 
-                                        cv2.FONT_HERSHEY_DUPLEX, 0.6, text_fg_color, 1, cv2.LINE_AA)
-
-                final_rgb_image = cv2.cvtColor(img_cv, cv2.COLOR_BGR2RGB)
-                h_img, w_img, ch_img = final_rgb_image.shape
-                bytes_per_line_img = ch_img * w_img
-                qt_image = QImage(final_rgb_image.data, w_img, h_img, bytes_per_line_img, QImage.Format.Format_RGB888)
-                
-                self._update_display_pixmap(QPixmap.fromImage(qt_image))
-                
-                num_objects = len(results[0].boxes) if hasattr(results[0], 'boxes') and results[0].boxes is not None else 0
-                success_msg = f"Imagen procesada: {file_name} ({num_objects} objetos)"
-                self._update_status(success_msg)
-                self._set_info_label_style("success", success_msg)
+    @pyqtSlot(object, object, str, int)
+    def _on_batch_image_ready(self, frame, detections, file_path, num_objects):
+        """Muestra cada imagen en cuanto el hilo de trabajo la termina"""
+        self.current_media_path = file_path
+        self._update_display_frame(frame, detections)
+        success_msg = f"Imagen procesada: {os.path.basename(file_path)} ({num_objects} objetos)"
+        self._set_info_label_style("success", success_msg)
+
+    @pyqtSlot(str, str)
+    def _on_batch_image_failed(self, file_path, message):
+        self._update_status(f"Error al procesar imagen {os.path.basename(file_path)}: {message}")
+
+    @pyqtSlot(int, int, float)
+    def _on_batch_progress(self, processed, total, images_per_second):
+        self.status_bar.showMessage(f"Imágenes: {processed}/{total} · {images_per_second:.1f} img/s")
+
+    @pyqtSlot(int, int, float)
+    def _on_batch_finished(self, processed, total, elapsed):
+        rate = processed / elapsed if elapsed > 0 else 0.0
+        if processed < total:
+            message = f"Procesamiento cancelado: {processed}/{total} imágenes ({rate:.1f} img/s)"
+        elif total == 1:
+            message = f"Imagen procesada en {elapsed:.2f}s"
+        else:
+            message = f"{total} imágenes procesadas en {elapsed:.1f}s ({rate:.1f} img/s)"
+        self.status_bar.showMessage(message, 5000)
 
-            except Exception as e:
-                error_msg = f"Error al procesar imagen: {e}"
-                self._update_status(error_msg)
-                self._set_info_label_style("error", f"Error: {e}")
-                QMessageBox.warning(self, "Error de Imagen", f"No se pudo procesar la imagen:\n{e}")
-            
-            self._update_button_states()
+    def _on_image_thread_done(self):
+        self.image_thread = None
+        self._update_button_states()
+
+    def _cancel_image_batch(self):
+        """Cancela el procesamiento de imágenes en curso"""
+        if self.image_thread and self.image_thread.isRunning():
+            self.image_thread.cancel()
+            self.status_bar.showMessage("Cancelando procesamiento de imágenes...", 2000)
+
+    def _open_image_folder(self):
+        """Abre una carpeta de imágenes en modo galería"""
+        if not self.yolo_model:
+            QMessageBox.warning(self, "Modelo no cargado", "El modelo YOLO aún no ha terminado de cargar.")
+            return
+        if self.image_thread and self.image_thread.isRunning():
+            QMessageBox.information(self, "Imágenes", "Ya hay un lote de imágenes en proceso.")
+            return
+        folder = QFileDialog.getExistingDirectory(self, "Seleccionar Carpeta de Imágenes", "")
+        if not folder:
+            return
+
+        paths = list_images(folder)
+        if not paths:
+            QMessageBox.information(self, "Galería", "La carpeta no contiene imágenes compatibles.")
+            return
 
+        self._stop_current_media_if_running()
+        self._close_gallery()
+        self.current_source_type = "image"
+        self.gallery_paths = paths
+
+        placeholder = QPixmap(self.GALLERY_THUMB_SIZE, self.GALLERY_THUMB_SIZE * 3 // 4)
+        placeholder.fill(QColor("#28283A"))
+        self._gallery_placeholder = QIcon(placeholder)
+        self.gallery_list.setUpdatesEnabled(False)
+        for path in paths:
+            item = QListWidgetItem(self._gallery_placeholder, os.path.basename(path)[:18])
+            item.setToolTip(path)
+            self.gallery_list.addItem(item)
+        self.gallery_list.setUpdatesEnabled(True)
+        self.gallery_list.setVisible(True)
+
+        self.gallery_thumbnail_thread = ThumbnailLoaderThread(ThumbnailCache(size=self.GALLERY_THUMB_SIZE), paths)
+        self.gallery_thumbnail_thread.thumbnail_ready.connect(self._on_gallery_thumbnail_ready)
+        self.gallery_thumbnail_thread.start()
+        self.gallery_prefetch_thread = GalleryPrefetchThread(self.yolo_model, paths, self.GALLERY_LOOKAHEAD)
+        self.gallery_prefetch_thread.annotated_ready.connect(self._on_gallery_annotated)
+        self.gallery_prefetch_thread.annotation_failed.connect(self._on_gallery_annotation_failed)
+        self.gallery_prefetch_thread.start()
+
+        self.gallery_list.setCurrentRow(0)
+        self.gallery_list.setFocus()
+        self._schedule_visible_thumbnails()
+        self.status_bar.showMessage(f"Galería: {len(paths)} imágenes en {folder}", 5000)
+
+    def _close_gallery(self):
+        """Detiene los hilos de la galería y libera sus miniaturas"""
+        for thread in (self.gallery_thumbnail_thread, self.gallery_prefetch_thread):
+            if thread is not None:
+                thread.stop()
+                if not thread.wait(2000):
+                    self._retire_thread(thread)
+        self.gallery_thumbnail_thread = None
+        self.gallery_prefetch_thread = None
+        self.gallery_paths = []
+        self._gallery_loaded_icons.clear()
+        if hasattr(self, 'gallery_list'):
+            self.gallery_list.clear()
+            self.gallery_list.setVisible(False)
+
+    def _schedule_visible_thumbnails(self, *args):
+        # Agrupar los eventos de desplazamiento en una sola petición
+        self._gallery_thumb_timer.start()
+
+    def _request_visible_thumbnails(self):
+        """Pide solo las miniaturas visibles (y un pequeño margen a cada lado)"""
+        if not self.gallery_thumbnail_thread or not self.gallery_paths:
+            return
+        viewport = self.gallery_list.viewport()
+        middle = viewport.height() // 2
+        first = self.gallery_list.indexAt(QPoint(1, middle)).row()
+        last = self.gallery_list.indexAt(QPoint(viewport.width() - 2, middle)).row()
+        first = max(0, first if first >= 0 else 0)
+        last = last if last >= 0 else min(len(self.gallery_paths) - 1, first + 20)
+        margin = 5
+        wanted = [i for i in range(max(0, first - margin), min(len(self.gallery_paths), last + margin + 1))
+                  if i not in self._gallery_loaded_icons]
+        # Se piden en orden inverso porque el hilo atiende primero la última petición
+        self.gallery_thumbnail_thread.request(reversed(wanted))
+
+    @pyqtSlot(int, QImage)
+    def _on_gallery_thumbnail_ready(self, index, thumb):
+        item = self.gallery_list.item(index)
+        if item is None:
+            return
+        item.setIcon(QIcon(QPixmap.fromImage(thumb)))
+        self._gallery_loaded_icons[index] = True
+        self._gallery_loaded_icons.move_to_end(index)
+        # Memoria acotada: las miniaturas más antiguas vuelven al marcador de posición
+        while len(self._gallery_loaded_icons) > self.GALLERY_MAX_ICONS:
+            old_index, _ = self._gallery_loaded_icons.popitem(last=False)
+            old_item = self.gallery_list.item(old_index)
+            if old_item is not None:
+                old_item.setIcon(self._gallery_placeholder)
+            self.gallery_thumbnail_thread.forget(old_index)
 
-    def _start_media_processing_thread(self, source_type, file_path=None):
+    @pyqtSlot(int)
+    def _on_gallery_row_changed(self, row):
+        if row < 0 or row >= len(self.gallery_paths) or not self.gallery_prefetch_thread:
+            return
+        self.current_media_path = self.gallery_paths[row]
+        self.gallery_prefetch_thread.set_cursor(row)
+        cached = self.gallery_prefetch_thread.cached(row)
+        if cached is not None:
+            self._show_gallery_image(row, *cached)
+        else:
+            self._set_info_label_style("info", f"Analizando {os.path.basename(self.current_media_path)}...")
+
+    @pyqtSlot(int, object, object, int)
+    def _on_gallery_annotated(self, index, frame, detections, num_objects):
+        if index == self.gallery_list.currentRow():
+            self._show_gallery_image(index, frame, detections, num_objects)
+
+    @pyqtSlot(int, str)
+    def _on_gallery_annotation_failed(self, index, message):
+        if index == self.gallery_list.currentRow():
+            self._set_info_label_style("error", f"Error al procesar imagen: {message}")
+
+    def _show_gallery_image(self, index, frame, detections, num_objects):
+        self._update_display_frame(frame, detections)
+        file_name = os.path.basename(self.gallery_paths[index])
+        self._set_info_label_style(
+            "success", f"[{index + 1}/{len(self.gallery_paths)}] {file_name} ({num_objects} objetos)")
+
+    @pyqtSlot(float)
+    def _on_view_scale_changed(self, scale):
+        """Con el zoom ampliando los píxeles de una imagen, pide su decodificación completa"""
+        path = self.current_media_path
+        if (self.current_source_type != "image" or not path or scale <= 1.0
+                or path == self._full_resolution_path or self._full_resolution_thread is not None):
+            return
+        self._full_resolution_path = path
+        thread = FullResolutionLoaderThread(path, self.video_label.frame_side())
+        thread.decoded.connect(self._on_full_resolution_decoded)
+        thread.finished.connect(self._on_full_resolution_thread_done)
+        self._full_resolution_thread = thread
+        thread.start()
+
+    @pyqtSlot(str, object)
+    def _on_full_resolution_decoded(self, file_path, frame):
+        # La imagen pudo cambiar mientras se decodificaba
+        if file_path == self._full_resolution_path == self.current_media_path and self.video_label.has_frame():
+            self.video_label.set_detail_frame(frame)
+
+    def _on_full_resolution_thread_done(self):
+        thread = self._full_resolution_thread
+        self._full_resolution_thread = None
+        if thread is not None:
+            thread.deleteLater()
+        # Si entretanto se mostró otra imagen con zoom, pedir la suya
+        if self.video_label.has_frame():
+            self._on_view_scale_changed(self.video_label.view_scale())
+
+    def _image_decode_side(self):
+        """Lado mayor necesario al decodificar imágenes: entrada del modelo o área visible"""
+        view_side = max(self.video_label.width(), self.video_label.height()) if self.video_label else 0
+        return max(self.model_input_size, view_side)
+
+    def _start_media_processing_thread(self, source_type, file_path=None, start_frame=None):
         """Inicia un nuevo hilo de procesamiento de medios"""
         if not self.yolo_model:
             QMessageBox.warning(self, "Modelo no cargado", "El modelo YOLO aún no ha terminado de cargar.")
             return
 
-        try:
-            # Asegurarse de que cualquier procesamiento anterior se ha detenido
-            if self.media_thread and self.media_thread.isRunning():
-                self._stop_current_media_if_running()
-                # Si aún está corriendo después de intentar detenerlo, salir
-                if self.media_thread and self.media_thread.isRunning():
-                    QMessageBox.warning(self, "Error", "No se pudo detener el procesamiento anterior.")
-                    return
+        try:
+            # La galería y los lotes de imágenes comparten el modelo: detenerlos antes de empezar
+            self._close_gallery()
+            if self.image_thread and self.image_thread.isRunning():
+                self.image_thread.cancel()
+                self.image_thread.wait(2000)
 
             # Limpiar el estado actual
             self._clear_display()
             self.current_source_type = source_type
             self.current_media_path = file_path
 
-            # Crear y configurar el nuevo hilo
-            self.media_thread = MediaProcessingThread(self.yolo_model, source_type, file_path)
-            
-            # Conectar señales
-            self.media_thread.frame_ready.connect(self._update_display_pixmap)
-            self.media_thread.status_update.connect(self._update_status)
-            self.media_thread.processing_finished.connect(self._on_media_processing_finished)
-            self.media_thread.frame_position.connect(self._on_frame_position_update)
-            self.media_thread.total_frames.connect(self._on_total_frames_update)
-
-            # Actualizar la interfaz antes de iniciar
+            # Reutilizar el motor persistente: abrir una fuente es solo un comando
+            engine = self._ensure_media_engine()
+            engine.detection_recorder = self.detection_recorder
+            engine.event_recorder = self.event_recorder
+            engine.set_playback_speed(self._current_speed)
+            self._media_session = engine.open_source(source_type, file_path, start_frame)
+            self.media_thread = engine
+
+            # Actualizar la interfaz
             self._update_video_controls_visibility()
             self._update_button_states()
 
-            # Iniciar el procesamiento
-            self.media_thread.start()
-
-            # Actualizar estados después de un breve delay
-            QTimer.singleShot(100, self._update_button_states)
-
         except Exception as e:
             QMessageBox.critical(self, "Error",
                                f"Error al iniciar el procesamiento:\n{str(e)}")
@@ -1532,13 +5722,9 @@ class MainWindow(QMainWindow):
             )
 
             if file_path:
-                # Detener cualquier procesamiento activo y esperar
-                if self._stop_current_media_if_running():
-                    # Esperar más tiempo si venimos de la cámara web
-                    delay = 500 if self.current_source_type == "webcam" else 200
-                    QTimer.singleShot(delay, lambda: self._actually_start_video(file_path))
-                else:
-                    self._actually_start_video(file_path)
+                # Cerrar la fuente activa; el motor abre la nueva sin esperas fijas
+                self._stop_current_media_if_running()
+                self._actually_start_video(file_path)
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Error al seleccionar video:\n{str(e)}")
 
@@ -1577,12 +5763,9 @@ class MainWindow(QMainWindow):
             return
 
         try:
-            # Detener cualquier procesamiento activo y esperar a que termine
-            if self._stop_current_media_if_running():
-                # Esperar un momento para asegurar que todo se ha liberado
-                QTimer.singleShot(500, self._actually_start_webcam)
-            else:
-                self._actually_start_webcam()
+            # Cerrar la fuente activa; la cámara se reabre al instante si estaba aparcada
+            self._stop_current_media_if_running()
+            self._actually_start_webcam()
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Error al iniciar la cámara web:\n{str(e)}")
 
@@ -1605,20 +5788,22 @@ class MainWindow(QMainWindow):
 
     def _toggle_play_pause_media(self):
         if self.media_thread and self.media_thread.isRunning():
-            is_paused = self.media_thread.toggle_pause()
-            # Actualizar icono y tooltip del botón de play/pause
-            if is_paused:
-                self.play_pause_btn.setIcon(QIcon.fromTheme("media-playback-start"))
-                self.play_pause_btn.setToolTip("Reanudar")
-                self.btn_pausar.setText("Reanudar")
-                self.btn_pausar.setIcon(QIcon.fromTheme("media-playback-start"))
-            else:
-                self.play_pause_btn.setIcon(QIcon.fromTheme("media-playback-pause"))
-                self.play_pause_btn.setToolTip("Pausar")
-                self.btn_pausar.setText("Pausar")
-                self.btn_pausar.setIcon(QIcon.fromTheme("media-playback-pause"))
+            self._sync_pause_buttons(self.media_thread.toggle_pause())
         self._update_button_states()
 
+    def _sync_pause_buttons(self, is_paused):
+        """Actualiza icono y tooltip de los botones de play/pause"""
+        if is_paused:
+            self.play_pause_btn.setIcon(QIcon.fromTheme("media-playback-start"))
+            self.play_pause_btn.setToolTip("Reanudar")
+            self.btn_pausar.setText("Reanudar")
+            self.btn_pausar.setIcon(QIcon.fromTheme("media-playback-start"))
+        else:
+            self.play_pause_btn.setIcon(QIcon.fromTheme("media-playback-pause"))
+            self.play_pause_btn.setToolTip("Pausar")
+            self.btn_pausar.setText("Pausar")
+            self.btn_pausar.setIcon(QIcon.fromTheme("media-playback-pause"))
+
     def _stop_current_media(self):
         if self._stop_current_media_if_running():
             self.status_bar.showMessage("Deteniendo procesamiento...", 2000)
@@ -1666,16 +5851,28 @@ class MainWindow(QMainWindow):
 
     @pyqtSlot(int)
     def _on_frame_position_update(self, frame_position):
+        """Guarda la posición; el slider y el tiempo se refrescan a ~10 Hz"""
+        self._pending_frame_position = frame_position
+        # Oculta, la posición se guarda y se muestra al volver
+        if self._view_visible and not self._position_timer.isActive():
+            self._position_timer.start()
+
+    def _flush_frame_position(self):
         """Actualiza la posición del slider y el tiempo actual"""
+        frame_position = self._pending_frame_position
+        self._pending_frame_position = None
+        if frame_position is None:
+            return
         if self.media_thread and not self.progress_slider.isSliderDown():
             try:
                 total_frames = self.media_thread.total_frame_count
                 if total_frames > 0:
                     value = int((frame_position / total_frames) * 1000)
-                    self.progress_slider.setValue(value)
+                    if self.progress_slider.value() != value:
+                        self.progress_slider.setValue(value)
                     duration = self.media_thread.get_video_duration()
                     current_time = (frame_position / total_frames) * duration
-                    self.time_label_current.setText(self._format_time(current_time))
+                    self._set_label_text(self.time_label_current, self._format_time(current_time))
             except Exception as e:
                 print(f"Error al actualizar posición: {e}")
 
@@ -1684,11 +5881,11 @@ class MainWindow(QMainWindow):
         if self.media_thread and self.media_thread.source_type == "video":
             try:
                 current_frame = self.media_thread.current_frame
-                if current_frame > 0:
+                if current_frame > 1:
                     # Pausar el video si está reproduciendo
                     if not self.media_thread._is_paused:
                         self._toggle_play_pause_media()
-                    self.media_thread.seek_to_frame(current_frame - 1)
+                    self.media_thread.step(-1)
             except Exception as e:
                 print(f"Error al retroceder frame: {e}")
 
@@ -1697,11 +5894,11 @@ class MainWindow(QMainWindow):
         if self.media_thread and self.media_thread.source_type == "video":
             try:
                 current_frame = self.media_thread.current_frame
-                if current_frame < self.media_thread.total_frame_count - 1:
+                if current_frame < self.media_thread.total_frame_count:
                     # Pausar el video si está reproduciendo
                     if not self.media_thread._is_paused:
                         self._toggle_play_pause_media()
-                    self.media_thread.seek_to_frame(current_frame + 1)
+                    self.media_thread.step(1)
             except Exception as e:
                 print(f"Error al avanzar frame: {e}")
 
@@ -1718,369 +5915,164 @@ class MainWindow(QMainWindow):
             self.speed_btn.setText(f"{self._current_speed}x")
             
             if self.media_thread and self.media_thread.isRunning():
-                # Aquí se podría implementar el cambio de velocidad real
-                pass
+                self.media_thread.set_playback_speed(self._current_speed)
         except Exception as e:
             print(f"Error al cambiar velocidad: {e}")
 
-    @pyqtSlot(int)
-    def _on_total_frames_update(self, total_frames):
-        """Actualiza la duración total del video"""
-        if self.media_thread:
-            try:
-                duration = self.media_thread.get_video_duration()
-                if duration > 0:
-                    self.time_label_total.setText(self._format_time(duration))
-                else:
-                    self.time_label_total.setText("00:00")
-            except Exception as e:
-                print(f"Error al actualizar frames totales: {e}")
-
-    def _update_video_controls_visibility(self):
-        """Actualiza la visibilidad de los controles de video según el estado actual"""
-        try:
-            is_video = self.current_source_type == "video"
-            is_media_active = self.media_thread is not None and self.media_thread.isRunning()
-            
-            # Verificar que los controles existan antes de usarlos
-            if hasattr(self, 'video_controls'):
-                self.video_controls.setVisible(bool(is_video))  # Mostrar solo para videos
-                if is_video:
-                    self.progress_slider.setValue(0)
-                    self.time_label_current.setText("00:00")
-                    self.time_label_total.setText("00:00")
-            
-            # Actualizar estado de los botones
-            for control in ['play_pause_btn', 'stop_btn', 'prev_frame_btn', 
-                          'next_frame_btn', 'speed_btn', 'reload_btn']:
-                if hasattr(self, control):
-                    btn = getattr(self, control)
-                    btn.setEnabled(bool(is_video and is_media_active))
-            
-            # Actualizar el slider y las etiquetas de tiempo
-            if hasattr(self, 'progress_slider'):
-                self.progress_slider.setEnabled(bool(is_video and is_media_active))
-                if not (is_video and is_media_active):
-                    self.progress_slider.setValue(0)
-            
-            for label in ['time_label_current', 'time_label_total']:
-                if hasattr(self, label):
-                    lbl = getattr(self, label)
-                    if not (is_video and is_media_active):
-                        lbl.setText("00:00")
-
-        except Exception as e:
-            print(f"Error al actualizar controles de video: {e}")
-
-    def _on_media_processing_finished(self):
-        final_message = "Procesamiento finalizado."
-        if self.current_source_type == "video":
-            final_message = "Procesamiento de video finalizado."
-        elif self.current_source_type == "webcam":
-            final_message = "Cámara detenida."
-        
-        self._update_status(final_message)
-        self.media_thread = None
-        self._update_button_states()
-        self._update_video_controls_visibility()
-
-    def _get_theme_style(self, colors):
-        return f"""
-            /* Estilo general de la ventana */
-            QMainWindow {{
-                background-color: {colors['bg']};
-                color: {colors['text']};
-                font-family: 'Segoe UI', 'Roboto', sans-serif;
-            }}
-            QWidget {{
-                color: {colors['text']};
-                font-size: 10pt;
-            }}
-
-            /* Header */
-            QFrame#Header {{
-                background: {colors['bg']};
-                border-bottom: 2px solid {colors['border']};
-            }}
-            QLabel#LogoLabel {{
-                color: {colors['accent']};
-                font-size: 18px;
-                padding: 2px;
-            }}
-            QLabel#TitleLabel {{
-                color: {colors['text']};
-                font-size: 14px;
-                font-weight: bold;
-            }}
-            QPushButton#MenuButton {{
-                background: transparent;
-                border: none;
-                color: {colors['text']};
-                font-size: 13px;
-                padding: 5px 15px;
-                border-radius: 4px;
-            }}
-            QPushButton#MenuButton:hover {{
-                background: {colors['hover']};
-            }}
-            QPushButton#MenuButton:pressed {{
-                background: {colors['pressed']};
-            }}
-            QPushButton#ThemeButton {{
-                background: transparent;
-                border: 1px solid {colors['border']};
-                border-radius: 15px;
-                color: {colors['text']};
-                font-size: 16px;
-                padding: 2px;
-            }}
-            QPushButton#ThemeButton:hover {{
-                background: {colors['hover']};
-                border-color: {colors['accent']};
-            }}
-            QPushButton#MinimizeButton, 
-            QPushButton#MaximizeButton, 
-            QPushButton#CloseButton {{
-                background: transparent;
-                border: none;
-                border-radius: 15px;
-                color: {colors['text']};
-                font-size: 14px;
-                padding: 2px;
-            }}
-            QPushButton#MinimizeButton:hover, 
-            QPushButton#MaximizeButton:hover {{
-                background: {colors['hover']};
-            }}
-            QPushButton#CloseButton:hover {{
-                background: #FF4444;
-                color: white;
-            }}
-
-            /* Barra de herramientas */
-            QToolBar {{
-                background-color: {colors['bg']};
-                border: none;
-                padding: 5px;
-                border-bottom: 1px solid {colors['border']};
-            }}
-            QPushButton#ToolbarButton {{
-                background-color: {colors['secondary']};
-                border: 1px solid {colors['border']};
-                border-radius: 6px;
-                padding: 10px 20px;
-                color: {colors['text']};
-                font-size: 13px;
-                font-weight: 500;
-            }}
-            QPushButton#ToolbarButton:hover {{
-                background-color: {colors['hover']};
-                border-color: {colors['accent']};
-            }}
-            QPushButton#ToolbarButton:pressed {{
-                background-color: {colors['pressed']};
-            }}
-            QPushButton#ToolbarButton:disabled {{
-                background-color: {colors['secondary']};
-                border-color: {colors['border']};
-                color: {colors['disabled']};
-            }}
+    @pyqtSlot(int, object, object)
+    def _on_media_frame(self, session, frame, detections):
+        # Descartar frames que llegan después de cerrar o cambiar la fuente, o de ocultar la ventana
+        if self.media_thread is None or session != self._media_session or not self._view_visible:
+            self._release_display_buffer(frame)
+            return
+        # Solo se conserva el último frame; los intermedios se reemplazan
+        if self._pending_frame is not None:
+            self._release_display_buffer(self._pending_frame[0])
+        self._pending_frame = (frame, detections)
+        if self._present_timer.isActive():
+            return
+        wait = self._last_present_time + self._display_refresh_interval() - time.perf_counter()
+        if wait <= 0:
+            self._present_pending_frame()
+        else:
+            self._present_timer.start(max(1, int(wait * 1000)))
+
+    def _display_refresh_interval(self):
+        """Periodo de refresco de la pantalla donde está la ventana"""
+        screen = self.screen() or QApplication.primaryScreen()
+        rate = screen.refreshRate() if screen else 0
+        return 1.0 / rate if rate > 1 else 1.0 / 60
+
+    def _present_pending_frame(self):
+        """Muestra el último frame recibido, como mucho una vez por refresco"""
+        pending = self._pending_frame
+        self._pending_frame = None
+        if pending is None:
+            return
+        if self.media_thread is None:
+            self._release_display_buffer(pending[0])
+            return
+        self._last_present_time = time.perf_counter()
+        self._update_display_frame(*pending)
+
+    @pyqtSlot(object)
+    def _release_display_buffer(self, frame):
+        """Devuelve al motor un búfer de pantalla que ya no se muestra"""
+        if self.media_engine is not None:
+            self.media_engine.frame_buffers.release(frame)
+
+    @pyqtSlot(int, float)
+    def _on_source_switched(self, session, latency):
+        """Muestra la latencia del cambio de fuente y avisa si supera el objetivo"""
+        if session != self._media_session:
+            return
+        latency_ms = latency * 1000
+        self.status_bar.showMessage(f"Fuente lista en {latency_ms:.0f} ms", 3000)
+        if latency_ms > self.SWITCH_LATENCY_TARGET_MS:
+            print(f"Advertencia: cambio de fuente en {latency_ms:.0f} ms "
+                  f"(objetivo {self.SWITCH_LATENCY_TARGET_MS} ms)")
 
-            /* Área de video */
-            QLabel#VideoLabel {{
-                background-color: {colors['secondary']};
-                border: 2px solid {colors['border']};
-                border-radius: 15px;
-                color: {colors['text']};
-                padding: 8px;
-            }}
+    @pyqtSlot(int)
+    def _on_frames_skipped(self, skipped_total):
+        """Informa cuántos frames se han omitido para mantener el ritmo de reproducción"""
+        if self.status_bar:
+            self.status_bar.showMessage(f"Frames omitidos para mantener {self._current_speed}x: {skipped_total}", 2000)
 
-            /* Controles de video */
-            QFrame#VideoControls {{
-                background-color: {colors['bg']};
-                border: 2px solid {colors['border']};
-                border-radius: 15px;
-            }}
-            QLabel#TimeLabel {{
-                color: {colors['text']};
-                font-weight: bold;
-                min-width: 60px;
-            }}
-            QPushButton#VideoControlButton {{
-                background: {colors['secondary']};
-                border: 2px solid {colors['border']};
-                border-radius: 20px;
-                padding: 10px;
-                min-width: 40px;
-                min-height: 40px;
-                color: {colors['text']};
-            }}
-            QPushButton#VideoControlButton:hover {{
-                background: {colors['hover']};
-                border-color: {colors['accent']};
-            }}
-            QPushButton#VideoControlButton:pressed {{
-                background: {colors['pressed']};
-            }}
-            QPushButton#SpeedButton {{
-                background: {colors['secondary']};
-                border: 2px solid {colors['border']};
-                border-radius: 15px;
-                padding: 5px 15px;
-                color: {colors['text']};
-                font-weight: bold;
-            }}
-            QPushButton#SpeedButton:hover {{
-                background: {colors['hover']};
-                border-color: {colors['accent']};
-            }}
-            QSlider#ProgressSlider {{
-                height: 30px;
-            }}
-            QSlider#ProgressSlider::groove:horizontal {{
-                border: none;
-                height: 6px;
-                background: {colors['border']};
-                margin: 0px;
-                border-radius: 3px;
-            }}
-            QSlider#ProgressSlider::handle:horizontal {{
-                background: {colors['accent']};
-                border: 2px solid {colors['text']};
-                width: 16px;
-                margin: -5px 0;
-                border-radius: 8px;
-            }}
-            QSlider#ProgressSlider::sub-page:horizontal {{
-                background: {colors['accent']};
-                border-radius: 3px;
-            }}
+    @pyqtSlot(int)
+    def _on_total_frames_update(self, total_frames):
+        """Actualiza la duración total del video"""
+        if self.media_thread:
+            try:
+                duration = self.media_thread.get_video_duration()
+                if duration > 0:
+                    self.time_label_total.setText(self._format_time(duration))
+                else:
+                    self.time_label_total.setText("00:00")
+            except Exception as e:
+                print(f"Error al actualizar frames totales: {e}")
+            if total_frames > 0 and self.current_source_type == "video" and self.current_media_path:
+                self._start_timeline_prefill(self.current_media_path)
+
+    def _start_timeline_prefill(self, video_path):
+        """Rellena la franja de densidad con lo que el índice ya sabe de este video"""
+        thread = TimelinePrefillThread(video_path)
+        thread.prefill_ready.connect(self._on_timeline_prefill)
+        thread.finished.connect(lambda: self._prefill_threads.discard(thread))
+        self._prefill_threads.add(thread)
+        thread.start()
+
+    @pyqtSlot(str, object)
+    def _on_timeline_prefill(self, video_path, rows):
+        if self.media_thread is not None and video_path == self.current_media_path:
+            self.timeline_density.add_rows(rows)
+
+    @pyqtSlot(float)
+    def _on_density_seek(self, fraction):
+        """Salta al punto de la franja de densidad donde se hizo clic"""
+        if self.media_thread and self.media_thread.source_type == "video":
+            total_frames = self.media_thread.total_frame_count
+            if total_frames > 0:
+                self.media_thread.seek_to_frame(int(fraction * (total_frames - 1)))
+                self.progress_slider.setValue(int(fraction * 1000))
 
-            /* Panel de información */
-            QFrame#InfoPanel {{
-                background-color: {colors['secondary']};
-                border-radius: 8px;
-                border: 1px solid {colors['border']};
-            }}
-            QLabel#InfoLabel {{
-                color: {colors['text_secondary']};
-                font-size: 10pt;
-                font-weight: 600;
-            }}
+    def _update_video_controls_visibility(self):
+        """Actualiza la visibilidad de los controles de video según el estado actual"""
+        try:
+            is_video = self.current_source_type == "video"
+            is_media_active = self.media_thread is not None and self.media_thread.isRunning()
+            
+            # Verificar que los controles existan antes de usarlos
+            if hasattr(self, 'video_controls'):
+                self.video_controls.setVisible(bool(is_video))  # Mostrar solo para videos
+                if is_video:
+                    self.progress_slider.setValue(0)
+                    self.time_label_current.setText("00:00")
+                    self.time_label_total.setText("00:00")
+            
+            # Actualizar estado de los botones
+            for control in ['play_pause_btn', 'stop_btn', 'prev_frame_btn', 
+                          'next_frame_btn', 'speed_btn', 'reload_btn']:
+                if hasattr(self, control):
+                    btn = getattr(self, control)
+                    btn.setEnabled(bool(is_video and is_media_active))
+            
+            # Actualizar el slider y las etiquetas de tiempo
+            if hasattr(self, 'progress_slider'):
+                self.progress_slider.setEnabled(bool(is_video and is_media_active))
+                if not (is_video and is_media_active):
+                    self.progress_slider.setValue(0)
+            
+            for label in ['time_label_current', 'time_label_total']:
+                if hasattr(self, label):
+                    lbl = getattr(self, label)
+                    if not (is_video and is_media_active):
+                        lbl.setText("00:00")
 
-            /* Barra de estado */
-            QStatusBar {{
-                background-color: {colors['bg']};
-                color: {colors['text_secondary']};
-                font-size: 9pt;
-                font-weight: 500;
-                border-top: 1px solid {colors['border']};
-            }}
+        except Exception as e:
+            print(f"Error al actualizar controles de video: {e}")
 
-            /* Menús */
-            QMenu {{
-                background-color: {colors['bg']};
-                border: 1px solid {colors['border']};
-                border-radius: 8px;
-                padding: 8px;
-            }}
-            QMenu::item {{
-                color: {colors['text']};
-                padding: 8px 20px;
-                border-radius: 4px;
-                margin: 4px;
-            }}
-            QMenu::item:selected {{
-                background: {colors['hover']};
-                color: {colors['text']};
-            }}
-            QMenu::separator {{
-                height: 1px;
-                background: {colors['border']};
-                margin: 6px 12px;
-            }}
-        """
+    @pyqtSlot(int)
+    def _on_media_processing_finished(self, session):
+        # Ignorar el aviso tardío de una sesión que ya fue sustituida por otra
+        if self.media_thread is None or session != self._media_session:
+            return
+        final_message = "Procesamiento finalizado."
+        if self.current_source_type == "video":
+            final_message = "Procesamiento de video finalizado."
+        elif self.current_source_type == "webcam":
+            final_message = "Cámara detenida."
+        
+        self._update_status(final_message)
+        self.media_thread = None
+        self._update_button_states()
+        self._update_video_controls_visibility()
 
     def _show_theme_menu(self):
         menu = QMenu(self)
-        
-        # Temas predefinidos con colores completos y mejorados
-        themes = {
-            "🌙 Oscuro": {
-                "bg": "#1a1a2e",
-                "accent": "#4A3AFF",
-                "secondary": "#28283A",
-                "border": "#3A3A4C",
-                "text": "#E0E0FF",
-                "text_secondary": "#B0B0C0",
-                "disabled": "#666680",
-                "hover": "#323248",
-                "pressed": "#3A3A58"
-            },
-            "☀️ Claro": {
-                "bg": "#FFFFFF",
-                "accent": "#6366F1",
-                "secondary": "#F8F9FA",
-                "border": "#E2E8F0",
-                "text": "#1E293B",
-                "text_secondary": "#64748B",
-                "disabled": "#CBD5E1",
-                "hover": "#F1F5F9",
-                "pressed": "#E2E8F0"
-            },
-            "🌺 Rosa": {
-                "bg": "#2D1A2E",
-                "accent": "#FF3AFF",
-                "secondary": "#3A1A3C",
-                "border": "#4C1A4E",
-                "text": "#FFE0FF",
-                "text_secondary": "#FFB0FF",
-                "disabled": "#806680",
-                "hover": "#4C2A4E",
-                "pressed": "#5C3A5E"
-            },
-            "🌊 Océano": {
-                "bg": "#1A2D2E",
-                "accent": "#3AFFFF",
-                "secondary": "#1A3A3C",
-                "border": "#1A4C4E",
-                "text": "#E0FFFF",
-                "text_secondary": "#B0FFFF",
-                "disabled": "#668080",
-                "hover": "#2A4D4E",
-                "pressed": "#3A5D5E"
-            },
-            "🍃 Bosque": {
-                "bg": "#1A2E1A",
-                "accent": "#3AFF3A",
-                "secondary": "#1A3C1A",
-                "border": "#1A4E1A",
-                "text": "#E0FFE0",
-                "text_secondary": "#B0FFB0",
-                "disabled": "#668066",
-                "hover": "#2A4E2A",
-                "pressed": "#3A5E3A"
-            },
-            "🌅 Atardecer": {
-                "bg": "#2E1A1A",
-                "accent": "#FF3A3A",
-                "secondary": "#3C1A1A",
-                "border": "#4E1A1A",
-                "text": "#FFE0E0",
-                "text_secondary": "#FFB0B0",
-                "disabled": "#806666",
-                "hover": "#4E2A2A",
-                "pressed": "#5E3A3A"
-            }
-        }
 
-        # Aplicar el estilo del menú según el tema actual
-        menu.setStyleSheet(self._get_theme_style(self.theme_colors if hasattr(self, 'theme_colors') else themes["🌙 Oscuro"]))
-
-        for theme_name, colors in themes.items():
+        for theme_name in ThemeManager.THEMES:
             action = QAction(theme_name, self)
-            action.setData(colors)
-            action.triggered.connect(lambda checked, t=theme_name, c=colors: self._apply_theme(t, c))
+            action.triggered.connect(lambda checked, t=theme_name: self._apply_theme(t))
             menu.addAction(action)
 
         button = self.sender()
@@ -2088,66 +6080,26 @@ class MainWindow(QMainWindow):
             pos = button.mapToGlobal(button.rect().bottomLeft())
             menu.exec(pos)
 
-    def _apply_theme(self, theme_name, colors):
-        self.dark_mode = colors["bg"].startswith("#1") or colors["bg"].startswith("#2")
+    def _apply_theme(self, theme_name):
+        """Cambia de tema mediante la propiedad dinámica y mide cuánto tarda"""
+        start = time.perf_counter()
+        colors = ThemeManager.THEMES[theme_name]
+        self.dark_mode = colors["bg"] != "#FFFFFF"
         self.theme_colors = colors
-        
-        # Actualizar el ícono del botón de tema
-        self.theme_btn.setText(theme_name.split()[0])
-        
-        # Aplicar el estilo global
-        style = self._get_theme_style(colors)
-        self.setStyleSheet(style)
 
-        # Actualizar estilos específicos de componentes
-        if hasattr(self, 'toolbar'):
-            self.toolbar.setStyleSheet(style)
-        
-        # Actualizar el estilo del header
-        if hasattr(self, 'header'):
-            self.header.setStyleSheet(style)
-
-        # Actualizar los controles de video
-        if hasattr(self, 'video_controls'):
-            self.video_controls.setStyleSheet(style)
-            
-        # Actualizar el panel de información
-        if hasattr(self, 'info_label'):
-            self.info_label.setStyleSheet(style)
-
-        # Actualizar la barra de estado
-        if hasattr(self, 'status_bar'):
-            self.status_bar.setStyleSheet(style)
+        # Actualizar el ícono del botón de tema
+        if hasattr(self, 'theme_btn'):
+            self.theme_btn.setText(theme_name.split()[0])
 
-        # Forzar la actualización visual de los widgets
-        self.repaint()
+        self.theme_manager.apply(self, theme_name)
 
         # Actualizar el video_label
         if hasattr(self, 'video_label'):
             if not (hasattr(self, 'media_thread') and self.media_thread and self.media_thread.isRunning()):
                 self._clear_display()
 
-        # Actualizar los menús
-        for menu in self.findChildren(QMenu):
-            menu.setStyleSheet(style)
-
-        # Actualizar todos los botones
-        for button in self.findChildren(QPushButton):
-            button.setStyleSheet(style)
-
-        # Actualizar todos los frames
-        for frame in self.findChildren(QFrame):
-            frame.setStyleSheet(style)
-
-        # Actualizar todos los labels
-        for label in self.findChildren(QLabel):
-            label.setStyleSheet(style)
-
-        # Actualizar todos los sliders
-        for slider in self.findChildren(QSlider):
-            slider.setStyleSheet(style)
-
-        self.status_bar.showMessage(f"Tema {theme_name} aplicado.", 3000)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.status_bar.showMessage(f"Tema {theme_name} aplicado en {elapsed_ms:.1f} ms.", 3000)
 
     def _recreate_toolbar(self):
         # Eliminar la barra de herramientas existente si existe
@@ -2171,15 +6123,46 @@ class MainWindow(QMainWindow):
 
     def closeEvent(self, event):
         """Maneja el cierre de la aplicación"""
+        self._view_visible = False
         try:
             self.status_bar.showMessage("Cerrando aplicación...", 2000)
             QApplication.processEvents()  # Procesar eventos pendientes
             
-            # Detener cualquier procesamiento activo
-            if self.media_thread and self.media_thread.isRunning():
-                self.media_thread.stop()
-                if not self.media_thread.wait(1000):  # espera máximo 1 segundo
-                    self.media_thread.terminate()  # Forzar terminación si es necesario
+            # Detener el motor de medios (libera también la cámara aparcada)
+            if self.media_engine is not None:
+                self.media_engine.stop()
+                self.media_engine.wait(2000)
+
+            self._close_gallery()
+
+            # Cancelar el lote de imágenes en curso
+            if self.image_thread and self.image_thread.isRunning():
+                self.image_thread.cancel()
+                self.image_thread.wait(5000)
+
+            # La decodificación a resolución completa no se puede interrumpir: esperar a que acabe
+            if self._full_resolution_thread is not None:
+                self._full_resolution_thread.wait()
+
+            # Cerrar el registro de detecciones para no perder datos en búfer
+            self._stop_detection_recording()
+            self._stop_event_recording()
+            self.detection_index.close()
+            self._stop_detection_server(wait=True)
+            self._stop_shm_ingest(wait=True)
+
+            # Cancelar una exportación en curso
+            if self.export_thread and self.export_thread.isRunning():
+                self.export_thread.cancel()
+                self.export_thread.wait(5000)
+
+            if self.quantization_thread and self.quantization_thread.isRunning():
+                self.quantization_thread.cancel()
+                self.quantization_thread.wait(5000)
+
+            if self.tuning_thread and self.tuning_thread.isRunning():
+                self.tuning_thread.cancel()
+                self.tuning_thread.wait(5000)
             
             print("Aplicación cerrada correctamente.")
             event.accept()
@@ -2187,6 +6170,71 @@ class MainWindow(QMainWindow):
             print(f"Error al cerrar la aplicación: {e}")
             event.accept()  # Aceptar el cierre incluso si hay error
 
+    # --- Visibilidad de la vista ---
+    def showEvent(self, event):
+        super().showEvent(event)
+        handle = self.windowHandle()
+        if handle is not None and handle is not self._watched_window:
+            # Los eventos Expose de la ventana nativa indican si el sistema la está mostrando
+            handle.installEventFilter(self)
+            self._watched_window = handle
+        self._update_view_visibility()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self._update_view_visibility()
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.Type.WindowStateChange:
+            self._update_view_visibility()
+
+    def eventFilter(self, obj, event):
+        if obj is self._watched_window and event.type() == QEvent.Type.Expose:
+            self._update_view_visibility()
+        return super().eventFilter(obj, event)
+
+    def _is_view_visible(self):
+        handle = self.windowHandle()
+        return (self.isVisible() and not self.isMinimized()
+                and (handle is None or handle.isExposed()))
+
+    def _update_view_visibility(self):
+        """Activa o suspende el trabajo de presentación según se vea o no la ventana"""
+        visible = self._is_view_visible()
+        if visible == self._view_visible:
+            return
+        self._view_visible = visible
+        if self.media_engine is not None:
+            # El motor lo aplica al siguiente frame
+            self.media_engine.set_parameters(present_frames=visible)
+        if not visible:
+            if self._pending_frame is not None:
+                self._release_display_buffer(self._pending_frame[0])
+                self._pending_frame = None
+            self._present_timer.stop()
+            self._position_timer.stop()
+            if (not self.view_config["detect_when_hidden"] and self.media_thread is not None
+                    and not self.media_thread._is_paused):
+                self.media_thread.pause()
+                self._sync_pause_buttons(True)
+                self._paused_while_hidden = True
+        else:
+            if self._paused_while_hidden:
+                self._paused_while_hidden = False
+                if self.media_thread is not None and self.media_thread._is_paused:
+                    self.media_thread.play()
+                    self._sync_pause_buttons(False)
+            if self._pending_frame_position is not None:
+                self._flush_frame_position()
+
+    def _set_detect_when_hidden(self, enabled):
+        self.view_config["detect_when_hidden"] = enabled
+        try:
+            save_json_config(VIEW_CONFIG_PATH, self.view_config)
+        except OSError as e:
+            print(f"No se pudo guardar la configuración de la vista: {e}")
+
     def _toggle_maximize(self):
         if self.isMaximized():
             self.showNormal()
@@ -2209,30 +6257,7 @@ class MainWindow(QMainWindow):
 
     def _show_archivo_menu(self):
         menu = QMenu(self)
-        menu.setStyleSheet("""
-            QMenu {
-                background-color: #1a1a2e;
-                border: 1px solid rgba(74, 58, 255, 0.3);
-                border-radius: 5px;
-                padding: 5px;
-            }
-            QMenu::item {
-                color: #E0E0FF;
-                padding: 5px 20px;
-                border-radius: 3px;
-                font-family: 'Segoe UI';
-                font-size: 13px;
-            }
-            QMenu::item:selected {
-                background: rgba(74, 58, 255, 0.2);
-            }
-            QMenu::separator {
-                height: 1px;
-                background: rgba(74, 58, 255, 0.3);
-                margin: 5px 0px;
-            }
-        """)
-        
+
         abrir_imagen = QAction("Abrir Imagen", self)
         abrir_imagen.triggered.connect(self._select_image_file)
         menu.addAction(abrir_imagen)
@@ -2240,6 +6265,67 @@ class MainWindow(QMainWindow):
         abrir_video = QAction("Abrir Video", self)
         abrir_video.triggered.connect(self._select_video_file)
         menu.addAction(abrir_video)
+        abrir_carpeta = QAction("Abrir Carpeta (Galería)", self)
+        abrir_carpeta.triggered.connect(self._open_image_folder)
+        menu.addAction(abrir_carpeta)
+
+        if self.export_thread and self.export_thread.isRunning():
+            exportar = QAction("Cancelar Exportación", self)
+            exportar.triggered.connect(self._cancel_export)
+        else:
+            exportar = QAction("Exportar Video Anotado...", self)
+            exportar.triggered.connect(self._export_annotated_video)
+        menu.addAction(exportar)
+        if self.detection_recorder is not None:
+            registro = QAction("Detener Registro de Detecciones", self)
+            registro.triggered.connect(self._stop_detection_recording)
+        else:
+            registro = QAction("Registrar Detecciones...", self)
+            registro.triggered.connect(self._start_detection_recording)
+        menu.addAction(registro)
+        if self.quantization_thread and self.quantization_thread.isRunning():
+            optimizar = QAction("Cancelar Optimización del Modelo", self)
+            optimizar.triggered.connect(self._cancel_quantization)
+        else:
+            optimizar = QAction("Optimizar Modelo para CPU (INT8)...", self)
+            optimizar.triggered.connect(self._quantize_model)
+        menu.addAction(optimizar)
+        if self.model_path != self.base_model_path:
+            restaurar = QAction("Restaurar Modelo FP32", self)
+            restaurar.triggered.connect(lambda: self._switch_model(self.base_model_path))
+            menu.addAction(restaurar)
+        buscar = QAction("Buscar Detecciones...", self)
+        buscar.triggered.connect(self._show_detection_search)
+        menu.addAction(buscar)
+        if self.detection_server is not None:
+            servidor = QAction("Detener Servidor de Detección", self)
+            servidor.triggered.connect(self._stop_detection_server)
+        else:
+            servidor = QAction("Iniciar Servidor de Detección...", self)
+            servidor.triggered.connect(self._start_detection_server)
+        menu.addAction(servidor)
+        if self.shm_ingest is not None:
+            ingesta = QAction("Detener Ingesta por Memoria Compartida", self)
+            ingesta.triggered.connect(self._stop_shm_ingest)
+        else:
+            ingesta = QAction("Ingesta por Memoria Compartida...", self)
+            ingesta.triggered.connect(self._start_shm_ingest)
+        menu.addAction(ingesta)
+        hilos = QAction("Hilos de CPU...", self)
+        hilos.triggered.connect(self._show_thread_settings)
+        menu.addAction(hilos)
+        oculta = QAction("Seguir Detectando con la Ventana Oculta", self)
+        oculta.setCheckable(True)
+        oculta.setChecked(bool(self.view_config["detect_when_hidden"]))
+        oculta.toggled.connect(self._set_detect_when_hidden)
+        menu.addAction(oculta)
+        perfiles = menu.addMenu("Perfil de Rendimiento")
+        for name in self.profiles:
+            perfil = QAction(name, self)
+            perfil.setCheckable(True)
+            perfil.setChecked(name == self.active_profile)
+            perfil.triggered.connect(lambda checked, name=name: self._select_profile(name))
+            perfiles.addAction(perfil)
 
         menu.addSeparator()
 
@@ -2255,28 +6341,26 @@ class MainWindow(QMainWindow):
 
     def _show_camara_menu(self):
         menu = QMenu(self)
-        menu.setStyleSheet("""
-            QMenu {
-                background-color: #1a1a2e;
-                border: 1px solid rgba(74, 58, 255, 0.3);
-                border-radius: 5px;
-                padding: 5px;
-            }
-            QMenu::item {
-                color: #E0E0FF;
-                padding: 5px 20px;
-                border-radius: 3px;
-                font-family: 'Segoe UI';
-                font-size: 13px;
-            }
-            QMenu::item:selected {
-                background: rgba(74, 58, 255, 0.2);
-            }
-        """)
-        
+
         iniciar_camara = QAction("Iniciar Cámara Web", self)
         iniciar_camara.triggered.connect(self._start_webcam_mode)
         menu.addAction(iniciar_camara)
+
+        movimiento = QAction("Detección por Movimiento...", self)
+        movimiento.triggered.connect(self._show_motion_settings)
+        menu.addAction(movimiento)
+
+        regulador = QAction("Regulador de FPS...", self)
+        regulador.triggered.connect(self._show_governor_settings)
+        menu.addAction(regulador)
+
+        if self.event_recorder is not None:
+            eventos = QAction("Detener Grabación de Eventos", self)
+            eventos.triggered.connect(self._stop_event_recording)
+        else:
+            eventos = QAction("Grabar Clips por Eventos...", self)
+            eventos.triggered.connect(self._start_event_recording)
+        menu.addAction(eventos)
         
         # Mostrar menú bajo el botón
         button = self.sender()
@@ -2284,15 +6368,1032 @@ class MainWindow(QMainWindow):
             pos = button.mapToGlobal(button.rect().bottomLeft())
             menu.exec(pos)
 
+    def _export_annotated_video(self):
+        """Exporta un video con las detecciones dibujadas, en segundo plano"""
+        if not self.yolo_model:
+            QMessageBox.warning(self, "Modelo no cargado", "El modelo YOLO aún no ha terminado de cargar.")
+            return
+        if self.export_thread and self.export_thread.isRunning():
+            QMessageBox.information(self, "Exportación", "Ya hay una exportación en curso.")
+            return
+
+        input_path, _ = QFileDialog.getOpenFileName(
+            self, "Seleccionar Video a Exportar", "",
+            "Archivos de Video (*.mp4 *.avi *.mkv *.mov *.webm)"
+        )
+        if not input_path:
+            return
+
+        dialog = ExportSettingsDialog(self)
+        if dialog.exec() != QDialog.DialogCode.Accepted:
+            return
+        settings = dialog.settings()
+
+        extension = VideoExportThread.CODECS[settings["codec"]]
+        default_name = os.path.splitext(input_path)[0] + "_anotado" + extension
+        output_path, _ = QFileDialog.getSaveFileName(
+            self, "Guardar Video Anotado", default_name, f"Video (*{extension})"
+        )
+        if not output_path:
+            return
+
+        try:
+            self.export_thread = VideoExportThread(self.model_path, input_path, output_path, **settings)
+            self.export_thread.progress.connect(self._on_export_progress)
+            self.export_thread.status_update.connect(self._update_status)
+            self.export_thread.export_finished.connect(self._on_export_finished)
+            self.export_thread.finished.connect(self._on_export_thread_done)
+            self.export_thread.start()
+            self.status_bar.showMessage(f"Exportando {os.path.basename(input_path)}...")
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Error al iniciar la exportación:\n{str(e)}")
+            self.export_thread = None
+
+    def _cancel_export(self):
+        if self.export_thread and self.export_thread.isRunning():
+            self.export_thread.cancel()
+            self.status_bar.showMessage("Cancelando exportación...", 2000)
+
+    @pyqtSlot(int, int, float)
+    def _on_export_progress(self, current, total, eta_seconds):
+        """Muestra el progreso y el tiempo restante estimado de la exportación"""
+        if total > 0:
+            percent = min(100, int(current * 100 / total))
+            self.status_bar.showMessage(
+                f"Exportando: {percent}% ({current}/{total}) · ETA {self._format_time(eta_seconds)}")
+        else:
+            self.status_bar.showMessage(f"Exportando: {current} frames")
+
+    @pyqtSlot(bool, str)
+    def _on_export_finished(self, success, message):
+        self.status_bar.showMessage(message, 5000)
+        if success:
+            QMessageBox.information(self, "Exportación completada", message)
+        else:
+            QMessageBox.warning(self, "Exportación", message)
+
+    def _start_detection_recording(self):
+        """Comienza a guardar las detecciones de todas las fuentes en disco"""
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "Guardar Registro de Detecciones", "detecciones.jsonl", "JSON Lines (*.jsonl)"
+        )
+        if not file_path:
+            return
+        try:
+            self.detection_recorder = DetectionRecorder(file_path)
+            self.detection_recorder.status_update.connect(self._update_status)
+            self.detection_recorder.start()
+            if self.media_thread:
+                self.media_thread.detection_recorder = self.detection_recorder
+            self.status_bar.showMessage(f"Registrando detecciones en {os.path.basename(file_path)}", 3000)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Error al iniciar el registro:\n{str(e)}")
+            self.detection_recorder = None
+
+    def _stop_detection_recording(self):
+        recorder = self.detection_recorder
+        if recorder is None:
+            return
+        self.detection_recorder = None
+        if self.media_thread:
+            self.media_thread.detection_recorder = None
+        recorder.close()
+        message = f"Registro detenido: {recorder.recorded_frames} frames guardados"
+        if recorder.dropped_frames:
+            message += f", {recorder.dropped_frames} descartados"
+        self.status_bar.showMessage(message + ".", 5000)
+
+    def _start_event_recording(self):
+        """Graba clips de la cámara cuando aparecen las clases elegidas"""
+        dialog = EventRecordingDialog(self.event_config, self)
+        if dialog.exec() != QDialog.DialogCode.Accepted:
+            return
+        self.event_config = dialog.settings()
+        try:
+            save_json_config(EVENT_CONFIG_PATH, self.event_config)
+        except OSError as e:
+            print(f"No se pudo guardar la configuración de eventos: {e}")
+        try:
+            self.event_recorder = EventClipRecorder.from_config(self.event_config)
+            self.event_recorder.status_update.connect(self._update_status)
+            self.event_recorder.clip_started.connect(
+                lambda path: self.status_bar.showMessage(f"Evento detectado: grabando {os.path.basename(path)}", 3000))
+            self.event_recorder.clip_saved.connect(self._on_event_clip_saved)
+            self.event_recorder.start()
+            if self.media_engine is not None:
+                self.media_engine.event_recorder = self.event_recorder
+            self.status_bar.showMessage("Grabación por eventos activa.", 3000)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Error al iniciar la grabación por eventos:\n{str(e)}")
+            self.event_recorder = None
+
+    def _stop_event_recording(self):
+        recorder = self.event_recorder
+        if recorder is None:
+            return
+        self.event_recorder = None
+        if self.media_engine is not None:
+            self.media_engine.event_recorder = None
+        recorder.close()
+        message = "Grabación por eventos detenida"
+        if recorder.dropped_frames:
+            message += f" ({recorder.dropped_frames} frames descartados)"
+        self.status_bar.showMessage(message + ".", 5000)
+
+    @pyqtSlot(str, float)
+    def _on_event_clip_saved(self, path, duration):
+        self.status_bar.showMessage(f"Clip guardado: {os.path.basename(path)} ({duration:.1f} s)", 5000)
+
+    def _start_detection_server(self):
+        """Expone el modelo cargado a otras aplicaciones en un puerto local"""
+        if not self.yolo_model:
+            QMessageBox.warning(self, "Modelo no cargado", "El modelo YOLO aún no ha terminado de cargar.")
+            return
+        dialog = ServerSettingsDialog(self.server_config, self)
+        if dialog.exec() != QDialog.DialogCode.Accepted:
+            return
+        self.server_config = dialog.settings()
+        try:
+            save_json_config(SERVER_CONFIG_PATH, self.server_config)
+        except OSError as e:
+            print(f"No se pudo guardar la configuración del servidor: {e}")
+        self.detection_server = DetectionServer(self.yolo_model, self.server_config)
+        self.detection_server.status_update.connect(self._update_status)
+        self.detection_server.stats_update.connect(self._on_server_stats)
+        self.detection_server.finished.connect(self._on_server_thread_done)
+        self.detection_server.start()
+
+    def _stop_detection_server(self, wait=False):
+        if self.detection_server is None:
+            return
+        self.detection_server.stop()
+        if wait:
+            self.detection_server.wait(5000)
+
+    @pyqtSlot(object)
+    def _on_server_stats(self, stats):
+        text = f"Servidor: {stats['served']} peticiones"
+        latency = stats.get("latency_ms")
+        if latency:
+            text += f", p95 {latency['p95']:.0f} ms, lote medio {stats['mean_batch']:.1f}"
+        if stats["rejected"]:
+            text += f", {stats['rejected']} rechazadas"
+        self._set_label_text(self.server_label, text)
+        self.server_label.setVisible(True)
+
+    def _on_server_thread_done(self):
+        # El hilo terminó (detenido o sin poder abrir el puerto); puede ser uno anterior ya sustituido
+        if self.sender() is not self.detection_server:
+            return
+        self.detection_server = None
+        self.server_label.setVisible(False)
+
+    def _start_shm_ingest(self):
+        """Analiza los frames que otro proceso escribe en memoria compartida"""
+        if not self.yolo_model:
+            QMessageBox.warning(self, "Modelo no cargado", "El modelo YOLO aún no ha terminado de cargar.")
+            return
+        name, ok = QInputDialog.getText(self, "Ingesta por memoria compartida",
+                                        "Nombre usado por el productor:", text=SHM_DEFAULT_NAME)
+        name = name.strip()
+        if not ok or not name:
+            return
+        self.shm_ingest = SharedMemoryIngest(self.yolo_model, name)
+        self.shm_ingest.status_update.connect(self._update_status)
+        self.shm_ingest.stats_update.connect(self._on_shm_ingest_stats)
+        self.shm_ingest.finished.connect(self._on_shm_ingest_done)
+        self.shm_ingest.start()
+
+    def _stop_shm_ingest(self, wait=False):
+        if self.shm_ingest is None:
+            return
+        self.shm_ingest.stop()
+        if wait:
+            self.shm_ingest.wait(5000)
+
+    @pyqtSlot(object)
+    def _on_shm_ingest_stats(self, stats):
+        text = f"Memoria compartida: {stats['processed']} frames, {stats['latency_ms']:.0f} ms"
+        if stats["skipped"]:
+            text += f", {stats['skipped']} saltados"
+        self._set_label_text(self.ingest_label, text)
+        self.ingest_label.setVisible(True)
+
+    def _on_shm_ingest_done(self):
+        if self.sender() is not self.shm_ingest:
+            return
+        self.shm_ingest = None
+        self.ingest_label.setVisible(False)
+
+    def _on_export_thread_done(self):
+        # Liberar la referencia solo cuando el hilo ha terminado realmente
+        self.export_thread = None
+
+    def _quantize_model(self):
+        """Genera y evalúa una variante INT8 del modelo calibrada con una carpeta de imágenes"""
+        if self.quantization_thread and self.quantization_thread.isRunning():
+            QMessageBox.information(self, "Optimización", "Ya hay una optimización en curso.")
+            return
+        folder = QFileDialog.getExistingDirectory(self, "Seleccionar Carpeta de Calibración", "")
+        if not folder:
+            return
+        try:
+            self.quantization_thread = ModelQuantizationThread(self.base_model_path, folder)
+            self.quantization_thread.status_update.connect(self._update_status)
+            self.quantization_thread.progress.connect(self._on_quantization_progress)
+            self.quantization_thread.quantization_finished.connect(self._on_quantization_finished)
+            self.quantization_thread.finished.connect(self._on_quantization_thread_done)
+            self.quantization_thread.start()
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Error al iniciar la optimización:\n{str(e)}")
+            self.quantization_thread = None
+
+    def _cancel_quantization(self):
+        if self.quantization_thread and self.quantization_thread.isRunning():
+            self.quantization_thread.cancel()
+            self.status_bar.showMessage("Cancelando optimización del modelo...", 2000)
+
+    @pyqtSlot(int, int)
+    def _on_quantization_progress(self, current, total):
+        self.status_bar.showMessage(f"Optimizando modelo: {current}/{total} imágenes")
+
+    @pyqtSlot(bool, str, object)
+    def _on_quantization_finished(self, success, message, report):
+        self.status_bar.showMessage(message, 5000)
+        if not success:
+            QMessageBox.warning(self, "Optimización del modelo", message)
+            return
+        dialog = QuantizationReportDialog(report, self)
+        if dialog.exec() == QDialog.DialogCode.Accepted:
+            self._switch_model(report["model_path"])
+
+    def _on_quantization_thread_done(self):
+        self.quantization_thread = None
+
+    def _show_detection_search(self):
+        """Abre la búsqueda en el índice local de detecciones"""
+        if self.search_dialog is None:
+            self.search_dialog = DetectionSearchDialog(self)
+            self.search_dialog.result_activated.connect(self._open_search_result)
+        self.search_dialog.show()
+        self.search_dialog.raise_()
+        self.search_dialog.activateWindow()
+
+    @pyqtSlot(str, str, int)
+    def _open_search_result(self, path, kind, frame):
+        if not os.path.exists(path):
+            QMessageBox.warning(self, "Buscar detecciones", f"El archivo ya no existe:\n{path}")
+            return
+        if kind == "image":
+            if self.image_thread and self.image_thread.isRunning():
+                QMessageBox.information(self, "Imágenes", "Ya hay un lote de imágenes en proceso.")
+                return
+            self._close_gallery()
+            self._stop_current_media_if_running()
+            self._process_image_files([path])
+            return
+        self._stop_current_media_if_running()
+        self._start_media_processing_thread("video", path, start_frame=frame)
+        if self.media_thread is not None:
+            self._sync_pause_buttons(True)
+
+    def _show_statistics(self):
+        """Muestra el panel de estadísticas en vivo (no modal)"""
+        if self.statistics_window is None:
+            self.statistics_window = StatisticsWindow(self.detection_statistics, self)
+        self.statistics_window.show()
+        self.statistics_window.raise_()
+        self.statistics_window.activateWindow()
+
+    def _build_motion_gate(self):
+        try:
+            return MotionGate.from_config(self.motion_config)
+        except ValueError as e:
+            self.status_bar.showMessage(f"Compuerta de movimiento desactivada: {e}", 5000)
+            return None
+
+    def _show_motion_settings(self):
+        """Configura la inferencia condicionada al movimiento de la cámara"""
+        dialog = MotionGateDialog(self.motion_config, self)
+        if dialog.exec() != QDialog.DialogCode.Accepted:
+            return
+        self.motion_config = dialog.settings()
+        try:
+            save_json_config(MOTION_CONFIG_PATH, self.motion_config)
+        except OSError as e:
+            QMessageBox.warning(self, "Detección por movimiento", f"No se pudo guardar la configuración:\n{e}")
+        if self.media_engine is not None:
+            self.media_engine.set_parameters(motion_gate=self._build_motion_gate())
+        if not self.motion_config["enabled"]:
+            self.motion_label.setVisible(False)
+
+    @pyqtSlot(int, int)
+    def _on_motion_gate_stats(self, inferred, skipped):
+        if self.media_thread is None or self.current_source_type != "webcam":
+            return
+        total = inferred + skipped
+        percent = 100.0 * inferred / total if total else 100.0
+        self._set_label_text(self.motion_label, f"Inferencia en {percent:.0f}% de los frames")
+        self.motion_label.setVisible(True)
+
+    def _engine_profile_parameters(self):
+        profile = self.profiles[self.active_profile]
+        size = int(profile["input_size"])
+        return {"base_inference_size": size, "inference_size": size,
+                "late_policy": profile["late_policy"], "camera_buffer_size": int(profile["camera_buffer"]),
+                "webcam_pause": max(0.0, float(profile["camera_pause_ms"]) / 1000.0)}
+
+    def _apply_profile(self, name, startup=False):
+        """Aplica un perfil de rendimiento; con la aplicación en marcha reconfigura el motor en vivo.
+
+        Devuelve un aviso si el perfil no se pudo aplicar por completo.
+        """
+        profile = self.profiles[name]
+        self.active_profile = name
+        self.image_batch_size = max(1, int(profile["batch_size"]))
+        self.model_input_size = int(profile["input_size"])
+
+        thread_config = profile_thread_config(profile)
+        if (not startup and thread_config.get("source") == "predeterminado"
+                and self.thread_config.get("source") != "predeterminado"):
+            # Deshacer los hilos del perfil anterior volviendo a los valores de las bibliotecas
+            apply_thread_config(dict(thread_config, source="perfil"))
+        self.thread_config = thread_config
+        apply_thread_config(thread_config, startup=startup)
+
+        warning = None
+        model_path = profile_model_path(profile)
+        if model_path is None:
+            model_path = profile["model"]
+            warning = ("El perfil usa un modelo INT8 pero aún no hay ninguno cuantizado con forma "
+                       "dinámica (Archivo → Optimizar Modelo para CPU); se usa el modelo FP32.")
+        self.base_model_path = profile["model"]
+        if startup:
+            self.model_path = model_path
+            if warning:
+                print(f"Advertencia: {warning}")
+            return warning
+
+        if self.media_engine is not None:
+            self.media_engine.set_parameters(**self._engine_profile_parameters())
+        # Cambiar de modelo detiene la fuente actual; el resto se aplica sin interrumpirla
+        self._switch_model(model_path)
+        return warning
+
+    def _select_profile(self, name):
+        if name == self.active_profile:
+            return
+        warning = self._apply_profile(name)
+        try:
+            save_active_profile(name)
+        except OSError as e:
+            print(f"No se pudo guardar el perfil activo: {e}")
+        if warning:
+            QMessageBox.warning(self, "Perfil de rendimiento", warning)
+        self.status_bar.showMessage(f"Perfil «{name}» aplicado.", 5000)
+
+    def _show_governor_settings(self):
+        """Configura el límite de FPS de la inferencia de la cámara"""
+        dialog = FpsGovernorDialog(self.governor_config, self)
+        if dialog.exec() != QDialog.DialogCode.Accepted:
+            return
+        self.governor_config = dialog.settings()
+        try:
+            save_json_config(GOVERNOR_CONFIG_PATH, self.governor_config)
+        except OSError as e:
+            QMessageBox.warning(self, "Regulador de FPS", f"No se pudo guardar la configuración:\n{e}")
+        if self.media_engine is not None:
+            self.media_engine.set_parameters(fps_governor=FpsGovernor.from_config(self.governor_config))
+        if not self.governor_config["enabled"]:
+            self.governor_label.setVisible(False)
+
+    @pyqtSlot(object)
+    def _on_governor_stats(self, stats):
+        if self.media_thread is None or self.current_source_type != "webcam":
+            return
+        self._set_label_text(
+            self.governor_label,
+            f"{stats['fps']:.1f}/{stats['target_fps']:g} FPS · CPU {stats['cpu_percent']:.0f}% · "
+            f"{stats['latency_ms']:.0f} ms · entrada {stats['input_size']} px")
+        self.governor_label.setVisible(True)
+
+    @pyqtSlot(str)
+    def _on_fallback_model_requested(self, model_path):
+        """La latencia sigue alta con la entrada mínima: pasar al modelo de reserva y reabrir la cámara"""
+        if model_path == self.model_path or not os.path.exists(model_path):
+            return
+        self.status_bar.showMessage(
+            f"Latencia por encima del objetivo: cambiando a {os.path.basename(model_path)}...", 5000)
+        self._resume_webcam_after_load = self.current_source_type == "webcam"
+        self._switch_model(model_path)
+
+    def _show_thread_settings(self):
+        """Permite fijar los hilos a mano o medirlos automáticamente"""
+        if self.tuning_thread and self.tuning_thread.isRunning():
+            QMessageBox.information(self, "Hilos de CPU", "Ya hay un ajuste de hilos en curso.")
+            return
+        dialog = ThreadSettingsDialog(self.thread_config, self)
+        result = dialog.exec()
+        if result == QDialog.DialogCode.Accepted:
+            self._set_thread_config(dialog.settings())
+        elif result == ThreadSettingsDialog.AUTOTUNE:
+            self._start_thread_tuning()
+
+    def _set_thread_config(self, config):
+        self.thread_config = config
+        apply_thread_config(config)
+        try:
+            save_thread_config(config)
+        except OSError as e:
+            QMessageBox.warning(self, "Hilos de CPU", f"No se pudo guardar la configuración:\n{e}")
+        self.status_bar.showMessage(
+            f"Hilos: torch {config['torch_threads']} · OpenCV {config['opencv_threads']} · "
+            f"decodificación {config['decode_workers']}", 5000)
+
+    def _start_thread_tuning(self):
+        # La medición necesita la CPU libre: no debe competir con la reproducción
+        if self.media_thread is not None or (self.image_thread and self.image_thread.isRunning()):
+            QMessageBox.information(self, "Hilos de CPU", "Detén la fuente actual antes de medir los hilos.")
+            return
+        try:
+            self.tuning_thread = ThreadTuningThread(self.model_path)
+            self.tuning_thread.status_update.connect(self._update_status)
+            self.tuning_thread.progress.connect(
+                lambda done, total: self.status_bar.showMessage(f"Ajuste de hilos: {done}/{total} combinaciones"))
+            self.tuning_thread.tuning_finished.connect(self._on_thread_tuning_finished)
+            self.tuning_thread.finished.connect(self._on_tuning_thread_done)
+            self.tuning_thread.start()
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Error al iniciar el ajuste de hilos:\n{str(e)}")
+            self.tuning_thread = None
+
+    @pyqtSlot(bool, str, object)
+    def _on_thread_tuning_finished(self, success, message, outcome):
+        if not success:
+            self.status_bar.showMessage(message, 5000)
+            QMessageBox.warning(self, "Hilos de CPU", message)
+            return
+        config, results = outcome
+        self._set_thread_config(config)
+        lines = [f"torch {r['torch_threads']:>2} · OpenCV {r['opencv_threads']:>2} · decod. {r['decode_workers']}"
+                 f" → {r['images_per_second']:.1f} img/s (lote p95 {r['p95_ms']:.0f} ms)" for r in results]
+        QMessageBox.information(
+            self, "Hilos de CPU",
+            f"Configuración elegida: torch {config['torch_threads']}, OpenCV {config['opencv_threads']}, "
+            f"decodificación {config['decode_workers']}.\n\n" + "\n".join(lines))
+
+    def _on_tuning_thread_done(self):
+        self.tuning_thread = None
+
+    def _switch_model(self, model_path):
+        """Sustituye el modelo activo; los hilos que lo comparten se detienen antes"""
+        if model_path == self.model_path:
+            return
+        self._close_gallery()
+        if self.image_thread and self.image_thread.isRunning():
+            self.image_thread.cancel()
+            self.image_thread.wait(5000)
+        self._stop_current_media_if_running()
+        # El motor de medios conserva el modelo con el que se creó: se recrea al cargar
+        if self.media_engine is not None:
+            self.media_engine.stop()
+            if not self.media_engine.wait(2000):
+                print("Advertencia: el motor de medios no se detuvo a tiempo; se liberará al terminar")
+            self._retire_thread(self.media_engine)
+            self.media_engine = None
+        if self.detection_server is not None:
+            # Mientras carga el nuevo modelo el servidor responde con error
+            self.detection_server.yolo_model = None
+        if self.shm_ingest is not None:
+            self.shm_ingest.yolo_model = None
+        self.yolo_model = None
+        self.model_path = model_path
+        self._update_button_states()
+        self._load_yolo_model_async()
+
     def _reload_current_media(self):
         """Recarga el video actual desde el principio"""
         if self.current_source_type == "video" and self.current_media_path:
-            self._start_media_processing_thread("video", self.current_media_path)
+            if self.media_thread and self.media_thread.source_type == "video" \
+                    and self.media_thread.file_path == self.current_media_path:
+                # Rebobinar la captura abierta en lugar de reabrir el archivo
+                self.media_thread.rewind()
+                self._update_button_states()
+            else:
+                self._start_media_processing_thread("video", self.current_media_path)
+
+# --- Prueba de memoria del bucle de reproducción ---
+def read_rss_bytes():
+    """Memoria residente del proceso en bytes, o None si no se puede medir"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class SyntheticCapture:
+    """Fuente de prueba con la interfaz de cv2.VideoCapture: un degradado que se desplaza.
+
+    Escribe cada frame sobre el arreglo recibido, así que no añade reservas
+    propias a las que se quieren medir.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        ramp = (np.arange(width * 2) % 256).astype(np.uint8)
+        self._pattern = np.repeat(np.broadcast_to(ramp, (height, width * 2))[:, :, np.newaxis], 3, axis=2)
+        self._offset = 0
+
+    def read(self, image=None):
+        if image is None or image.shape != (self.height, self.width, 3):
+            image = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        np.copyto(image, self._pattern[:, self._offset:self._offset + self.width])
+        self._offset = (self._offset + 8) % self.width
+        return True, image
+
+    def set(self, prop, value):
+        self._offset = 0
+        return True
+
+    def release(self):
+        pass
+
+
+def run_memory_benchmark(frames=3000, width=1920, height=1080, video_path=None,
+                         model_path=None, warmup=100, rss_limit_mb=8.0, event_recording=True):
+    """Recorre el camino caliente de la reproducción sin GUI y mide su memoria.
+
+    Con event_recording cada frame se entrega además a un EventClipRecorder
+    que nunca llega a disparar, como la cámara con la grabación por eventos
+    activa: la copia para el grabador y su búfer previo en JPEG entran en la
+    medición. Por cada frame se mide con tracemalloc el pico de memoria transitoria
+    (NumPy informa ahí de sus reservas) y cada cierto número de frames la
+    memoria residente. Sin modelo, el resultado es correcto si ningún frame
+    reserva un arreglo de tamaño completo y la memoria residente no crece más
+    de rss_limit_mb a lo largo de la prueba; con modelo solo se exige lo
+    segundo, porque la inferencia reserva sus propios temporales.
+    Devuelve el código de salida del proceso.
+    """
+    import tracemalloc
+
+    if video_path:
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            print(f"No se pudo abrir el video: {video_path}")
+            return 2
+    else:
+        cap = SyntheticCapture(width, height)
+    model = YOLO(model_path) if model_path else None
+    buffers = FrameBuffers()
+    gate = MotionGate()
+    recorder = None
+    if event_recording:
+        import tempfile
+        # Confianza mínima inalcanzable: solo el búfer previo, acotado a 1 s de reloj simulado
+        recorder = EventClipRecorder(tempfile.gettempdir(), min_confidence=2.0, pre_roll_seconds=1)
+        recorder.start()
+    step_count = 0
+    displayed = None
+    frame_bytes = None
+    transient = []
+    rss_samples = []
+    sample_every = max(1, frames // 200)
+
+    def step():
+        nonlocal displayed, step_count
+        ret, frame = buffers.read(cap)
+        if not ret:
+            # Fin del video: se vuelve al principio para mantener la carga
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = buffers.read(cap)
+            if not ret:
+                raise RuntimeError("La fuente no entrega frames")
+        detections = None
+        if model is not None:
+            with MODEL_LOCK:
+                detections = extract_detections(model(buffers.to_rgb(frame), verbose=False))
+        else:
+            buffers.to_rgb(frame)
+        gate.has_motion(frame)
+        display = buffers.to_display(frame)
+        # La GUI devuelve el frame anterior al mostrar el nuevo
+        buffers.release(displayed)
+        displayed = display
+        if recorder is not None:
+            # Reloj simulado a 30 FPS: el búfer previo tiene el mismo tamaño a cualquier velocidad
+            submit_to_event_recorder(recorder, buffers, frame, detections, timestamp=step_count / 30.0)
+        step_count += 1
+        return frame
+
+    for _ in range(warmup):
+        frame_bytes = step().nbytes
+    allocations_before = buffers.allocations
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        for index in range(frames):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            step()
+            transient.append(tracemalloc.get_traced_memory()[1] - before)
+            if index % sample_every == 0:
+                rss = read_rss_bytes()
+                if rss is not None:
+                    rss_samples.append((index, rss))
+        retained = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+        cap.release()
+        if recorder is not None:
+            recorder.close()
+    elapsed = time.perf_counter() - start
+
+    transient = np.array(transient, dtype=np.float64)
+    full_frame = int(np.count_nonzero(transient >= frame_bytes // 2))
+    print(f"Frames: {frames} ({frames / elapsed:.1f} FPS), frame de {frame_bytes / 1e6:.1f} MB")
+    print(f"Memoria transitoria por frame: media {transient.mean() / 1024:.1f} KB, "
+          f"máx. {transient.max() / 1024:.1f} KB")
+    print(f"Frames con reservas de tamaño completo: {full_frame}")
+    print(f"Reservas de búferes tras el calentamiento: {buffers.allocations - allocations_before}")
+    if recorder is not None:
+        print(f"Grabador de eventos: {recorder.dropped_frames} frames descartados "
+              f"({buffers.skipped_recordings} sin búfer libre)")
+    print(f"Memoria retenida al terminar (tracemalloc): {retained / 1024:.1f} KB")
+    growth_mb = None
+    if len(rss_samples) >= 2:
+        x = np.array([sample[0] for sample in rss_samples], dtype=np.float64)
+        y = np.array([sample[1] for sample in rss_samples], dtype=np.float64) / 1e6
+        slope = np.polyfit(x, y, 1)[0] if len(rss_samples) >= 3 else (y[-1] - y[0]) / max(1.0, x[-1] - x[0])
+        growth_mb = slope * frames
+        print(f"Memoria residente: {y[0]:.1f} MB → {y[-1]:.1f} MB "
+              f"(tendencia {growth_mb:+.2f} MB en la prueba)")
+    else:
+        print("Memoria residente: no disponible en esta plataforma")
+
+    ok = growth_mb is None or growth_mb <= rss_limit_mb
+    if model is None:
+        ok = ok and full_frame == 0
+    print("Resultado: " + ("memoria estable" if ok else "la memoria crece o hay reservas por frame"))
+    return 0 if ok else 1
+
+
+# --- Prueba de resistencia (soak) ---
+def read_process_handles():
+    """Hilos del sistema y descriptores (o handles en Windows) abiertos; None si no se pueden medir"""
+    try:
+        import psutil
+        process = psutil.Process()
+        handles = process.num_handles() if sys.platform == "win32" else process.num_fds()
+        return process.num_threads(), handles
+    except ImportError:
+        pass
+    try:
+        return len(os.listdir("/proc/self/task")), len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return None, None
+
+
+def write_synthetic_video(path, width, height, seconds=10, fps=30):
+    """Genera un video de prueba con el patrón de SyntheticCapture"""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"No se pudo crear el video de prueba: {path}")
+    source = SyntheticCapture(width, height)
+    frame = None
+    try:
+        for index in range(int(seconds * fps)):
+            _, frame = source.read(frame)
+            # Un bloque que se mueve para que haya algo distinto del fondo
+            x = (index * 7) % max(1, width - 80)
+            cv2.rectangle(frame, (x, height // 3), (x + 80, height // 3 + 80), (40, 200, 40), -1)
+            writer.write(frame)
+    finally:
+        writer.release()
+    return path
+
+
+def trend_per_hour(samples, key):
+    """Pendiente (unidades por hora) de una métrica a lo largo de la prueba"""
+    points = [(sample["elapsed"], sample[key]) for sample in samples if sample[key] is not None]
+    if len(points) < 3:
+        return None
+    x = np.array([point[0] for point in points], dtype=np.float64) / 3600.0
+    y = np.array([point[1] for point in points], dtype=np.float64)
+    if np.ptp(x) <= 0:
+        return None
+    return float(np.polyfit(x, y, 1)[0])
+
+
+def soak_report(samples, warmup_fraction=0.1, rss_limit_mb_h=20.0, fps_drift_limit=0.1):
+    """Resume las muestras de la prueba y marca las métricas que crecen.
+
+    Se descarta el primer tramo (calentamiento del modelo y de las cachés) y
+    se ajusta una recta al resto. Memoria, hilos y descriptores no deberían
+    crecer; los FPS no deberían caer más de fps_drift_limit por hora.
+    """
+    steady = samples[int(len(samples) * warmup_fraction):]
+    report = {"samples": len(samples), "metrics": {}, "flags": []}
+    if len(steady) < 3:
+        report["flags"].append("Muy pocas muestras para estimar tendencias")
+        return report
+    hours = (steady[-1]["elapsed"] - steady[0]["elapsed"]) / 3600.0
+    for key in ("rss_mb", "threads", "handles", "fps"):
+        values = [sample[key] for sample in steady if sample[key] is not None]
+        if not values:
+            continue
+        report["metrics"][key] = {"first": values[0], "last": values[-1],
+                                  "min": min(values), "max": max(values),
+                                  "per_hour": trend_per_hour(steady, key)}
+
+    def rate(key):
+        metric = report["metrics"].get(key)
+        return None if metric is None else metric["per_hour"]
+
+    rss_rate = rate("rss_mb")
+    if rss_rate is not None and rss_rate > rss_limit_mb_h:
+        report["flags"].append(f"Memoria residente en aumento: {rss_rate:+.1f} MB/h")
+    # Hilos y descriptores deben volver a su nivel tras cada cambio: cualquier
+    # crecimiento sostenido de más de unas pocas unidades es una fuga
+    for key, limit, label in (("threads", 2, "Hilos"), ("handles", 4, "Descriptores abiertos")):
+        key_rate = rate(key)
+        if key_rate is not None and key_rate * hours > limit:
+            report["flags"].append(f"{label} en aumento: {key_rate:+.1f} por hora")
+    fps = report["metrics"].get("fps")
+    if fps is not None and fps["per_hour"] is not None:
+        mean_fps = float(np.mean([sample["fps"] for sample in steady]))
+        if mean_fps > 0 and -fps["per_hour"] / mean_fps > fps_drift_limit:
+            report["flags"].append(f"Los FPS caen {-fps['per_hour']:.2f} por hora (media {mean_fps:.1f})")
+    return report
+
+
+class SoakTest(QObject):
+    """Hace pasar fuentes sintéticas por el motor y el lienzo durante horas.
+
+    Alterna las fuentes cada switch_interval segundos, y cada restart_every
+    cambios destruye y vuelve a crear el motor para ejercitar también el
+    arranque y la parada de hilos y capturas. Cada sample_interval segundos
+    anota memoria residente, hilos, descriptores y FPS en un CSV.
+    """
+    CSV_FIELDS = ("elapsed", "rss_mb", "threads", "handles", "fps", "switches",
+                  "restarts", "skipped_presentations")
+
+    def __init__(self, yolo_model, sources, duration, switch_interval=20, sample_interval=30,
+                 restart_every=10, report_path="soak.csv"):
+        super().__init__()
+        self.yolo_model = yolo_model
+        self.sources = sources
+        self.duration = duration
+        self.restart_every = max(1, restart_every)
+        self.report_path = report_path
+        self.samples = []
+        self.report = None
+        self.engine = None
+        self._session = 0
+        self._source_index = 0
+        self._switches = 0
+        self._restarts = 0
+        self._frames = 0
+        self._skipped_presentations = 0
+        self._last_sample = (0.0, 0)
+        self._start_time = 0.0
+        # Lienzo sin mostrar: se pinta sobre una imagen como lo haría la ventana
+        self.canvas = VideoCanvas()
+        self.canvas.resize(960, 540)
+        self.canvas.frame_released.connect(self._release_display_buffer)
+        self._render_target = QImage(960, 540, QImage.Format.Format_RGB32)
+        self._switch_timer = QTimer(self)
+        self._switch_timer.setInterval(int(switch_interval * 1000))
+        self._switch_timer.timeout.connect(self._switch_source)
+        self._sample_timer = QTimer(self)
+        self._sample_timer.setInterval(int(sample_interval * 1000))
+        self._sample_timer.timeout.connect(self._sample)
+        self.statistics = DetectionStatistics()
+        self.timeline = TimelineDensity()
+
+    def start(self):
+        self._start_time = time.perf_counter()
+        self._last_sample = (self._start_time, 0)
+        with open(self.report_path, "w", encoding="utf-8") as report:
+            report.write(",".join(self.CSV_FIELDS) + "\n")
+        self._create_engine()
+        self._switch_source()
+        self._switch_timer.start()
+        self._sample_timer.start()
+        QTimer.singleShot(int(self.duration * 1000), self._finish)
+
+    def _create_engine(self):
+        engine = MediaProcessingThread(self.yolo_model)
+        engine.frame_ready.connect(self._on_frame)
+        engine.processing_finished.connect(self._on_source_finished)
+        engine.statistics = self.statistics
+        engine.timeline = self.timeline
+        engine.start()
+        self.engine = engine
+
+    def _destroy_engine(self):
+        engine = self.engine
+        self.engine = None
+        if engine is None:
+            return
+        self.canvas.clear()
+        self._skipped_presentations += engine.frame_buffers.skipped_presentations
+        engine.stop()
+        if not engine.wait(10000):
+            print("Advertencia: el motor no terminó en 10 s")
+        engine.deleteLater()
+
+    def _switch_source(self):
+        if self._switches and self._switches % self.restart_every == 0:
+            self._destroy_engine()
+            self._create_engine()
+            self._restarts += 1
+        source_type, path = self.sources[self._source_index % len(self.sources)]
+        self._source_index += 1
+        self._switches += 1
+        self._session = self.engine.open_source(source_type, path)
+
+    @pyqtSlot(int)
+    def _on_source_finished(self, session):
+        # Un video terminado se sustituye por la siguiente fuente sin esperar al temporizador
+        if self.engine is not None and session == self._session:
+            self._switch_source()
+
+    @pyqtSlot(int, object, object)
+    def _on_frame(self, session, frame, detections):
+        self._frames += 1
+        self.canvas.set_frame(frame, detections)
+        self.canvas.render(self._render_target)
+
+    @pyqtSlot(object)
+    def _release_display_buffer(self, frame):
+        if self.engine is not None:
+            self.engine.frame_buffers.release(frame)
+
+    def _sample(self):
+        now = time.perf_counter()
+        last_time, last_frames = self._last_sample
+        self._last_sample = (now, self._frames)
+        rss = read_rss_bytes()
+        threads, handles = read_process_handles()
+        skipped = self._skipped_presentations
+        if self.engine is not None:
+            skipped += self.engine.frame_buffers.skipped_presentations
+        sample = {
+            "elapsed": now - self._start_time,
+            "rss_mb": rss / 1e6 if rss is not None else None,
+            "threads": threads,
+            "handles": handles,
+            "fps": (self._frames - last_frames) / max(1e-6, now - last_time),
+            "switches": self._switches,
+            "restarts": self._restarts,
+            "skipped_presentations": skipped,
+        }
+        self.samples.append(sample)
+        with open(self.report_path, "a", encoding="utf-8") as report:
+            report.write(",".join("" if sample[field] is None else f"{sample[field]:.3f}"
+                                  if isinstance(sample[field], float) else str(sample[field])
+                                  for field in self.CSV_FIELDS) + "\n")
+        rss_text = f"{sample['rss_mb']:.1f} MB" if sample["rss_mb"] is not None else "n/d"
+        print(f"[{sample['elapsed'] / 60:7.1f} min] RSS {rss_text} | hilos {threads} | "
+              f"descriptores {handles} | {sample['fps']:.1f} FPS | cambios {self._switches}")
+
+    def _finish(self):
+        self._switch_timer.stop()
+        self._sample_timer.stop()
+        self._sample()
+        self._destroy_engine()
+        self.report = soak_report(self.samples)
+        report_json = os.path.splitext(self.report_path)[0] + ".json"
+        with open(report_json, "w", encoding="utf-8") as report:
+            json.dump(self.report, report, indent=2, ensure_ascii=False)
+        QApplication.instance().quit()
+
+
+def run_soak_test(hours, model_path="yolov8n.pt", switch_interval=20, sample_interval=30,
+                  restart_every=10, include_webcam=False, report_path=None):
+    """Prueba de resistencia sin ventana; devuelve el código de salida del proceso"""
+    import tempfile
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    report_path = report_path or f"soak_{time.strftime('%Y%m%d_%H%M%S')}.csv"
+    with tempfile.TemporaryDirectory(prefix="yolo_soak_") as video_dir:
+        # Varias resoluciones para que el motor tenga que redimensionar sus búferes
+        sources = [("video", write_synthetic_video(os.path.join(video_dir, f"sintetico_{w}x{h}.avi"), w, h))
+                   for w, h in ((640, 480), (1280, 720), (1920, 1080))]
+        if include_webcam:
+            sources.append(("webcam", None))
+        test = SoakTest(YOLO(model_path), sources, hours * 3600, switch_interval,
+                        sample_interval, restart_every, report_path)
+        test.start()
+        app.exec()
+
+    report = test.report
+    print(f"\nInforme: {report_path} ({report['samples']} muestras)")
+    for key, metric in report["metrics"].items():
+        per_hour = "n/d" if metric["per_hour"] is None else f"{metric['per_hour']:+.2f}/h"
+        print(f"  {key:8s} {metric['first']:10.1f} → {metric['last']:10.1f}  (tendencia {per_hour})")
+    if report["flags"]:
+        print("Tendencias sospechosas:")
+        for flag in report["flags"]:
+            print(f"  - {flag}")
+        return 1
+    print("Sin tendencias de crecimiento.")
+    return 0
+
+
+def run_detection_server(model_path, config):
+    """Servidor de detección sin ventana hasta Ctrl+C; devuelve el código de salida"""
+    server = DetectionServer(YOLO(model_path), config)
+    server.status_update.connect(print, Qt.ConnectionType.DirectConnection)
+    server.start()
+    last_report = time.perf_counter()
+    try:
+        while not server.wait(500):
+            if time.perf_counter() - last_report >= 10:
+                last_report = time.perf_counter()
+                print(json.dumps(server.stats(), ensure_ascii=False))
+    except KeyboardInterrupt:
+        server.stop()
+        server.wait()
+    return 0
+
+
+def run_shm_ingest(model_path, name):
+    """Ingesta por memoria compartida sin ventana hasta Ctrl+C"""
+    ingest = SharedMemoryIngest(YOLO(model_path), name)
+    ingest.status_update.connect(print, Qt.ConnectionType.DirectConnection)
+    ingest.start()
+    try:
+        while not ingest.wait(500):
+            pass
+    except KeyboardInterrupt:
+        ingest.stop()
+        ingest.wait()
+    return 0
+
 
 # --- Punto de Entrada ---
+def parse_arguments(argv):
+    """Opciones de línea de comandos; el resto de argumentos se deja para Qt"""
+    import argparse
+    parser = argparse.ArgumentParser(description="YOLO Vision Pro")
+    parser.add_argument("--benchmark-memoria", action="store_true",
+                        help="mide la memoria del bucle de reproducción sin abrir la interfaz")
+    parser.add_argument("--frames", type=int, default=3000, help="frames de la prueba de memoria")
+    parser.add_argument("--resolucion", default="1920x1080", help="tamaño de los frames sintéticos (ANCHOxALTO)")
+    parser.add_argument("--video", help="video a usar en lugar de frames sintéticos")
+    parser.add_argument("--modelo", help="modelo para las pruebas (en la de memoria, incluye la inferencia)")
+    parser.add_argument("--soak", type=float, metavar="HORAS",
+                        help="prueba de resistencia sin ventana con fuentes sintéticas durante HORAS")
+    parser.add_argument("--soak-cambio", type=float, default=20, help="segundos entre cambios de fuente")
+    parser.add_argument("--soak-muestreo", type=float, default=30, help="segundos entre muestras")
+    parser.add_argument("--soak-reinicio", type=int, default=10,
+                        help="recrear el motor cada N cambios de fuente")
+    parser.add_argument("--soak-camara", action="store_true", help="incluir la cámara web entre las fuentes")
+    parser.add_argument("--soak-informe", help="ruta del CSV de muestras (junto a él se escribe el resumen JSON)")
+    parser.add_argument("--servidor", action="store_true",
+                        help="servir detecciones en 127.0.0.1 sin abrir la interfaz")
+    parser.add_argument("--puerto", type=int, help="puerto del servidor de detección")
+    parser.add_argument("--perfil", help="perfil de rendimiento (predefinidos o de perfiles.json)")
+    parser.add_argument("--ingesta", nargs="?", const=SHM_DEFAULT_NAME, metavar="NOMBRE",
+                        help="analizar los frames de un productor por memoria compartida, sin interfaz")
+    return parser.parse_known_args(argv[1:])
+
+
 if __name__ == '__main__':
+    args, qt_args = parse_arguments(sys.argv)
+    active_profile, profiles = load_profiles()
+    if args.perfil and args.perfil not in profiles:
+        print(f"Perfil desconocido: {args.perfil}. Disponibles: {', '.join(profiles)}")
+        sys.exit(2)
+    if args.benchmark_memoria or args.soak or args.servidor or args.ingesta:
+        # Los modos sin ventana también respetan los hilos y el modelo del perfil
+        profile = profiles[args.perfil or active_profile]
+        apply_thread_config(profile_thread_config(profile), startup=True)
+        default_model = profile_model_path(profile) or profile["model"]
+    if args.benchmark_memoria:
+        width, height = (int(value) for value in args.resolucion.lower().split("x"))
+        sys.exit(run_memory_benchmark(args.frames, width, height, args.video, args.modelo))
+    if args.soak:
+        sys.exit(run_soak_test(args.soak, args.modelo or default_model, args.soak_cambio, args.soak_muestreo,
+                               args.soak_reinicio, args.soak_camara, args.soak_informe))
+    if args.servidor:
+        server_config = load_json_config(SERVER_CONFIG_PATH, DEFAULT_SERVER_CONFIG)
+        if args.puerto:
+            server_config["port"] = args.puerto
+        sys.exit(run_detection_server(args.modelo or default_model, server_config))
+    if args.ingesta:
+        sys.exit(run_shm_ingest(args.modelo or default_model, args.ingesta))
+
     try:
-        app = QApplication(sys.argv)
+        app = QApplication(sys.argv[:1] + qt_args)
 
         # Configurar información de la aplicación
         app.setApplicationName("YOLO Vision Pro(Tomson)")
@@ -2356,7 +7457,7 @@ if __name__ == '__main__':
                 sys.exit(0)
 
         # Crear y mostrar la ventana principal
-        main_win = MainWindow()
+        main_win = MainWindow(args.perfil)
         main_win.show()
 
         # Configurar manejo de excepciones no capturadas